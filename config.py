@@ -1,3 +1,5 @@
+import os
+
 # Цветовая схема
 COLORS = {
     'bg': '#0d1421',
@@ -13,13 +15,34 @@ COLORS = {
     'warning': '#eab308'       # Добавляем недостающие цвета
 }
 
-# Серверы BYBIT
+# Серверы BYBIT (основной, резервный и региональные домены публичного API)
 BYBIT_SERVERS = [
-    {'name': 'Европа (Лондон)', 'url': 'https://api.bybit.com'},
-    {'name': 'Сингапур', 'url': 'https://api.bybit.com'},
-    {'name': 'США', 'url': 'https://api.bybit.com'},
+    {'name': 'Основной (api.bybit.com)', 'url': 'https://api.bybit.com'},
+    {'name': 'Резервный (api.bytick.com)', 'url': 'https://api.bytick.com'},
+    {'name': 'Нидерланды (api.bybit.nl)', 'url': 'https://api.bybit.nl'},
+    {'name': 'Гонконг (api.byhkbit.com)', 'url': 'https://api.byhkbit.com'},
 ]
 
+# Замеры задержки и автоматический выбор сервера
+LATENCY_SETTINGS = {
+    'samples': 5,                # Замеров за один проход на каждый сервер
+    'window': 200,               # Размер скользящего окна для перцентилей
+    'timeout': 3,                # Таймаут одного замера (сек)
+    'min_success_rate': 0.8,     # Доля успешных запросов, ниже которой сервер считается нездоровым
+    'measure_phases': True,      # Разбивка холодного запроса на DNS/TCP/TLS/TTFB
+    'ping_interval': 50,         # Период замера пинга в торговом цикле (сек)
+    'auto_server_name': 'Авто (самый быстрый)'
+}
+
+# Локальный сервер воспроизведения записанной сессии (python -m trading.replay serve ...)
+REPLAY_SETTINGS = {
+    'url': os.environ.get('BYBIT_REPLAY_URL'),
+    'speed': float(os.environ.get('BYBIT_REPLAY_SPEED', 1)),
+    'server_name': 'Локальное воспроизведение'
+}
+if REPLAY_SETTINGS['url']:
+    BYBIT_SERVERS.append({'name': REPLAY_SETTINGS['server_name'], 'url': REPLAY_SETTINGS['url'], 'replay': True})
+
 # Популярные торговые пары
 POPULAR_SYMBOLS = [
     "BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "ADAUSDT",
@@ -35,4 +58,124 @@ DEFAULT_SETTINGS = {
     'prediction_length': 5,
     'show_predictions': True,
     'chart_type': 'candles'
+}
+
+# Обучающая выборка AI модели
+PREDICTOR_SETTINGS = {
+    'lookback': 10,             # Свечей на входе модели
+    'forecast': 5,              # Свечей предсказания
+    'float32': False,           # Обучение в float32 (вдвое меньше памяти на длинной истории)
+    'online': True,             # Дообучение на каждой закрытой свече (RLS) вместо обучения один раз
+    'forgetting': 0.999,        # Коэффициент забывания RLS (1.0 - все свечи с равным весом)
+    'drift_window': 60          # Свечей для оценки ошибки прогноза на новых данных
+}
+
+# Бэктест ai_trading_decision на истории
+BACKTEST_SETTINGS = {
+    'train_window': 2000,       # Свечей для обучения модели (как CANDLE_STORE_SETTINGS['training_window'])
+    'refit_every': 1440,        # Переобучение модели каждые N свечей (walk-forward)
+    'initial_capital': 10000.0,
+    'allow_short': False        # SELL открывает короткую позицию, а не только закрывает длинную
+}
+
+# Реестр моделей по парам (symbol, interval, lookback, horizon)
+MODEL_REGISTRY_SETTINGS = {
+    'max_models': 32,           # Моделей в памяти, давно не использованные вытесняются
+    'max_bytes': 8 * 1024 * 1024  # Суммарный размер моделей
+}
+
+# Сохранение обученных моделей для быстрого старта
+MODEL_STORE_SETTINGS = {
+    'enabled': True,
+    'directory': 'data/models',
+    'max_age': 6 * 3600         # Модель старше (по последней свече обучения), с - переобучается в фоне
+}
+
+# Фоновое переобучение AI модели в отдельном процессе
+RETRAIN_SETTINGS = {
+    'enabled': True,
+    'interval': 1800,           # Плановое переобучение, с
+    'drift_ratio': 2.0,         # Внеплановое: ошибка на новых свечах в N раз выше, чем на обучении
+    'min_interval': 120,        # Не чаще, с
+    'workers': 1
+}
+
+# Настройки HTTP-соединений с BYBIT
+HTTP_SETTINGS = {
+    'pool_connections': 4,      # Количество хостов, для которых хранится пул соединений
+    'pool_maxsize': 16,         # Максимум keep-alive соединений на один хост
+    'pool_block': False,        # Не блокировать запрос при исчерпании пула
+    'connect_timeout': 3.05,    # Таймаут установки соединения (сек)
+    'read_timeout': 10,         # Таймаут чтения ответа (сек)
+    'ping_read_timeout': 3      # Таймаут чтения ответа при измерении пинга (сек)
+}
+
+# Хеджирование запросов свечей: дубль на запасной сервер, если основной не ответил за свой p95
+HEDGE_SETTINGS = {
+    'enabled': False,
+    'default_delay': 0.3,       # Задержка перед дублем, пока нет статистики задержки (сек)
+    'min_delay': 0.05,          # Границы задержки перед дублем (сек)
+    'max_delay': 2.0,
+    'percentile': 95,           # Дубль - если основной сервер не ответил за этот перцентиль своей задержки
+    'min_samples': 20,          # Пока замеров меньше - дубль через min_delay
+    'budget': 0.1,              # Доля запросов, которые разрешено дублировать
+    'burst': 2                  # Запас дублей подряд
+}
+
+# Настройки получения рыночных данных
+MARKET_DATA_SETTINGS = {
+    'incremental_sync': True,   # Догружать только новые свечи вместо полного окна
+    'buffer_capacity': 1000,    # Емкость кольцевого буфера на пару (symbol, interval)
+    'max_kline_limit': 1000,    # Максимальный limit запроса /v5/market/kline
+    'max_concurrency': 8,       # Одновременных запросов при загрузке нескольких пар
+    'batch_timeout': 15,        # Общий таймаут пакетной загрузки (сек)
+    'cache_ttl': 5              # Время жизни кэша ответов (сек), не дольше текущей свечи
+}
+
+# Локальный архив свечей
+CANDLE_STORE_SETTINGS = {
+    'enabled': True,            # Сохранять загруженные свечи в архив
+    'base_dir': 'data/candles', # Каталог архива
+    'backfill_depth': 10000,    # Глубина догрузки истории по умолчанию (свечей)
+    'training_window': 2000,    # Сколько свечей из архива брать для обучения модели
+    'chart_window': 50          # Сколько свечей показывать на графике
+}
+
+# Опрос REST по закрытию свечей
+SCHEDULER_SETTINGS = {
+    'settle_delay': 0.5,        # Пауза после закрытия свечи, чтобы биржа ее зафиксировала (сек)
+    'refresh_interval': 15,     # Промежуточные обновления внутри свечи (сек), 0 - только по закрытию
+    'resync_period': 600,       # Пересинхронизация часов с сервером (сек)
+    'clock_samples': 5          # Замеров /v5/market/time при синхронизации
+}
+
+# Старшие таймфреймы, собираемые локально из минутных свечей
+MULTI_TIMEFRAME_SETTINGS = {
+    'enabled': True,
+    'intervals': ('5', '15', '60'),
+    'history': 4000,            # Минутных свечей из архива для начального построения
+    'capacity': 1000,           # Емкость буфера на таймфрейм
+    'decision_weight': 0.0      # Вес тренда старших таймфреймов в решении (0 - не учитывается),
+                                # остальные веса уменьшаются пропорционально, сумма остается 1
+}
+
+# Параллельная догрузка истории (python -m trading.backfill ...)
+BACKFILL_SETTINGS = {
+    'workers': 8,               # Потоков загрузки
+    'rate_limit': 20,           # Запросов в секунду на все потоки
+    'burst': 10,                # Запросов подряд без ожидания
+    'retries': 3,               # Повторов окна при ошибке
+    'retry_delay': 0.5,         # Начальная пауза перед повтором (сек), далее удваивается
+    'flush_candles': 100000,    # Запись в архив после накопления стольких свечей
+    'checkpoint_dir': 'data/backfill'
+}
+
+# WebSocket поток свечей BYBIT (альтернатива опросу REST)
+STREAM_SETTINGS = {
+    'enabled': False,                                   # Использовать поток вместо опроса REST
+    'url': 'wss://stream.bybit.com/v5/public/spot',     # Публичный спотовый поток
+    'ping_interval': 20,                                # Интервал heartbeat (сек)
+    'reconnect_delay': 1,                               # Начальная задержка переподключения (сек)
+    'max_reconnect_delay': 30,                          # Максимальная задержка переподключения (сек)
+    'max_wait': 5                                       # Максимальное ожидание новых данных в цикле (сек)
 }
\ No newline at end of file
@@ -0,0 +1,36 @@
+import numpy as np
+
+from trading.ai_predictor import AIPredictor
+from trading.candle_frame import CandleFrame
+
+MINUTE = 60_000
+
+def make_frame(count, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(count, dtype=np.int64) * MINUTE
+    closes = 30_000 + np.cumsum(rng.normal(scale=20, size=count))
+    return CandleFrame.from_columns(timestamps, np.vstack([closes] * 4 + [np.ones(count)] * 2))
+
+def test_forming_candle_reaches_model_after_close():
+    frame = make_frame(201)
+    market_data = frame[:200]  # Последняя свеча еще формируется
+    
+    predictor = AIPredictor(10, 5)
+    predictor.train_prediction_model(market_data[:-1])
+    assert predictor.last_timestamp == int(market_data['timestamp'][-2])
+    
+    # Свеча закрылась, открылась следующая: закрытая доходит до модели через update_model
+    assert predictor.update_model(frame) == 1
+    assert predictor.last_timestamp == int(market_data['timestamp'][-1])
+    assert predictor.update_model(frame) == 0
+
+def test_higher_timeframes_do_not_change_default_decision():
+    indicators = {'sma_20': 101, 'sma_50': 100, 'macd': 0.5, 'rsi': 50, 'bb_position': 0.5,
+                  'volume_ratio': 1.0, 'current_price': 100}
+    bearish = {'5': {'sma_20': 90, 'sma_50': 100, 'macd': -1}}
+    predictor = AIPredictor(10, 5)
+    assert predictor.ai_trading_decision(indicators, higher_timeframes=bearish) == predictor.ai_trading_decision(indicators)
+    
+    predictor.higher_tf_weight = 0.15
+    assert sum(predictor.decision_weights(predictor.higher_tf_weight).values()) == 1.0
+    assert predictor.ai_trading_decision(indicators, higher_timeframes=bearish)[1] < predictor.ai_trading_decision(indicators)[1]
@@ -0,0 +1,80 @@
+import json
+import sys
+
+import numpy as np
+
+import trading.backfill as backfill
+import trading.data_provider as data_provider
+from trading.candle_frame import CandleFrame
+from trading.candle_store import CandleStore
+
+MINUTE = 60_000
+
+class FakeProvider:
+    """Биржа без сети: свечи любого диапазона, после fail_after запросов - ошибки"""
+    
+    fail_after = None
+    requests = []
+    
+    def __init__(self, server, store=None, **kwargs):
+        self.max_kline_limit = 1000
+    
+    def fetch_klines(self, symbol, interval='1', start=None, end=None, limit=None):
+        FakeProvider.requests.append((symbol, start))
+        if FakeProvider.fail_after is not None and len(FakeProvider.requests) > FakeProvider.fail_after:
+            raise ConnectionError("сеть недоступна")
+        timestamps = np.arange(start, end + 1, MINUTE, dtype=np.int64)
+        closes = 100 + timestamps / 1e9
+        return CandleFrame.from_columns(timestamps, np.vstack([closes] * 4 + [np.ones(len(timestamps))] * 2))
+    
+    def close(self):
+        pass
+
+def run_main(monkeypatch, now_ms, args):
+    monkeypatch.setattr(backfill.time, 'time', lambda: now_ms / 1000)
+    monkeypatch.setattr(sys, 'argv', ['backfill'] + args)
+    backfill.main()
+
+def test_interrupted_days_run_resumes_from_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(data_provider, 'DataProvider', FakeProvider)
+    monkeypatch.setitem(backfill.BACKFILL_SETTINGS, 'retries', 0)
+    monkeypatch.setitem(backfill.BACKFILL_SETTINGS, 'workers', 1)
+    args = ['BTCUSDT', 'ETHUSDT', '--days', '5', '--dir', str(tmp_path / 'candles'), '--rate', '1000']
+    now_ms = 1_700_000_040_000  # Начало минуты
+    
+    # Первый запуск обрывается: доступны только 3 окна из 16
+    FakeProvider.requests, FakeProvider.fail_after = [], 3
+    run_main(monkeypatch, now_ms, args)
+    checkpoints = list((tmp_path / 'data' / 'backfill').glob('*.json'))
+    assert len(checkpoints) == 1
+    checkpoint = json.loads(checkpoints[0].read_text(encoding='utf-8'))
+    assert sum(len(starts) for starts in checkpoint['done'].values()) == 3
+    
+    # Повторный запуск позже с теми же аргументами догружает только оставшиеся окна
+    first_requests = set(FakeProvider.requests[:3])
+    FakeProvider.requests, FakeProvider.fail_after = [], None
+    run_main(monkeypatch, now_ms + 90_000, args)
+    assert len(FakeProvider.requests) == 16 - 3
+    assert not first_requests & set(FakeProvider.requests)
+    
+    checkpoint = json.loads(checkpoints[0].read_text(encoding='utf-8'))
+    assert (checkpoint['start'], checkpoint['end']) == (now_ms - 5 * 24 * 60 * MINUTE, now_ms)
+    store = CandleStore(str(tmp_path / 'candles'))
+    for symbol in ('BTCUSDT', 'ETHUSDT'):
+        timestamps = store.timestamps(symbol, '1')
+        assert len(timestamps) == 5 * 24 * 60
+        assert np.all(np.diff(timestamps) == MINUTE)
+
+def test_finished_checkpoint_starts_new_range(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = CandleStore(str(tmp_path / 'candles'))
+    provider = FakeProvider(None)
+    FakeProvider.requests, FakeProvider.fail_after = [], None
+    
+    job = backfill.BackfillJob(provider, store, ['BTCUSDT'], '1', 0, 2000 * MINUTE, settings={'workers': 1})
+    assert job.run()['remaining'] == 0
+    
+    job = backfill.BackfillJob(provider, store, ['BTCUSDT'], '1', 2000 * MINUTE, 3000 * MINUTE, settings={'workers': 1})
+    assert not job.resumed
+    assert job.windows('BTCUSDT') == [(2000 * MINUTE, 3000 * MINUTE)]
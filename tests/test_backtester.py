@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from trading.ai_predictor import AIPredictor
+from trading.backtester import MIN_CANDLES, Backtester, higher_timeframe_frame
+from trading.candle_frame import CandleFrame
+
+def make_frame(days=7, seed=0):
+    rng = np.random.default_rng(seed)
+    n = days * 24 * 60
+    closes = 30_000 * np.exp(np.cumsum(rng.normal(scale=0.001, size=n)))
+    volumes = rng.lognormal(size=n)
+    return CandleFrame.from_columns(np.arange(n) * 60_000,
+                                    np.vstack([closes, closes * 1.0005, closes * 0.9995, closes, volumes, volumes * closes]))
+
+@pytest.mark.parametrize('higher_tf_weight', [0.0, 0.15, 1.0])
+def test_signals_match_ai_trading_decision(higher_tf_weight):
+    # Векторные сигналы на случайных свечах - как ai_trading_decision торгового цикла
+    frame = make_frame()
+    backtester = Backtester(higher_tf_weight=higher_tf_weight)
+    signal, confidence, _, forecasts, _ = backtester.signals(frame)
+    predictor = AIPredictor()
+    predictor.higher_tf_weight = higher_tf_weight
+    
+    bars = np.random.default_rng(0).choice(np.arange(MIN_CANDLES - 1, len(signal)), size=200, replace=False)
+    names = {1: 'BUY', -1: 'SELL', 0: 'HOLD'}
+    for bar in bars:
+        indicators = backtester.indicators.calculate_advanced_indicators(frame[:bar + 1])
+        future_prices = None if np.isnan(forecasts[bar]) else np.array([forecasts[bar]])
+        # Старшие таймфреймы - из минутных свечей до текущей включительно
+        higher_timeframes = {}
+        for interval in backtester.higher_intervals:
+            htf_indicators = backtester.indicators.calculate_advanced_indicators(higher_timeframe_frame(frame[:bar + 1], interval)[0])
+            if htf_indicators:
+                higher_timeframes[interval] = htf_indicators
+        expected, expected_confidence = predictor.ai_trading_decision(
+            indicators, future_prices, backtester.aggressiveness, backtester.commission, backtester.min_profit,
+            higher_timeframes)
+        assert names[int(signal[bar])] == expected, bar
+        assert np.isclose(confidence[bar], expected_confidence), bar
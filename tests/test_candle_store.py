@@ -0,0 +1,32 @@
+import gc
+import os
+
+import numpy as np
+
+import trading.candle_store as candle_store
+from trading.candle_frame import CandleFrame
+from trading.candle_store import CandleStore
+
+MINUTE = 60_000
+
+def make_frame(start, count):
+    timestamps = (start + np.arange(count)) * MINUTE
+    return CandleFrame.from_columns(timestamps, np.vstack([timestamps / 1e6] * 6))
+
+def test_backward_write_replaces_unmapped_files(tmp_path, monkeypatch):
+    store = CandleStore(str(tmp_path))
+    store.write('BTCUSDT', '1', make_frame(100, 50))
+    
+    # В Windows файл с открытым memmap нельзя заменить - при замене отображений быть не должно
+    replace = os.replace
+    def checked_replace(src, dst):
+        mapped = [obj for obj in gc.get_objects()
+                  if isinstance(obj, np.memmap) and obj.filename and os.path.samefile(obj.filename, dst)]
+        assert not mapped, dst
+        replace(src, dst)
+    monkeypatch.setattr(candle_store.os, 'replace', checked_replace)
+    
+    store.write('BTCUSDT', '1', make_frame(60, 40))  # Догрузка истории назад - перезапись колонок
+    frame = store.read('BTCUSDT', '1')
+    assert list(frame.timestamp) == list(np.arange(60, 150) * MINUTE)
+    assert np.allclose(frame['close'], frame.timestamp / 1e6)
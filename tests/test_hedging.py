@@ -0,0 +1,73 @@
+import json
+import time
+
+from trading.data_provider import DataProvider
+from trading.latency import LatencyProber
+from trading.replay import Recording, ReplayServer
+
+START_MS = 1_700_000_040_000
+
+def write_recording(path, count=100):
+    rows = [[str(START_MS - i * 60_000), '1', '2', '0.5', '1.5', '3', '4'] for i in range(count)]
+    record = {'path': '/v5/market/kline', 'params': {'symbol': 'BTCUSDT', 'interval': '1'},
+              'recorded_at': START_MS + 1, 'body': {'retCode': 0, 'result': {'list': rows}}}
+    path.write_text(json.dumps(record) + '\n', encoding='utf-8')
+    return Recording(str(path))
+
+def test_hedges_fire_with_documented_slow_tail(tmp_path):
+    # Настройки из bench_hedged_requests: 2% ответов медленнее на 1 сек
+    recording = write_recording(tmp_path / 'session.jsonl')
+    servers = [ReplayServer(recording, slow_ratio=0.02, slow_delay=1, seed=seed).start() for seed in (1, 2)]
+    try:
+        primary, alternate = [{'name': f'replay {i}', 'url': server.url} for i, server in enumerate(servers)]
+        latency = LatencyProber([primary, alternate], {'measure_phases': False})
+        provider = DataProvider(primary, latency=latency, hedge_servers=[alternate])
+        provider.set_hedging(True)
+        
+        samples = []
+        for _ in range(300):
+            provider.clear_cache()
+            start = time.perf_counter()
+            provider.get_market_data('BTCUSDT', '1', 100)
+            samples.append(time.perf_counter() - start)
+        info = provider.hedge_info()
+        provider.close()
+        latency.close()
+    finally:
+        for server in servers:
+            server.stop()
+    
+    assert info['hedged'] > 0 and info['hedge_wins'] > 0
+    assert sorted(samples)[int(len(samples) * 0.99)] < 0.5  # p99 ниже медленного хвоста
+
+def test_hedge_delay_follows_p95():
+    server = {'name': 'local', 'url': 'http://127.0.0.1:1'}
+    
+    def hedge_delay(samples):
+        latency = LatencyProber([server])
+        provider = DataProvider(server, latency=latency)
+        for latency_ms in samples:
+            latency.record(server['url'], latency_ms)
+        delay = provider._hedge_delay(server['url'])
+        provider.close()
+        return delay
+    
+    settings = DataProvider(server).hedge_settings
+    assert hedge_delay([200] * 5) == settings['min_delay']  # Мало замеров
+    assert hedge_delay([200] * 100) == 0.2
+    # Тяжелый хвост: ждем p95, а не min_delay - иначе дубль уходил бы почти на каждый запрос
+    assert hedge_delay([600 if i % 10 == 0 else 200 for i in range(100)]) == 0.6
+    assert hedge_delay([5000] * 100) == settings['max_delay']
+
+def test_working_requests_do_not_affect_server_choice():
+    fast, slow = {'name': 'fast', 'url': 'http://127.0.0.1:1'}, {'name': 'slow', 'url': 'http://127.0.0.1:2'}
+    latency = LatencyProber([fast, slow])
+    for _ in range(20):
+        latency.record(fast['url'], 10, probe=True)
+        latency.record(slow['url'], 20, probe=True)
+        latency.record(fast['url'], 500)  # Большие ответы и дубли на активном сервере
+    
+    assert latency.best_server() is fast
+    assert latency.percentiles(fast)[50] == 10
+    assert latency.request_percentiles(fast['url'])[50] == 500
+    assert latency.request_percentiles(slow['url']) is None
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from trading import kernels
+
+BACKENDS = [
+    pytest.param('numba', marks=pytest.mark.skipif(not kernels.NUMBA_AVAILABLE, reason="numba не установлен")),
+    'numpy'
+]
+
+def make_candles(n=10_000, rows=3, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(size=(rows, n)), axis=1)
+    spread = rng.random((rows, n))
+    return close + spread, close - spread, close
+
+CASES = {
+    'ema': lambda high, low, close, backend: kernels.ema(close, 26, backend=backend),
+    'wilder': lambda high, low, close, backend: kernels.ema(close, 14, alpha=1 / 14, backend=backend),
+    'atr': lambda high, low, close, backend: kernels.atr(high, low, close, 14, backend=backend),
+    'psar': lambda high, low, close, backend: kernels.psar(high, low, backend=backend)
+}
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_backend_matches_python_loop(name, backend):
+    candles = make_candles()
+    reference = CASES[name](*candles, 'python')
+    result = CASES[name](*candles, backend)
+    
+    assert np.array_equal(np.isnan(result), np.isnan(reference))
+    # Относительное отклонение: ошибка округления растет с уровнем цен
+    scale = np.maximum(np.abs(reference), 1.0)
+    assert np.nanmax(np.abs(result - reference) / scale) <= 1e-9
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        kernels.ema(np.ones(30), 26, backend='cuda')
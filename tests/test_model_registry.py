@@ -0,0 +1,59 @@
+import numpy as np
+
+from trading.candle_frame import CandleFrame
+from trading.candle_store import CandleStore
+from trading.model_registry import ModelRegistry
+from trading.model_store import ModelStore
+
+def make_frame(count, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(count, dtype=np.int64) * 60_000
+    closes = 30_000 + np.cumsum(rng.normal(scale=20, size=count))
+    return CandleFrame.from_columns(timestamps, np.vstack([closes] * 4 + [np.ones(count)] * 2))
+
+def test_registry_flags_loaded_and_trained_models(tmp_path):
+    frame = make_frame(200)
+    store = ModelStore(str(tmp_path))
+    
+    trained = ModelRegistry(lookback=10, horizon=5, store=store).get('BTCUSDT', '1', lambda: frame)
+    assert trained.is_model_trained and trained.source == 'trained'
+    
+    def no_history():
+        raise AssertionError("модель с диска не обучается заново")
+    loaded = ModelRegistry(lookback=10, horizon=5, store=store).get('BTCUSDT', '1', no_history)
+    assert loaded.is_model_trained and loaded.source == 'store'
+
+def test_predict_many_matches_single_models_and_skips_missing():
+    registry = ModelRegistry(max_models=2, lookback=10, horizon=5)
+    frames = {symbol: make_frame(200, seed) for seed, symbol in enumerate(('BTCUSDT', 'ETHUSDT', 'SOLUSDT'))}
+    for symbol, frame in frames.items():
+        registry.get(symbol, '1', lambda frame=frame: frame)
+    assert registry.stats['evictions'] == 1 and registry.peek('BTCUSDT', '1') is None
+    
+    closes = {symbol: frame['close'] for symbol, frame in frames.items()}
+    closes['ETHUSDT'] = closes['ETHUSDT'][:5]  # Короче lookback
+    closes['XRPUSDT'] = frames['SOLUSDT']['close']  # Модели нет
+    result = registry.predict_many(closes, '1')
+    
+    assert set(result) == set(closes)
+    assert result['BTCUSDT'] is None  # Вытеснена из реестра
+    assert result['ETHUSDT'] is None and result['XRPUSDT'] is None
+    expected = registry.peek('SOLUSDT', '1').predict_future_prices(closes['SOLUSDT'])
+    assert np.allclose(result['SOLUSDT'], expected)
+
+def test_model_trained_on_other_candles_is_stale(tmp_path):
+    candles = CandleStore(str(tmp_path / 'candles'))
+    frame = make_frame(200)
+    candles.write('BTCUSDT', '1', frame)
+    store = ModelStore(str(tmp_path / 'models'), candles=candles)
+    ModelRegistry(lookback=10, horizon=5, store=store).get('BTCUSDT', '1', lambda: frame)
+    now_ms = int(frame.timestamp[-1])
+    
+    key = ('BTCUSDT', '1', 10, 5)
+    assert store.load(key, now_ms).stale is False
+    
+    # История пары переписана другими свечами (например, архив загружен заново) - модель устарела
+    candles.write('BTCUSDT', '1', make_frame(200, seed=1))
+    assert store.load(key, now_ms).stale is True
+    # Окно обучения не покрыто переданными свечами - сверять не с чем, решает возраст
+    assert store.load(key, now_ms, price_data=frame[100:]).stale is False
@@ -0,0 +1,36 @@
+import tracemalloc
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+from trading.ai_predictor import build_training_set
+from trading.online_model import OnlineLinearModel
+
+def test_rls_matches_linear_regression_on_full_history():
+    # RLS без забывания, обученный на половине и дообученный по одной свече, - как LinearRegression на всем
+    rng = np.random.default_rng(0)
+    prices = 30_000 + np.cumsum(rng.normal(scale=20, size=5_000))
+    X, y = build_training_set(prices, 10, 5)
+    half = len(X) // 2
+    
+    model = OnlineLinearModel().fit(X[:half], y[:half])
+    for i in range(half, len(X)):
+        model.partial_fit(X[i], y[i])
+    reference = LinearRegression().fit(X, y)
+    
+    expected = reference.predict(X[-100:])
+    assert np.allclose(model.predict(X[-100:]), expected, rtol=1e-9, atol=0)
+
+def test_float32_fit_does_not_copy_training_set_to_float64():
+    rng = np.random.default_rng(1)
+    prices = (30_000 + np.cumsum(rng.normal(scale=20, size=300_000))).astype(np.float32)
+    X, y = build_training_set(prices, 10, 5, np.float32)
+    
+    tracemalloc.start()
+    model = OnlineLinearModel().fit(X, y)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    
+    assert peak < X.shape[0] * (X.shape[1] + 1) * 8 / 2  # Меньше половины копии выборки в float64
+    reference = OnlineLinearModel().fit(X.astype(np.float64), y.astype(np.float64))
+    assert np.allclose(model.predict(X[-100:]), reference.predict(X[-100:]), rtol=1e-9)
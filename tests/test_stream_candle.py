@@ -0,0 +1,29 @@
+import numpy as np
+
+from trading.candle_frame import CandleFrame
+from trading.candle_store import CandleStore
+from trading.data_provider import DataProvider
+
+MINUTE = 60_000
+
+def stream_candle(start, close, confirm):
+    return {'start': start, 'open': 100, 'high': 102, 'low': 99, 'close': close,
+            'volume': 1, 'turnover': 100, 'confirm': confirm}
+
+def test_only_confirmed_stream_candles_reach_store(tmp_path):
+    store = CandleStore(str(tmp_path))
+    provider = DataProvider({'name': 'local', 'url': 'http://127.0.0.1:1'}, store=store)
+    timestamps = np.arange(10, dtype=np.int64) * MINUTE
+    provider.get_buffer('BTCUSDT', '1').merge(
+        CandleFrame.from_columns(timestamps, np.full((6, len(timestamps)), 100.0)))
+    
+    forming = 10 * MINUTE
+    for close in (101, 102, 103):
+        provider.apply_stream_candle('BTCUSDT', '1', stream_candle(forming, close, False))
+    assert store.count('BTCUSDT', '1') == 0
+    assert provider.get_buffer('BTCUSDT', '1').last_timestamp == forming
+    
+    provider.apply_stream_candle('BTCUSDT', '1', stream_candle(forming, 104, True))
+    stored = store.read('BTCUSDT', '1')
+    assert list(stored.timestamp) == [forming] and stored['close'][-1] == 104
+    provider.close()
@@ -0,0 +1,37 @@
+import numpy as np
+
+from trading.candle_frame import CandleFrame
+from trading.indicators import TechnicalIndicators
+from trading.streaming_indicators import StreamingIndicators
+
+KEYS = ('sma_20', 'sma_50', 'rsi', 'macd', 'macd_signal', 'macd_hist',
+        'bb_upper', 'bb_middle', 'bb_lower', 'bb_position', 'volume_ratio')
+
+def random_walk(n=3_000, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = 30_000 + np.cumsum(rng.normal(scale=20, size=n))
+    volumes = rng.lognormal(size=n)
+    return CandleFrame.from_columns(np.arange(n) * 60_000, np.vstack([closes] * 4 + [volumes, volumes * closes]))
+
+def test_streaming_values_match_batch_series():
+    frame = random_walk()
+    series = TechnicalIndicators().calculate_series(frame)
+    stream = StreamingIndicators()
+    
+    for i in range(len(frame)):
+        candle = {'timestamp': frame.timestamp[i], 'close': frame.close[i], 'volume': frame.volume[i]}
+        # Формирующаяся свеча i (peek), затем та же свеча закрытой (update) - значение в точке i
+        for values in (stream.peek(candle), stream.update(candle)):
+            for key in KEYS:
+                assert np.isclose(values[key], series[key][i], rtol=1e-9, atol=1e-9, equal_nan=True), (key, i)
+    
+    assert stream.count == len(frame) and stream.last_timestamp == frame.timestamp[-1]
+
+def test_peek_does_not_change_state():
+    frame = random_walk(200)
+    stream = StreamingIndicators.from_frame(frame)
+    last = {'timestamp': frame.timestamp[-1], 'close': frame.close[-1], 'volume': frame.volume[-1]}
+    
+    before = stream.peek(last)
+    stream.peek({'timestamp': frame.timestamp[-1], 'close': frame.close[-1] * 1.1, 'volume': 1.0})
+    assert stream.peek(last) == before
@@ -1,68 +1,214 @@
+import hashlib
+import threading
+import time
+from collections import deque
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 import warnings
 warnings.filterwarnings('ignore')
 
+from config import PREDICTOR_SETTINGS, MULTI_TIMEFRAME_SETTINGS
+from trading.online_model import OnlineLinearModel
+
+def build_training_set(prices, lookback=10, forecast=5, dtype=np.float64):
+    """Обучающие примеры скользящим окном: X - lookback цен, y - следующие forecast цен
+    
+    X и y - представления одного массива цен (sliding_window_view) без
+    копирования окон.
+    """
+    prices = np.asarray(prices, dtype=dtype)
+    if len(prices) < lookback + forecast:
+        return np.empty((0, lookback), dtype=dtype), np.empty((0, forecast), dtype=dtype)
+    windows = sliding_window_view(prices, lookback + forecast)
+    return windows[:, :lookback], windows[:, lookback:]
+
+def fit_price_model(prices, lookback=10, forecast=5, dtype=np.float64, online=True, forgetting=1.0):
+    """Обучение модели на ценах закрытия: (модель, средняя ошибка на обучении в %) или None
+    
+    Модуль верхнего уровня, чтобы обучение можно было запустить в отдельном процессе.
+    """
+    X, y = build_training_set(prices, lookback, forecast, dtype)
+    if len(X) < 5:  # Нужно минимум 5 примеров
+        return None
+    model = OnlineLinearModel(forgetting) if online else LinearRegression()
+    model.fit(X, y)
+    # Ошибка последнего шага прогноза на недавних примерах - база для поиска дрейфа
+    recent_X, recent_y = X[-500:], y[-500:, -1]
+    error = float(np.mean(np.abs(model.predict(recent_X)[:, -1] - recent_y) / np.abs(recent_y)) * 100)
+    return model, error
+
+def training_info(price_data):
+    """Описание обучающего окна: границы, число свечей и отпечаток цен закрытия"""
+    timestamps = np.asarray(price_data['timestamp'])
+    closes = np.ascontiguousarray(price_data['close'], dtype=np.float64)
+    return {
+        'first_timestamp': int(timestamps[0]),
+        'last_timestamp': int(timestamps[-1]),
+        'candles': len(closes),
+        'fingerprint': hashlib.blake2b(closes.tobytes(), digest_size=8).hexdigest()
+    }
+
+def stack_models(predictors):
+    """Коэффициенты моделей одной формы в тензорах: (coef N × forecast × lookback, intercept N × forecast)
+    
+    Для необученных моделей строки заполняются NaN.
+    """
+    trained = [predictor.snapshot for predictor in predictors if predictor.snapshot is not None]
+    if not trained:
+        return None, None
+    coef_shape, intercept_shape = trained[0][0].shape, trained[0][1].shape
+    coef = np.full((len(predictors),) + coef_shape, np.nan)
+    intercept = np.full((len(predictors),) + intercept_shape, np.nan)
+    for i, predictor in enumerate(predictors):
+        snapshot = predictor.snapshot
+        if snapshot is not None:
+            coef[i], intercept[i] = snapshot
+    return coef, intercept
+
+def predict_batch(windows, coef, intercept):
+    """Предсказания для N пар одним einsum: windows - последние lookback цен (N × lookback)"""
+    return np.einsum('nmk,nk->nm', coef, np.asarray(windows, dtype=np.float64)) + intercept
+
 class AIPredictor:
-    def __init__(self):
-        self.prediction_model = LinearRegression()
+    # Веса для различных факторов принятия решения (общие с trading.backtester)
+    DECISION_WEIGHTS = {
+        'trend': 0.25,  # Тренд
+        'momentum': 0.25,  # Моментум
+        'volatility': 0.15,  # Волатильность
+        'volume': 0.15,  # Объем
+        'prediction': 0.2  # Предсказания AI
+    }
+    
+    @classmethod
+    def decision_weights(cls, higher_tf_weight=0.0):
+        """Веса факторов с трендом старших таймфреймов: остальные уменьшаются, сумма весов - 1"""
+        weights = {name: weight * (1 - higher_tf_weight) for name, weight in cls.DECISION_WEIGHTS.items()}
+        weights['higher_timeframes'] = higher_tf_weight
+        return weights
+    
+    def __init__(self, lookback=None, forecast=None, use_float32=None, online=None):
+        # Онлайн-модель дообучается на новых свечах (update_model), LinearRegression - только заново
+        self.online = PREDICTOR_SETTINGS['online'] if online is None else online
+        self.forgetting = PREDICTOR_SETTINGS['forgetting']
+        self.prediction_model = OnlineLinearModel(self.forgetting) if self.online else LinearRegression()
         self.scaler = StandardScaler()
         self.is_model_trained = False
+        self.last_timestamp = None  # Время последней свечи, на которой училась модель
+        # Коэффициенты для предсказания: кортеж (coef, intercept) заменяется целиком,
+        # поэтому predict_future_prices не ждет обучения и не видит модель наполовину
+        self.snapshot = None
+        self.lock = threading.Lock()  # Изменение модели: дообучение и подмена обученной в фоне
+        self.train_error = None       # Ошибка прогноза на обучении, %
+        self.errors = deque(maxlen=PREDICTOR_SETTINGS['drift_window'])  # Ошибки на новых свечах, %
+        self.trained_at = None        # time.monotonic() последнего обучения
+        self.train_info = None        # training_info() обучающего окна
+        self.stale = False            # Загружена с диска устаревшей - нужно переобучение
+        self.higher_tf_weight = MULTI_TIMEFRAME_SETTINGS['decision_weight']  # Вес старших таймфреймов в решении
+        self.source = None            # Откуда модель в реестре: 'store' - загружена с диска, 'trained' - обучена
+        self.lookback = lookback or PREDICTOR_SETTINGS['lookback']
+        self.forecast = forecast or PREDICTOR_SETTINGS['forecast']
+        use_float32 = PREDICTOR_SETTINGS['float32'] if use_float32 is None else use_float32
+        self.dtype = np.float32 if use_float32 else np.float64
         
     def train_prediction_model(self, price_data):
-        """Обучение модели для предсказания цены"""
+        """Обучение модели для предсказания цены на закрытых свечах price_data"""
         if len(price_data) < 30:  # Нужно минимум 30 точек для обучения
             return None
             
         try:
-            # Подготовка данных для обучения
-            prices = price_data['close'].values  # Берем только цены закрытия
-            
-            # Создаем признаки: предыдущие цены
-            X = []  # Признаки (исторические данные)
-            y = []  # Целевые значения (будущие цены)
-            
-            lookback = 10  # Смотрим на 10 предыдущих свечей
-            forecast = 5   # Предсказываем на 5 свечей вперед
-            
-            # Создаем обучающие примеры
-            for i in range(lookback, len(prices) - forecast):
-                X.append(prices[i-lookback:i])  # 10 предыдущих цен
-                y.append(prices[i:i+forecast])  # 5 следующих цен
-            
-            if len(X) < 5:  # Нужно минимум 5 примеров
+            # Признаки - lookback предыдущих цен закрытия, цели - forecast следующих
+            fitted = fit_price_model(price_data['close'], self.lookback, self.forecast, self.dtype,
+                                     self.online, self.forgetting)
+            if fitted is None:
                 return None
                 
-            X = np.array(X)  # Преобразуем в numpy массивы
-            y = np.array(y)
-            
-            # Обучаем модель
-            self.prediction_model.fit(X, y)
-            self.is_model_trained = True
-            
+            self.swap_model(*fitted, int(price_data['timestamp'][-1]), training_info(price_data))
             return self.prediction_model
             
         except Exception as e:
             print(f"Ошибка обучения модели: {e}")
             return None
     
+    def swap_model(self, model, train_error, last_timestamp, info=None):
+        """Подмена модели обученной (в том числе в другом процессе) и публикация ее коэффициентов"""
+        with self.lock:
+            self.prediction_model = model
+            self.train_error = train_error
+            self.last_timestamp = last_timestamp
+            self.train_info = info
+            self.stale = False
+            self.errors.clear()
+            self._publish()
+            self.is_model_trained = True
+            self.trained_at = time.monotonic()
+    
+    def _publish(self):
+        self.snapshot = (np.array(self.prediction_model.coef_, dtype=np.float64),
+                         np.array(self.prediction_model.intercept_, dtype=np.float64))
+    
+    def nbytes(self):
+        """Память под параметры модели, байт"""
+        model = self.prediction_model
+        arrays = [getattr(model, name, None) for name in ('weights', 'P', 'coef_', 'intercept_')]
+        if self.snapshot is not None:
+            arrays.extend(self.snapshot)
+        return sum(array.nbytes for array in arrays if array is not None) + 8 * len(self.errors)
+    
+    def drift(self):
+        """Во сколько раз ошибка на новых свечах выше ошибки на обучении (None - мало данных)"""
+        if not self.train_error or len(self.errors) < self.errors.maxlen // 2:
+            return None
+        return float(np.mean(self.errors)) / self.train_error
+    
+    def update_model(self, price_data):
+        """Учет закрытых свечей, появившихся после прошлого обучения
+        
+        Последняя свеча price_data считается формирующейся. По каждой новой свече
+        запоминается ошибка прогноза (для drift), онлайн-модель дообучается на
+        ней за O(lookback²); возвращает число новых примеров.
+        """
+        if not self.is_model_trained:
+            return 0
+        
+        try:
+            timestamps = np.asarray(price_data['timestamp'])[:-1]
+            X, y = build_training_set(np.asarray(price_data['close'])[:-1], self.lookback, self.forecast, self.dtype)
+            with self.lock:
+                # Пример i заканчивается свечой i + lookback + forecast - 1
+                new = len(timestamps) - int(np.searchsorted(timestamps, self.last_timestamp, side='right'))
+                new = min(new, len(X))
+                if new <= 0:
+                    return 0
+                coef, intercept = self.snapshot
+                predicted = X[-new:] @ coef[-1] + intercept[-1]
+                self.errors.extend(np.abs(predicted - y[-new:, -1]) / np.abs(y[-new:, -1]) * 100)
+                if hasattr(self.prediction_model, 'partial_fit'):
+                    for i in range(len(X) - new, len(X)):
+                        self.prediction_model.partial_fit(X[i], y[i])
+                    self._publish()
+                self.last_timestamp = int(timestamps[-1])
+            return new
+            
+        except Exception as e:
+            print(f"Ошибка дообучения модели: {e}")
+            return 0
+    
     def predict_future_prices(self, current_prices, steps=5):
         """Предсказание будущих цен"""
-        if not self.is_model_trained or len(current_prices) < 10:  # Проверка готовности модели
+        snapshot = self.snapshot  # Коэффициенты могут быть заменены фоновым обучением
+        if snapshot is None or len(current_prices) < self.lookback:  # Проверка готовности модели
             return None
             
         try:
-            # Берем последние 10 цен для предсказания
-            if len(current_prices) > 10:
-                input_data = current_prices[-10:]
-            else:
-                input_data = current_prices
-                
-            input_data = np.array(input_data).reshape(1, -1)  # Подгоняем под формат модели
+            # Берем последние lookback цен для предсказания
+            input_data = np.asarray(current_prices[-self.lookback:], dtype=np.float64)
             
             # Предсказываем
-            prediction = self.prediction_model.predict(input_data)[0]
+            coef, intercept = snapshot
+            prediction = coef @ input_data + intercept
             
             return prediction
             
@@ -70,19 +216,17 @@ class AIPredictor:
             print(f"Ошибка предсказания: {e}")
             return None
             
-    def ai_trading_decision(self, indicators, future_prices=None, aggressiveness=0.7, commission=0.1, min_profit=0.2):
-        """Улучшенный AI для принятия торговых решений с учетом предсказаний"""
+    def ai_trading_decision(self, indicators, future_prices=None, aggressiveness=0.7, commission=0.1, min_profit=0.2,
+                            higher_timeframes=None):
+        """Улучшенный AI для принятия торговых решений с учетом предсказаний
+        
+        higher_timeframes - {интервал: индикаторы} старших таймфреймов для
+        подтверждения тренда; учитываются с весом higher_tf_weight (по умолчанию 0).
+        """
         if indicators is None:
             return "HOLD", 0.5
         
-        # Веса для различных факторов принятия решения
-        weights = {
-            'trend': 0.25,  # Тренд
-            'momentum': 0.25,  # Моментум
-            'volatility': 0.15,  # Волатильность
-            'volume': 0.15,  # Объем
-            'prediction': 0.2  # Предсказания AI
-        }
+        weights = self.decision_weights(self.higher_tf_weight)
         
         # Анализ тренда
         trend_score = 0
@@ -129,13 +273,23 @@ class AIPredictor:
             elif predicted_change < -0.5:  # Предсказано падение >0.5%
                 prediction_score -= 1
         
+        # Анализ старших таймфреймов: совпадение тренда (от -2 до 2)
+        higher_tf_score = 0
+        if higher_timeframes and weights['higher_timeframes']:
+            votes = []
+            for htf in higher_timeframes.values():
+                bullish = int(htf['sma_20'] > htf['sma_50']) + int(htf['macd'] > 0)
+                votes.append(bullish - 1)  # -1 медвежий, 0 смешанный, 1 бычий
+            higher_tf_score = 2 * sum(votes) / len(votes)
+        
         # Общий счет с весами
         total_score = (
             trend_score * weights['trend'] +
             momentum_score * weights['momentum'] +
             volatility_score * weights['volatility'] +
             volume_score * weights['volume'] +
-            prediction_score * weights['prediction']
+            prediction_score * weights['prediction'] +
+            higher_tf_score * weights['higher_timeframes']
         )
         
         total_score *= aggressiveness  # Учет агрессивности
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from config import BACKFILL_SETTINGS
+from trading.candle_buffer import interval_to_ms
+from trading.candle_frame import CandleFrame
+
+class TokenBucket:
+    """Ограничение частоты запросов: rate жетонов в секунду, не больше burst подряд"""
+    
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Ожидание свободного жетона"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class BackfillJob:
+    """Параллельная догрузка истории [start_ms, end_ms) для нескольких пар
+    
+    Диапазон делится на окна по max_kline_limit свечей, окна загружаются пулом
+    потоков под общим лимитом частоты запросов. Загруженные свечи копятся и
+    пишутся в CandleStore пачками; окна отмечаются в JSON-чекпоинте только
+    после записи, поэтому прерванная загрузка продолжается с того же места.
+    
+    Чекпоинт привязан к интервалу и набору пар, а не к диапазону: если в нем
+    есть незагруженные окна, задание продолжает диапазон из чекпоинта
+    (диапазон «последние N дней» сдвигается при каждом запуске). restart=True
+    начинает загрузку заново с переданным диапазоном.
+    """
+    
+    def __init__(self, provider, store, symbols, interval, start_ms, end_ms, settings=None, checkpoint_path=None,
+                 restart=False):
+        self.settings = dict(BACKFILL_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+        
+        self.interval_ms = interval_to_ms(interval)
+        if self.interval_ms is None:
+            raise ValueError(f"Неподдерживаемый интервал: {interval}")
+        
+        self.provider = provider
+        self.store = store
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.interval = str(interval)
+        # Границы выравниваются по началу свечи
+        self.start_ms = start_ms // self.interval_ms * self.interval_ms
+        self.end_ms = end_ms
+        self.window_ms = provider.max_kline_limit * self.interval_ms
+        
+        self.checkpoint_path = checkpoint_path or os.path.join(
+            self.settings['checkpoint_dir'], f"{self.interval}_{'-'.join(sorted(set(self.symbols)))}.json")
+        self.done = {}  # symbol -> множество начал готовых окон
+        self.resumed = False
+        if not restart:
+            self._resume()
+        self.bucket = TokenBucket(self.settings['rate_limit'], self.settings['burst'])
+        self.stats = {'candles': 0, 'windows': 0, 'requests': 0, 'errors': 0, 'seconds': 0.0}
+        self.stats_lock = threading.Lock()
+    
+    def windows(self, symbol):
+        """Окна [начало, конец) пары, еще не отмеченные в чекпоинте"""
+        done = self.done.get(symbol, set())
+        return [(start, min(start + self.window_ms, self.end_ms))
+                for start in range(self.start_ms, self.end_ms, self.window_ms) if start not in done]
+    
+    def _resume(self):
+        """Продолжение незавершенной загрузки из чекпоинта (диапазон и готовые окна)"""
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        if data.get('interval') != self.interval:
+            return
+        
+        requested = (self.start_ms, self.end_ms)
+        self.start_ms, self.end_ms = data['start'], data['end']
+        self.done = {symbol: set(starts) for symbol, starts in data['done'].items()}
+        if any(self.windows(symbol) for symbol in self.symbols):
+            self.resumed = True
+        else:
+            # Прошлая загрузка завершена - новый диапазон с чистого листа
+            self.start_ms, self.end_ms = requested
+            self.done = {}
+    
+    def _save_checkpoint(self):
+        """Атомарная запись чекпоинта"""
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            'interval': self.interval,
+            'start': self.start_ms,
+            'end': self.end_ms,
+            'done': {symbol: sorted(starts) for symbol, starts in self.done.items()}
+        }
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.checkpoint_path)
+    
+    def _fetch_window(self, symbol, start, end):
+        """Загрузка одного окна с повторами при ошибках"""
+        for attempt in range(self.settings['retries'] + 1):
+            self.bucket.acquire()
+            with self.stats_lock:
+                self.stats['requests'] += 1
+            try:
+                return self.provider.fetch_klines(symbol, self.interval, start, end - 1, self.provider.max_kline_limit)
+            except Exception:
+                with self.stats_lock:
+                    self.stats['errors'] += 1
+                if attempt == self.settings['retries']:
+                    raise
+                time.sleep(self.settings['retry_delay'] * 2 ** attempt)
+    
+    def _flush(self, pending):
+        """Запись накопленных окон в архив одной пачкой на пару и обновление чекпоинта"""
+        for symbol, items in pending.items():
+            if not items:
+                continue
+            items.sort(key=lambda item: item[0])
+            self.store.write(symbol, self.interval, CandleFrame.concat([frame for _, frame in items]))
+            self.done.setdefault(symbol, set()).update(start for start, _ in items)
+        pending.clear()
+        self._save_checkpoint()
+    
+    def run(self):
+        """Загрузка всех оставшихся окон; возвращает статистику"""
+        tasks = [(symbol, start, end) for symbol in self.symbols for start, end in self.windows(symbol)]
+        pending = {}  # symbol -> [(начало окна, CandleFrame)]
+        buffered = 0
+        started = time.perf_counter()
+        
+        executor = ThreadPoolExecutor(max_workers=self.settings['workers'])
+        try:
+            futures = {executor.submit(self._fetch_window, *task): task for task in tasks}
+            for future in as_completed(futures):
+                symbol, start, end = futures[future]
+                try:
+                    frame = future.result()
+                except Exception as e:
+                    print(f"Ошибка загрузки {symbol} [{start}, {end}): {e}")
+                    continue
+                
+                pending.setdefault(symbol, []).append((start, frame))
+                buffered += len(frame)
+                with self.stats_lock:
+                    self.stats['candles'] += len(frame)
+                    self.stats['windows'] += 1
+                if buffered >= self.settings['flush_candles']:
+                    self._flush(pending)
+                    buffered = 0
+        finally:
+            # При прерывании сохраняется все, что уже загружено
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._flush(pending)
+            self.stats['seconds'] = time.perf_counter() - started
+        
+        return dict(self.stats, remaining=sum(len(self.windows(symbol)) for symbol in self.symbols))
+    
+    def report(self):
+        """Итог загрузки: свечи, окна и пропускная способность"""
+        seconds = self.stats['seconds']
+        rate = self.stats['candles'] / seconds if seconds else 0
+        return (f"Загружено {self.stats['candles']} свечей ({self.stats['windows']} окон, "
+                f"{self.stats['requests']} запросов, {self.stats['errors']} ошибок) "
+                f"за {seconds:.1f} с: {rate:.0f} свечей/с")
+
+def _parse_date(value):
+    """'2024-01-31' или '2024-01-31T12:00' (UTC) -> мс"""
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+def main():
+    """Командная строка: python -m trading.backfill BTCUSDT ETHUSDT --interval 1 --days 90"""
+    from config import BYBIT_SERVERS
+    from trading.candle_store import CandleStore
+    from trading.data_provider import DataProvider
+    
+    parser = argparse.ArgumentParser(description="Параллельная догрузка истории BYBIT в локальный архив")
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--interval', default='1')
+    parser.add_argument('--days', type=float, default=30, help="Глубина истории, если не задан --start")
+    parser.add_argument('--start', default=None, help="Начало диапазона (UTC), например 2024-01-01")
+    parser.add_argument('--end', default=None, help="Конец диапазона (UTC), по умолчанию - сейчас")
+    parser.add_argument('--workers', type=int, default=BACKFILL_SETTINGS['workers'])
+    parser.add_argument('--rate', type=float, default=BACKFILL_SETTINGS['rate_limit'], help="Запросов в секунду")
+    parser.add_argument('--dir', default=None)
+    parser.add_argument('--restart', action='store_true', help="Не продолжать незавершенную загрузку из чекпоинта")
+    args = parser.parse_args()
+    
+    end_ms = _parse_date(args.end) if args.end else int(time.time() * 1000)
+    start_ms = _parse_date(args.start) if args.start else end_ms - int(args.days * 24 * 60 * 60_000)
+    
+    store = CandleStore(args.dir)
+    provider = DataProvider(BYBIT_SERVERS[0], store=store)
+    job = BackfillJob(provider, store, args.symbols, args.interval, start_ms, end_ms,
+                      settings={'workers': args.workers, 'rate_limit': args.rate}, restart=args.restart)
+    if job.resumed:
+        print(f"Продолжение загрузки из чекпоинта {job.checkpoint_path} "
+              f"({datetime.fromtimestamp(job.start_ms / 1000, timezone.utc):%Y-%m-%d %H:%M} - "
+              f"{datetime.fromtimestamp(job.end_ms / 1000, timezone.utc):%Y-%m-%d %H:%M} UTC)")
+    try:
+        stats = job.run()
+        if stats['remaining']:
+            print(f"Не загружено окон: {stats['remaining']} (повторный запуск продолжит с чекпоинта)")
+    except KeyboardInterrupt:
+        print("Прервано, прогресс сохранен в чекпоинте")
+    finally:
+        provider.close()
+    print(job.report())
+
+if __name__ == "__main__":
+    main()
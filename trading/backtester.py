@@ -0,0 +1,297 @@
+import argparse
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import BACKTEST_SETTINGS, DEFAULT_SETTINGS, PREDICTOR_SETTINGS, MULTI_TIMEFRAME_SETTINGS
+from trading.ai_predictor import AIPredictor, fit_price_model
+from trading.candle_buffer import interval_to_ms
+from trading.candle_frame import CandleFrame, VALUE_COLUMNS
+from trading.indicators import TechnicalIndicators
+from trading.resampler import resample
+
+MIN_CANDLES = 50  # Как в calculate_advanced_indicators: раньше сигнал - HOLD
+
+def walk_forward_forecasts(closes, lookback, forecast, train_window, refit_every):
+    """Прогноз цены через forecast свечей для каждой свечи (NaN до первого обучения)
+    
+    Модель обучается на train_window свечах перед началом каждого блока из
+    refit_every свечей и предсказывает весь блок одним матричным умножением,
+    поэтому прогноз свечи использует только более ранние данные. Дообучение
+    RLS между переобучениями не моделируется.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    n = len(closes)
+    result = np.full(n, np.nan)
+    windows = sliding_window_view(closes, lookback)  # windows[i] заканчивается свечой i + lookback - 1
+    refits = 0
+    for start in range(max(train_window, lookback), n, refit_every):
+        fitted = fit_price_model(closes[start - train_window:start], lookback, forecast, online=False)
+        if fitted is None:
+            continue
+        model = fitted[0]
+        end = min(start + refit_every, n)
+        result[start:end] = windows[start - lookback + 1:end - lookback + 1] @ model.coef_[-1] + model.intercept_[-1]
+        refits += 1
+    return result, refits
+
+def _candles(frame):
+    """CandleFrame из frame (DataFrame без части колонок - они заполняются ценой закрытия)"""
+    if isinstance(frame, CandleFrame):
+        return frame
+    closes = np.asarray(frame['close'], dtype=np.float64)
+    return CandleFrame.from_columns(np.asarray(frame['timestamp']), np.vstack([
+        np.asarray(frame[name], dtype=np.float64) if name in frame else closes for name in VALUE_COLUMNS
+    ]))
+
+def higher_timeframe_frame(frame, interval):
+    """Свечи старшего таймфрейма из свечей frame; первая неполная корзина пропускается, как в Resampler"""
+    interval_ms = interval_to_ms(interval)
+    timestamps = np.asarray(frame['timestamp'])
+    first_full = -(-int(timestamps[0]) // interval_ms) * interval_ms if len(timestamps) else 0
+    skip = int(np.searchsorted(timestamps, first_full))
+    return resample(_candles(frame)[skip:], interval), skip
+
+def higher_timeframe_votes(frame, interval, indicators=None):
+    """Голос тренда таймфрейма interval для каждой свечи frame: -1, 0, 1 (NaN - меньше 50 свечей)
+    
+    Как в торговом цикле, свеча таймфрейма, в которую попадает свеча frame,
+    еще формируется и закрывается ее ценой. SMA и EMA формирующейся свечи
+    получаются из серий calculate_series по полным свечам таймфрейма поправкой
+    на разницу закрытий, без пересчета индикаторов по каждой свече.
+    """
+    indicators = indicators or TechnicalIndicators()
+    closes = np.asarray(frame['close'], dtype=np.float64)
+    votes = np.full(len(closes), np.nan)
+    higher, skip = higher_timeframe_frame(frame, interval)
+    if len(higher) == 0:
+        return votes
+    
+    series = indicators.calculate_series(higher, outputs=('sma_20', 'sma_50', 'macd'))
+    interval_ms = interval_to_ms(interval)
+    timestamps = np.asarray(frame['timestamp'])[skip:]
+    bar = np.searchsorted(higher.timestamp, timestamps // interval_ms * interval_ms)
+    delta = closes[skip:] - series['close'][bar]  # Закрытие формирующейся свечи минус итоговое
+    
+    def ema_gain(period):
+        # Первое значение EMA - SMA period свечей, дальше - с alpha = 2 / (period + 1)
+        return np.where(bar == period - 1, 1 / period, 2 / (period + 1))
+    
+    sma_20 = series['sma_20'][bar] + delta / 20
+    sma_50 = series['sma_50'][bar] + delta / 50
+    macd = series['macd'][bar] + (ema_gain(12) - ema_gain(26)) * delta
+    vote = (sma_20 > sma_50).astype(np.float64) + (macd > 0) - 1
+    votes[skip:] = np.where(bar + 1 >= MIN_CANDLES, vote, np.nan)
+    return votes
+
+def higher_timeframe_scores(frame, intervals, indicators=None):
+    """Счет тренда старших таймфреймов для каждой свечи, как в ai_trading_decision (от -2 до 2)"""
+    votes = np.vstack([higher_timeframe_votes(frame, interval, indicators) for interval in intervals])
+    count = np.sum(~np.isnan(votes), axis=0)
+    total = np.nansum(votes, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, 2 * total / count, 0.0)
+
+def decision_scores(indicators, prices, future_prices, aggressiveness=0.7, weights=None, higher_tf_score=None):
+    """Итоговый счет AIPredictor.ai_trading_decision для каждой свечи
+    
+    indicators - серии SUMMARY_KEYS; future_prices - прогноз на последний шаг
+    (NaN - прогноза нет); higher_tf_score - счет старших таймфреймов
+    (higher_timeframe_scores). Слагаемые и порядок сложения как в ai_trading_decision.
+    """
+    weights = weights or AIPredictor.decision_weights()
+    if higher_tf_score is None:
+        higher_tf_score = 0
+    rsi = indicators['rsi']
+    bb_position = indicators['bb_position']
+    
+    trend_score = (indicators['sma_20'] > indicators['sma_50']).astype(np.int64) + (indicators['macd'] > 0)
+    momentum_score = np.select([(rsi >= 30) & (rsi <= 45), rsi < 30, rsi > 70, rsi > 55], [2, 1, -2, -1], 0)
+    volatility_score = np.select([bb_position < 0.2, bb_position > 0.8], [1, -1], 0)
+    volume_score = np.where(indicators['volume_ratio'] > 1.5, np.where(trend_score > 0, 1, -1), 0)
+    with np.errstate(invalid='ignore'):
+        predicted_change = (future_prices - prices) / prices * 100
+    prediction_score = np.select([predicted_change > 1.0, predicted_change > 0.5, predicted_change < -1.0,
+                                  predicted_change < -0.5], [2, 1, -2, -1], 0)
+    
+    total_score = (
+        trend_score * weights['trend'] +
+        momentum_score * weights['momentum'] +
+        volatility_score * weights['volatility'] +
+        volume_score * weights['volume'] +
+        prediction_score * weights['prediction'] +
+        higher_tf_score * weights['higher_timeframes']
+    )
+    return total_score * aggressiveness
+
+class Backtester:
+    """Бэктест ai_trading_decision: индикаторы, прогнозы и счет для всех свечей векторно
+    
+    Сигнал свечи считается по ее цене закрытия, позиция открывается по той же
+    цене: BUY - длинная позиция, SELL - закрытие (или короткая при allow_short).
+    Комиссия commission % списывается с каждой сделки (вход и выход отдельно).
+    Тренд старших таймфреймов учитывается, как в торговом цикле, с весом
+    higher_tf_weight (по умолчанию MULTI_TIMEFRAME_SETTINGS['decision_weight']).
+    """
+    
+    def __init__(self, settings=None, aggressiveness=None, commission=None, min_profit=None, interval='1',
+                 higher_tf_weight=None):
+        self.settings = dict(BACKTEST_SETTINGS, **(settings or {}))
+        self.aggressiveness = DEFAULT_SETTINGS['aggressiveness'] if aggressiveness is None else aggressiveness
+        self.commission = DEFAULT_SETTINGS['commission'] if commission is None else commission
+        self.min_profit = DEFAULT_SETTINGS['min_profit'] if min_profit is None else min_profit
+        self.interval = str(interval)
+        self.lookback = PREDICTOR_SETTINGS['lookback']
+        self.forecast = PREDICTOR_SETTINGS['forecast']
+        self.indicators = TechnicalIndicators()
+        self.higher_tf_weight = (MULTI_TIMEFRAME_SETTINGS['decision_weight'] if higher_tf_weight is None
+                                 else higher_tf_weight)
+        interval_ms = interval_to_ms(self.interval) or 0
+        self.higher_intervals = [] if not MULTI_TIMEFRAME_SETTINGS['enabled'] else [
+            interval for interval in MULTI_TIMEFRAME_SETTINGS['intervals'] if (interval_to_ms(interval) or 0) > interval_ms
+        ]
+    
+    def signals(self, frame):
+        """(сигналы 1 / -1 / 0, уверенность, счет, прогнозы, число обучений) по свечам frame"""
+        closes = np.asarray(frame['close'], dtype=np.float64)
+        series = self.indicators.calculate_series(frame, outputs=TechnicalIndicators.SUMMARY_KEYS)
+        forecasts, refits = walk_forward_forecasts(closes, self.lookback, self.forecast,
+                                                   self.settings['train_window'], self.settings['refit_every'])
+        higher_tf_score = None
+        if self.higher_tf_weight and self.higher_intervals:
+            higher_tf_score = higher_timeframe_scores(frame, self.higher_intervals, self.indicators)
+        score = decision_scores(series, closes, forecasts, self.aggressiveness,
+                                AIPredictor.decision_weights(self.higher_tf_weight), higher_tf_score)
+        
+        effective_commission = self.commission / 100 + self.min_profit / 100
+        signal = np.where(score > effective_commission, 1, np.where(score < -effective_commission, -1, 0))
+        signal[:MIN_CANDLES - 1] = 0
+        confidence = np.where(signal != 0, np.minimum(0.95, 0.5 + np.abs(score)), 0.5)
+        return signal, confidence, score, forecasts, refits
+    
+    def positions(self, signal):
+        """Позиция после каждой свечи: последний сигнал, протянутый вперед"""
+        target = np.where(signal > 0, 1.0, np.where(signal < 0, -1.0 if self.settings['allow_short'] else 0.0, np.nan))
+        last = np.maximum.accumulate(np.where(np.isnan(target), 0, np.arange(len(target))))
+        position = target[last]
+        return np.where(np.isnan(position), 0.0, position)
+    
+    def trades(self, timestamps, closes, position):
+        """Таблица сделок pandas: вход и выход по ценам закрытия свечей сигнала"""
+        import pandas as pd
+        
+        fee = self.commission / 100
+        changes = np.flatnonzero(np.diff(position, prepend=0.0) != 0)
+        entries = changes[position[changes] != 0]
+        next_change = np.searchsorted(changes, entries, side='right')
+        is_open = next_change >= len(changes)
+        exits = np.where(is_open, len(closes) - 1, changes[np.minimum(next_change, len(changes) - 1)])
+        side = position[entries]
+        gross = side * (closes[exits] / closes[entries] - 1)
+        return pd.DataFrame({
+            'side': np.where(side > 0, 'LONG', 'SHORT'),
+            'entry_time': timestamps[entries],
+            'entry_price': closes[entries],
+            'exit_time': timestamps[exits],
+            'exit_price': closes[exits],
+            'return_pct': (gross - fee * np.where(is_open, 1, 2)) * 100,
+            'bars': exits - entries,
+            'open': is_open
+        })
+    
+    def run(self, frame):
+        """Бэктест по свечам frame (CandleFrame или DataFrame с timestamp, close, volume)
+        
+        Возвращает словарь: timestamp, equity, position, signal, confidence,
+        score, forecast (массивы по свечам), trades (таблица) и stats.
+        """
+        started = time.perf_counter()
+        timestamps = np.asarray(frame['timestamp'])
+        closes = np.asarray(frame['close'], dtype=np.float64)
+        signal, confidence, score, forecasts, refits = self.signals(frame)
+        position = self.positions(signal)
+        
+        # Доходность позиции, открытой на закрытии свечи, - со следующей свечи
+        returns = np.zeros(len(closes))
+        returns[1:] = position[:-1] * (closes[1:] / closes[:-1] - 1)
+        returns -= np.abs(np.diff(position, prepend=0.0)) * self.commission / 100
+        equity = self.settings['initial_capital'] * np.cumprod(1 + returns)
+        
+        trades = self.trades(timestamps, closes, position)
+        closed = trades[~trades['open']]
+        drawdown = 1 - equity / np.maximum.accumulate(equity)
+        bars_per_year = 365 * 24 * 60 * 60_000 / (interval_to_ms(self.interval) or 60_000)
+        deviation = returns.std()
+        stats = {
+            'bars': len(closes),
+            'refits': refits,
+            'total_return_pct': (equity[-1] / self.settings['initial_capital'] - 1) * 100 if len(equity) else 0.0,
+            'buy_hold_return_pct': (closes[-1] / closes[0] - 1) * 100 if len(closes) else 0.0,
+            'max_drawdown_pct': float(drawdown.max()) * 100 if len(drawdown) else 0.0,
+            'sharpe': float(returns.mean() / deviation * np.sqrt(bars_per_year)) if deviation > 0 else 0.0,
+            'trades': len(trades),
+            'win_rate_pct': float((closed['return_pct'] > 0).mean()) * 100 if len(closed) else 0.0,
+            'avg_trade_pct': float(closed['return_pct'].mean()) if len(closed) else 0.0,
+            'exposure_pct': float((position != 0).mean()) * 100 if len(position) else 0.0,
+            'buy_signals': int((signal > 0).sum()),
+            'sell_signals': int((signal < 0).sum()),
+            'seconds': time.perf_counter() - started
+        }
+        return {
+            'timestamp': timestamps,
+            'equity': equity,
+            'position': position,
+            'signal': signal,
+            'confidence': confidence,
+            'score': score,
+            'forecast': forecasts,
+            'trades': trades,
+            'stats': stats
+        }
+    
+    @staticmethod
+    def report(result):
+        stats = result['stats']
+        return (f"Свечей: {stats['bars']}, обучений модели: {stats['refits']}, {stats['seconds']:.2f} с\n"
+                f"Доходность: {stats['total_return_pct']:.2f}% (купить и держать: {stats['buy_hold_return_pct']:.2f}%), "
+                f"макс. просадка: {stats['max_drawdown_pct']:.2f}%, Шарп: {stats['sharpe']:.2f}\n"
+                f"Сделок: {stats['trades']}, прибыльных: {stats['win_rate_pct']:.1f}%, "
+                f"средняя: {stats['avg_trade_pct']:.3f}%, в позиции: {stats['exposure_pct']:.1f}% времени\n"
+                f"Сигналов BUY/SELL: {stats['buy_signals']}/{stats['sell_signals']}")
+
+def main():
+    """Командная строка: python -m trading.backtester BTCUSDT --days 365 (свечи из локального архива)"""
+    from trading.backfill import _parse_date
+    from trading.candle_store import CandleStore
+    
+    parser = argparse.ArgumentParser(description="Бэктест AI сигналов на истории из локального архива")
+    parser.add_argument('symbol')
+    parser.add_argument('--interval', default='1')
+    parser.add_argument('--days', type=float, default=None, help="Последние N дней архива, если не задан --start")
+    parser.add_argument('--start', default=None, help="Начало диапазона (UTC), например 2024-01-01")
+    parser.add_argument('--end', default=None, help="Конец диапазона (UTC)")
+    parser.add_argument('--commission', type=float, default=None, help="Комиссия, %% за сделку")
+    parser.add_argument('--aggressiveness', type=float, default=None)
+    parser.add_argument('--short', action='store_true', help="SELL открывает короткую позицию")
+    parser.add_argument('--dir', default=None)
+    args = parser.parse_args()
+    
+    store = CandleStore(args.dir)
+    end_ms = _parse_date(args.end) if args.end else None
+    start_ms = _parse_date(args.start) if args.start else None
+    if start_ms is None and args.days:
+        last = store.timestamps(args.symbol, args.interval)
+        if len(last):
+            start_ms = int((end_ms or last[-1] + 1) - args.days * 24 * 60 * 60_000)
+    frame = store.read(args.symbol, args.interval, start_ms, end_ms)
+    if len(frame) < MIN_CANDLES:
+        print(f"Недостаточно свечей в архиве: {len(frame)} (загрузите историю: python -m trading.backfill {args.symbol})")
+        return
+    
+    backtester = Backtester({'allow_short': args.short}, args.aggressiveness, args.commission, interval=args.interval)
+    result = backtester.run(frame)
+    print(backtester.report(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import threading
+import numpy as np
+
+from trading.candle_frame import CandleFrame, VALUE_COLUMNS
+
+# Длительность интервалов свечей BYBIT в миллисекундах
+INTERVAL_MS = {
+    '1': 60_000,
+    '3': 3 * 60_000,
+    '5': 5 * 60_000,
+    '15': 15 * 60_000,
+    '30': 30 * 60_000,
+    '60': 60 * 60_000,
+    '120': 120 * 60_000,
+    '240': 240 * 60_000,
+    '360': 360 * 60_000,
+    '720': 720 * 60_000,
+    'D': 24 * 60 * 60_000,
+    'W': 7 * 24 * 60 * 60_000
+}
+
+def interval_to_ms(interval):
+    """Длительность интервала в мс (None для месячных и неизвестных интервалов)"""
+    return INTERVAL_MS.get(str(interval))
+
+class CandleRingBuffer:
+    """Кольцевой буфер свечей фиксированной емкости для одной пары (symbol, interval)
+    
+    Данные хранятся по колонкам и дважды (позиции i и i + capacity), поэтому
+    последние count свечей всегда доступны как непрерывные срезы без копирования.
+    """
+    
+    def __init__(self, capacity=1000, interval='1'):
+        self.capacity = capacity
+        self.interval_ms = interval_to_ms(interval)
+        
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._values = np.zeros((len(VALUE_COLUMNS), 2 * capacity), dtype=np.float64)
+        self._start = 0  # Позиция самой старой свечи
+        self.count = 0   # Количество свечей в буфере
+        self.lock = threading.Lock()  # Буфер пополняют и цикл опроса, и WebSocket поток
+        
+    def __len__(self):
+        return self.count
+        
+    @property
+    def timestamps(self):
+        """Временные метки свечей (срез без копирования)"""
+        return self._timestamps[self._start:self._start + self.count]
+        
+    @property
+    def last_timestamp(self):
+        """Время открытия последней свечи или None для пустого буфера"""
+        if self.count == 0:
+            return None
+        return int(self._timestamps[self._start + self.count - 1])
+        
+    def clear(self):
+        """Очистка буфера"""
+        self._start = 0
+        self.count = 0
+        
+    def _write(self, positions, timestamps, values):
+        """Запись свечей в обе копии хранилища"""
+        self._timestamps[positions] = timestamps
+        self._timestamps[positions + self.capacity] = timestamps
+        self._values[:, positions] = values
+        self._values[:, positions + self.capacity] = values
+        
+    def merge(self, frame):
+        """Слияние свечей (CandleFrame) по времени: перезапись совпадающих, добавление новых
+        
+        Возвращает True, если между сохраненными и новыми свечами обнаружен
+        разрыв (пропущены свечи); в этом случае новые данные не записываются.
+        """
+        timestamps = frame.timestamp
+        values = np.vstack([frame[name] for name in VALUE_COLUMNS])
+        if len(timestamps) == 0:
+            return False
+            
+        # Перезапись уже сохраненных свечей (например, еще не закрытой)
+        if self.count:
+            stored = self.timestamps
+            existing = timestamps <= stored[-1]
+            if existing.any():
+                old_ts = timestamps[existing]
+                idx = np.minimum(np.searchsorted(stored, old_ts), self.count - 1)
+                match = stored[idx] == old_ts
+                positions = (self._start + idx[match]) % self.capacity
+                self._write(positions, old_ts[match], values[:, existing][:, match])
+                timestamps, values = timestamps[~existing], values[:, ~existing]
+                
+        if len(timestamps) == 0:
+            return False
+            
+        # Проверка разрыва: первая новая свеча должна идти сразу за последней сохраненной
+        if self.interval_ms and self.count and timestamps[0] - self.last_timestamp > self.interval_ms:
+            return True
+            
+        # Добавление новых свечей (старые вытесняются при переполнении)
+        if len(timestamps) > self.capacity:
+            timestamps, values = timestamps[-self.capacity:], values[:, -self.capacity:]
+        n = len(timestamps)
+        positions = (self._start + self.count + np.arange(n)) % self.capacity
+        self._write(positions, timestamps, values)
+        
+        overflow = max(0, self.count + n - self.capacity)
+        self._start = (self._start + overflow) % self.capacity
+        self.count = min(self.capacity, self.count + n)
+        return False
+        
+    def to_frame(self, limit=None, copy=False):
+        """CandleFrame последних limit свечей
+        
+        Без copy колонки - представления хранилища: они действительны до
+        следующего merge, поэтому при записи из другого потока нужна копия.
+        """
+        count = self.count if limit is None else min(limit, self.count)
+        end = self._start + self.count
+        frame = CandleFrame.from_columns(self._timestamps[end - count:end], self._values[:, end - count:end])
+        return frame.copy() if copy else frame
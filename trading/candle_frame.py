@@ -0,0 +1,95 @@
+import numpy as np
+
+# Колонки свечи в порядке ответа /v5/market/kline
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume', 'turnover')
+VALUE_COLUMNS = COLUMNS[1:]
+
+class CandleFrame:
+    """Компактный колоночный набор свечей на непрерывных массивах NumPy
+    
+    timestamp - int64 (мс), остальные колонки - float64. Доступ по имени
+    колонки (frame['close']) возвращает сам массив без копирования, срезы
+    и tail() - представления тех же массивов. DataFrame строится только
+    по запросу через to_pandas().
+    """
+    
+    __slots__ = COLUMNS
+    
+    def __init__(self, timestamp, open, high, low, close, volume, turnover):
+        self.timestamp = timestamp
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.turnover = turnover
+    
+    @classmethod
+    def from_klines(cls, klines):
+        """Разбор ответа BYBIT (списки строк, от новых к старым) за один проход"""
+        if not klines:
+            return cls.empty()
+        
+        # Все строки сразу переводятся в float64; после транспонирования каждая колонка непрерывна
+        raw = np.array(klines, dtype=np.float64)[::-1, :len(COLUMNS)].T.copy()
+        return cls(raw[0].astype(np.int64), *raw[1:])
+    
+    @classmethod
+    def from_columns(cls, timestamp, values):
+        """Сборка из массива времени и матрицы значений формы (len(VALUE_COLUMNS), n)"""
+        return cls(np.asarray(timestamp, dtype=np.int64), *np.asarray(values, dtype=np.float64))
+    
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype=np.int64), *np.empty((len(VALUE_COLUMNS), 0), dtype=np.float64))
+    
+    @classmethod
+    def concat(cls, frames):
+        """Склейка нескольких наборов свечей"""
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return cls.empty()
+        return cls(*[np.concatenate([getattr(frame, name) for frame in frames]) for name in COLUMNS])
+    
+    def __len__(self):
+        return len(self.timestamp)
+    
+    def __getitem__(self, key):
+        """frame['close'] - колонка, frame[a:b] / frame[mask] - новый набор свечей"""
+        if isinstance(key, str):
+            if key not in COLUMNS:
+                raise KeyError(key)
+            return getattr(self, key)
+        return CandleFrame(*[getattr(self, name)[key] for name in COLUMNS])
+    
+    def __repr__(self):
+        return f"CandleFrame(len={len(self)})"
+    
+    @property
+    def columns(self):
+        return list(COLUMNS)
+    
+    @property
+    def values(self):
+        """Матрица значений формы (len(VALUE_COLUMNS), n) (копия)"""
+        return np.vstack([getattr(self, name) for name in VALUE_COLUMNS])
+    
+    @property
+    def nbytes(self):
+        """Память, занимаемая колонками"""
+        return sum(getattr(self, name).nbytes for name in COLUMNS)
+    
+    def tail(self, n):
+        """Последние n свечей (представления без копирования)"""
+        return self[max(len(self) - n, 0):]
+    
+    def copy(self):
+        return CandleFrame(*[getattr(self, name).copy() for name in COLUMNS])
+    
+    def to_pandas(self):
+        """DataFrame в формате прежнего DataProvider.get_market_data"""
+        import pandas as pd
+        
+        df = pd.DataFrame({name: getattr(self, name) for name in VALUE_COLUMNS})
+        df.insert(0, 'timestamp', pd.to_datetime(self.timestamp, unit='ms'))
+        return df
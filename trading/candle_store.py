@@ -0,0 +1,177 @@
+import os
+import threading
+import argparse
+import numpy as np
+import pandas as pd
+
+from config import CANDLE_STORE_SETTINGS
+from trading.candle_frame import CandleFrame, VALUE_COLUMNS
+
+# Колонки архива и их типы: каждая колонка - отдельный бинарный файл
+STORE_COLUMNS = [('ts', np.int64)] + [(name, np.float64) for name in VALUE_COLUMNS]
+
+class CandleStore:
+    """Локальный колоночный архив свечей на диске
+    
+    Для каждой пары (symbol, interval) хранится набор файлов ts.bin, open.bin, ...,
+    которые читаются через np.memmap. Колонка ts отсортирована и служит
+    индексом: выборка диапазона по времени - бинарный поиск O(log n).
+    """
+    
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir or CANDLE_STORE_SETTINGS['base_dir']
+        self.lock = threading.Lock()
+    
+    def _series_dir(self, symbol, interval):
+        return os.path.join(self.base_dir, symbol.upper(), str(interval))
+    
+    def _column_path(self, symbol, interval, column):
+        return os.path.join(self._series_dir(symbol, interval), f'{column}.bin')
+    
+    def _load_column(self, symbol, interval, column, dtype, mode='r'):
+        """Отображение колонки в память (пустой массив, если файла нет)"""
+        path = self._column_path(symbol, interval, column)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode=mode)
+    
+    def timestamps(self, symbol, interval='1'):
+        """Отсортированный индекс временных меток (memmap)"""
+        return self._load_column(symbol, interval, 'ts', np.int64)
+    
+    def count(self, symbol, interval='1'):
+        """Количество свечей в архиве"""
+        return len(self.timestamps(symbol, interval))
+    
+    def time_range(self, symbol, interval='1'):
+        """(первая, последняя) временная метка или None для пустого архива"""
+        ts = self.timestamps(symbol, interval)
+        if len(ts) == 0:
+            return None
+        return int(ts[0]), int(ts[-1])
+    
+    def write(self, symbol, interval, frame):
+        """Запись свечей (CandleFrame, от старых к новым)"""
+        timestamps = frame.timestamp
+        if len(timestamps) == 0:
+            return 0
+        
+        with self.lock:
+            os.makedirs(self._series_dir(symbol, interval), exist_ok=True)
+            stored = self.timestamps(symbol, interval)
+            
+            if len(stored) == 0 or timestamps[0] > stored[-1]:
+                self._append(symbol, interval, frame)
+                return len(timestamps)
+            
+            # Все более старые свечи уже есть в архиве - перезапись на месте + добавление новых
+            existing = timestamps <= stored[-1]
+            positions = np.searchsorted(stored, timestamps[existing])
+            if np.all(stored[np.minimum(positions, len(stored) - 1)] == timestamps[existing]):
+                self._update_in_place(symbol, interval, positions, frame)
+                return len(timestamps)
+            
+            # Вставка в середину или перед началом - полная перезапись колонок. Индекс - копией
+            # в памяти: в Windows файл с открытым отображением (memmap) нельзя заменить
+            stored = np.array(stored)
+            self._rewrite(symbol, interval, stored, frame)
+            return len(timestamps)
+    
+    def _append(self, symbol, interval, frame):
+        """Дописывание свечей в конец всех колонок
+        
+        Колонка ts дописывается последней: число строк берется по ней, и чтение
+        без блокировки (count, time_range) не видит свечей без значений.
+        """
+        columns = [frame[name] for name in VALUE_COLUMNS] + [frame.timestamp]
+        for (name, dtype), data in zip(STORE_COLUMNS[1:] + STORE_COLUMNS[:1], columns):
+            with open(self._column_path(symbol, interval, name), 'ab') as f:
+                f.write(np.ascontiguousarray(data, dtype=dtype).tobytes())
+    
+    def _update_in_place(self, symbol, interval, positions, frame):
+        """Перезапись уже сохраненных свечей и дописывание более новых"""
+        updated = len(positions)
+        for name in VALUE_COLUMNS:
+            column = self._load_column(symbol, interval, name, np.float64, mode='r+')
+            column[positions] = frame[name][:updated]
+            column.flush()
+            del column
+        if updated < len(frame):
+            self._append(symbol, interval, frame[updated:])
+    
+    def _rewrite(self, symbol, interval, stored, frame):
+        """Слияние с архивом и атомарная замена файлов колонок"""
+        all_ts = np.concatenate([stored, frame.timestamp])
+        
+        # Стабильная сортировка: при совпадении времени побеждает новая свеча (она идет позже)
+        order = np.argsort(all_ts, kind='stable')
+        all_ts = all_ts[order]
+        keep = np.append(all_ts[1:] != all_ts[:-1], True)
+        
+        columns = [all_ts[keep]]
+        for name in VALUE_COLUMNS:
+            merged = np.concatenate([self._load_column(symbol, interval, name, np.float64), frame[name]])
+            columns.append(merged[order][keep])
+        
+        for (name, dtype), data in zip(STORE_COLUMNS, columns):
+            path = self._column_path(symbol, interval, name)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(np.ascontiguousarray(data, dtype=dtype).tobytes())
+            os.replace(path + '.tmp', path)
+    
+    def read(self, symbol, interval='1', start=None, end=None, limit=None):
+        """CandleFrame свечей из диапазона [start, end) (не более limit последних)"""
+        # Под блокировкой: запись дописывает колонки по очереди или заменяет их целиком
+        with self.lock:
+            ts = self.timestamps(symbol, interval)
+            i0 = 0 if start is None else int(np.searchsorted(ts, start, side='left'))
+            i1 = len(ts) if end is None else int(np.searchsorted(ts, end, side='left'))
+            if limit is not None:
+                i0 = max(i0, i1 - limit)
+            if i1 <= i0:
+                return CandleFrame.empty()
+            
+            # Копируются только нужные строки каждой колонки
+            return CandleFrame(np.array(ts[i0:i1]), *[
+                np.array(self._load_column(symbol, interval, name, np.float64)[i0:i1]) for name in VALUE_COLUMNS
+            ])
+
+def main():
+    """Командная строка: python -m trading.candle_store backfill BTCUSDT --depth 100000"""
+    from config import BYBIT_SERVERS
+    from trading.data_provider import DataProvider
+    
+    parser = argparse.ArgumentParser(description="Локальный архив свечей BYBIT")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    backfill_parser = subparsers.add_parser('backfill', help="Догрузка истории назад по времени")
+    backfill_parser.add_argument('symbols', nargs='+')
+    backfill_parser.add_argument('--interval', default='1')
+    backfill_parser.add_argument('--depth', type=int, default=CANDLE_STORE_SETTINGS['backfill_depth'])
+    backfill_parser.add_argument('--dir', default=None)
+    
+    info_parser = subparsers.add_parser('info', help="Содержимое архива")
+    info_parser.add_argument('symbols', nargs='+')
+    info_parser.add_argument('--interval', default='1')
+    info_parser.add_argument('--dir', default=None)
+    
+    args = parser.parse_args()
+    store = CandleStore(args.dir)
+    
+    if args.command == 'backfill':
+        provider = DataProvider(BYBIT_SERVERS[0], store=store)
+        for symbol in args.symbols:
+            added = provider.backfill(symbol, args.interval, args.depth)
+            print(f"{symbol}: загружено {added} свечей, в архиве {store.count(symbol, args.interval)}")
+        provider.close()
+    else:
+        for symbol in args.symbols:
+            time_range = store.time_range(symbol, args.interval)
+            if time_range is None:
+                print(f"{symbol}: архив пуст")
+            else:
+                first, last = pd.to_datetime(time_range, unit='ms')
+                print(f"{symbol}: {store.count(symbol, args.interval)} свечей, {first} - {last}")
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,506 @@
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from config import HTTP_SETTINGS, MARKET_DATA_SETTINGS, STREAM_SETTINGS, HEDGE_SETTINGS
+from trading.candle_buffer import CandleRingBuffer, interval_to_ms
+from trading.candle_frame import CandleFrame, VALUE_COLUMNS
+from trading.kline_stream import KlineStream
 
 class DataProvider:
-    def __init__(self, server):
+    def __init__(self, server, http_settings=None, store=None, clock=None, latency=None, hedge_servers=None):
         self.server = server
+        self.store = store  # Локальный архив свечей (CandleStore) или None
+        self.latency = latency  # LatencyProber: учет задержки рабочих запросов по серверам
+        self.clock = clock or time  # Источник времени (модуль time или SimulatedClock при воспроизведении)
+        self.response_hooks = []  # Обработчики ответов (например, запись для воспроизведения)
+        
+        # Настройки пула соединений и таймаутов
+        self.http_settings = dict(HTTP_SETTINGS)
+        if http_settings:
+            self.http_settings.update(http_settings)
+            
+        # Сессия с пулом keep-alive соединений: DNS + TCP + TLS только при первом запросе
+        self.session = self._create_session()
+        
+        # Кольцевые буферы свечей для инкрементальной синхронизации
+        self.buffers = {}  # (symbol, interval) -> CandleRingBuffer
+        self.buffer_capacity = MARKET_DATA_SETTINGS['buffer_capacity']
+        self.max_kline_limit = MARKET_DATA_SETTINGS['max_kline_limit']
+        self.buffers_lock = threading.Lock()
+        
+        # Кэш ответов и объединение одинаковых одновременных запросов
+        self.cache_ttl = MARKET_DATA_SETTINGS['cache_ttl']
+        self.cache = {}     # (symbol, interval, limit) -> (истекает, CandleFrame)
+        self.inflight = {}  # (symbol, interval, limit) -> Future выполняющегося запроса
+        self.cache_lock = threading.Lock()
+        self.cache_stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+        
+        # Хеджирование: дубль запроса свечей на запасной сервер при медленном ответе основного
+        self.hedge_settings = dict(HEDGE_SETTINGS)
+        self.hedge_servers = list(hedge_servers or [])
+        self.hedge_tokens = self.hedge_settings['burst']
+        self.hedge_lock = threading.Lock()
+        self.hedge_stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'denied': 0}
+        self.hedge_executor = None
+        
+        # WebSocket поток свечей (создается при первом start_stream)
+        self.stream = None
+        self.data_event = threading.Event()  # Сигнал о поступлении новых данных из потока
+        
+    def _create_session(self):
+        """Создание HTTP-сессии с пулом keep-alive соединений"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.http_settings['pool_connections'],
+            pool_maxsize=self.http_settings['pool_maxsize'],
+            pool_block=self.http_settings['pool_block']
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.hooks['response'].extend(self.response_hooks)
+        return session
+        
+    def _timeout(self, read_timeout=None):
+        """Раздельные таймауты: (установка соединения, чтение ответа)"""
+        if read_timeout is None:
+            read_timeout = self.http_settings['read_timeout']
+        return (self.http_settings['connect_timeout'], read_timeout)
         
     def set_server(self, server):
         """Установка сервера"""
         self.server = server
         
+        # Соединения к старому серверу больше не нужны - закрываем пул
+        self.session.close()
+        self.session = self._create_session()
+        self.clear_cache()
+        
+    def add_response_hook(self, hook):
+        """Обработчик всех HTTP-ответов (сохраняется при смене сервера)"""
+        self.response_hooks.append(hook)
+        self.session.hooks['response'].append(hook)
+        
+    def close(self):
+        """Закрытие всех соединений"""
+        self.stop_stream()
+        if self.hedge_executor is not None:
+            self.hedge_executor.shutdown(wait=False)
+        self.session.close()
+        
     def measure_ping(self):
         """Измерение пинга до сервера BYBIT"""
         try:
             server_url = self.server['url']
             
-            start_time = time.time()
-            response = requests.get(f'{server_url}/v5/market/time', timeout=3)
+            start_time = time.perf_counter()
+            response = self.session.get(f'{server_url}/v5/market/time',
+                                        timeout=self._timeout(self.http_settings['ping_read_timeout']))
             
             if response.status_code == 200:
-                ping_time = int((time.time() - start_time) * 1000)
-                return ping_time
+                ping_time = (time.perf_counter() - start_time) * 1000
+                self._record_latency(server_url, ping_time, probe=True)
+                return int(ping_time)
             else:
                 return None
                 
         except Exception as e:
             return None
     
+    def get_server_time(self):
+        """Время сервера BYBIT в мс (None при ошибке)"""
+        try:
+            response = self.session.get(f"{self.server['url']}/v5/market/time",
+                                        timeout=self._timeout(self.http_settings['ping_read_timeout']))
+            return int(response.json()['result']['timeNano']) // 1_000_000
+        except Exception as e:
+            return None
+    
+    def _record_latency(self, server_url, latency_ms, probe=False):
+        """Учет задержки запроса (None - ошибка) в статистике сервера"""
+        if self.latency is not None:
+            self.latency.record(server_url, latency_ms, probe)
+    
+    def _get_json(self, server_url, path, params):
+        """GET к серверу с учетом задержки; возвращает разобранный JSON"""
+        start_time = time.perf_counter()
+        try:
+            response = self.session.get(f"{server_url}{path}", params=params, timeout=self._timeout())
+            data = response.json()
+        except Exception:
+            self._record_latency(server_url, None)
+            raise
+        self._record_latency(server_url, (time.perf_counter() - start_time) * 1000)
+        return data
+    
+    def set_hedging(self, enabled, servers=None):
+        """Включение хеджирования; servers - запасные серверы"""
+        self.hedge_settings['enabled'] = enabled
+        if servers is not None:
+            self.hedge_servers = list(servers)
+    
+    def _hedge_server(self):
+        """Запасной сервер для дубля: самый быстрый здоровый, иначе первый в списке"""
+        candidates = [server for server in self.hedge_servers if server['url'] != self.server['url']]
+        if not candidates:
+            return None
+        if self.latency is not None:
+            best = self.latency.best_server(candidates)
+            if best is not None:
+                return best
+        return candidates[0]
+    
+    def _hedge_delay(self, server_url):
+        """Сколько ждать основной сервер перед дублем: перцентиль его задержки в заданных границах (сек)
+        
+        Пока замеров меньше min_samples - min_delay: по малой выборке перцентиль
+        ненадежен. Число дублей ограничивает бюджет.
+        """
+        settings = self.hedge_settings
+        q = settings['percentile']
+        percentiles = self.latency.request_percentiles(server_url, (q,)) if self.latency is not None else None
+        if percentiles is None:
+            return settings['default_delay']
+        if percentiles['samples'] < settings['min_samples']:
+            return settings['min_delay']
+        return min(max(percentiles[q] / 1000, settings['min_delay']), settings['max_delay'])
+    
+    def _take_hedge_token(self):
+        """Бюджет дублей: каждый запрос добавляет budget жетона, дубль тратит один"""
+        with self.hedge_lock:
+            if self.hedge_tokens >= 1:
+                self.hedge_tokens -= 1
+                self.hedge_stats['hedged'] += 1
+                return True
+            self.hedge_stats['denied'] += 1
+            return False
+    
+    def _hedged_get(self, path, params):
+        """GET к текущему серверу; если он не ответил за свой p95 (percentile) - дубль на запасной
+        
+        Берется первый успешный ответ. Проигравший запрос отменяется, если еще
+        не начат, иначе его ответ отбрасывается.
+        """
+        primary = self.server['url']
+        alternate = self._hedge_server() if self.hedge_settings['enabled'] else None
+        if alternate is None:
+            return self._get_json(primary, path, params)
+        
+        with self.hedge_lock:
+            self.hedge_stats['requests'] += 1
+            self.hedge_tokens = min(self.hedge_settings['burst'],
+                                    self.hedge_tokens + self.hedge_settings['budget'])
+        if self.hedge_executor is None:
+            self.hedge_executor = ThreadPoolExecutor(max_workers=self.http_settings['pool_maxsize'],
+                                                     thread_name_prefix='hedge')
+        
+        first = self.hedge_executor.submit(self._get_json, primary, path, params)
+        done, _ = wait([first], timeout=self._hedge_delay(primary))
+        if done or not self._take_hedge_token():
+            return first.result()
+        
+        second = self.hedge_executor.submit(self._get_json, alternate['url'], path, params)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                if future is second:
+                    with self.hedge_lock:
+                        self.hedge_stats['hedge_wins'] += 1
+                return future.result()
+        raise error
+    
+    def hedge_info(self):
+        """Статистика хеджирования"""
+        with self.hedge_lock:
+            return dict(self.hedge_stats, tokens=self.hedge_tokens)
+    
+    def _request_klines(self, symbol, interval='1', limit=100, start=None, end=None):
+        """Запрос свечей /v5/market/kline (сырые строки BYBIT, от новых к старым)"""
+        params = {
+            'category': 'spot',
+            'symbol': symbol,
+            'interval': interval,
+            'limit': limit
+        }
+        if start is not None:
+            params['start'] = start
+        if end is not None:
+            params['end'] = end
+            
+        data = self._hedged_get('/v5/market/kline', params)
+        
+        if data['retCode'] != 0:  # Ошибка на стороне биржи
+            raise RuntimeError(f"BYBIT retCode={data['retCode']}: {data.get('retMsg', '')}")
+        return data['result']['list']
+        
+    def _cache_expiry(self, interval, now):
+        """Момент истечения записи кэша: через cache_ttl, но не позже закрытия текущей свечи"""
+        expires = now + self.cache_ttl
+        interval_ms = interval_to_ms(interval)
+        if interval_ms:
+            next_boundary = (int(now * 1000) // interval_ms + 1) * interval_ms / 1000
+            expires = min(expires, next_boundary)
+        return expires
+        
+    def _fetch_market_data(self, symbol, interval='1', limit=100):
+        """Загрузка свечей через кэш: одинаковые одновременные запросы выполняются один раз
+        
+        Все получатели делят один CandleFrame, поэтому изменять его нельзя.
+        """
+        key = (symbol, str(interval), limit)
+        with self.cache_lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] > self.clock.time():
+                self.cache_stats['hits'] += 1
+                return entry[1]
+                
+            future = self.inflight.get(key)
+            if future is not None:
+                # Такой же запрос уже выполняется - ждем его результат
+                self.cache_stats['coalesced'] += 1
+                is_leader = False
+            else:
+                self.cache_stats['misses'] += 1
+                future = Future()
+                self.inflight[key] = future
+                is_leader = True
+                
+        if not is_leader:
+            return future.result()
+            
+        try:
+            frame = CandleFrame.from_klines(self._request_klines(symbol, interval, limit))
+            with self.cache_lock:
+                now = self.clock.time()
+                self.cache[key] = (self._cache_expiry(interval, now), frame)
+                if len(self.cache) > 256:  # Удаляем истекшие записи
+                    self.cache = {k: v for k, v in self.cache.items() if v[0] > now}
+            future.set_result(frame)
+            return frame
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.cache_lock:
+                self.inflight.pop(key, None)
+                
+    def clear_cache(self):
+        """Сброс кэша ответов"""
+        with self.cache_lock:
+            self.cache.clear()
+            
+    def cache_info(self):
+        """Счетчики кэша: попадания, промахи, объединенные запросы"""
+        with self.cache_lock:
+            info = dict(self.cache_stats)
+            info['size'] = len(self.cache)
+        total = info['hits'] + info['misses'] + info['coalesced']
+        info['hit_rate'] = (info['hits'] + info['coalesced']) / total if total else 0.0
+        return info
+        
     def get_market_data(self, symbol, interval='1', limit=100):
         """Получение рыночных данных с BYBIT"""
         try:
-            url = f"{self.server['url']}/v5/market/kline"
-            params = {
-                'category': 'spot',
-                'symbol': symbol,
-                'interval': interval,
-                'limit': limit
+            return self._fetch_market_data(symbol, interval, limit)
+            
+        except Exception as e:
+            print(f"Ошибка получения данных: {e}")
+            return None
+            
+    def get_market_data_many(self, symbols, interval='1', limit=100, max_workers=None, timeout=None):
+        """Параллельная загрузка нескольких пар: (результаты, ошибки) по символам
+        
+        Одновременно выполняется не более max_workers запросов; пары, не
+        успевшие за общий timeout, попадают в ошибки и не задерживают остальные.
+        """
+        if max_workers is None:
+            max_workers = MARKET_DATA_SETTINGS['max_concurrency']
+        if timeout is None:
+            timeout = MARKET_DATA_SETTINGS['batch_timeout']
+            
+        results = {}
+        errors = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols) or 1)))
+        try:
+            futures = {
+                executor.submit(self._fetch_market_data, symbol, interval, limit): symbol
+                for symbol in symbols
             }
+            done, not_done = wait(futures, timeout=timeout)
             
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
+            for future in done:
+                symbol = futures[future]
+                try:
+                    results[symbol] = future.result()
+                except Exception as e:
+                    errors[symbol] = e
+                    
+            for future in not_done:
+                future.cancel()
+                errors[futures[future]] = TimeoutError(f"нет ответа за {timeout} сек")
+        finally:
+            # Не ждем зависшие запросы - их ограничивает таймаут чтения сессии
+            executor.shutdown(wait=False)
+            
+        return results, errors
+        
+    def get_buffer(self, symbol, interval='1'):
+        """Кольцевой буфер свечей для пары (symbol, interval)"""
+        key = (symbol, str(interval))
+        with self.buffers_lock:
+            buffer = self.buffers.get(key)
+            if buffer is None:
+                buffer = CandleRingBuffer(self.buffer_capacity, interval)
+                self.buffers[key] = buffer
+            return buffer
+            
+    def sync_market_data(self, symbol, interval='1', limit=100):
+        """Инкрементальная синхронизация: догружаются только свечи новее последней сохраненной"""
+        try:
+            buffer = self.get_buffer(symbol, interval)
+            interval_ms = interval_to_ms(interval)
+            last_ts = buffer.last_timestamp
             
-            if data['retCode'] == 0:  # Успешный запрос
-                klines = data['result']['list']
-                klines.reverse()  # Переворачиваем чтобы данные шли от старых к новым
+            if last_ts is None or interval_ms is None or len(buffer) < limit:
+                # Первая загрузка: полное окно
+                klines = self._request_klines(symbol, interval, min(max(limit, 1), self.max_kline_limit))
+                full_window = True
+            else:
+                # Последняя сохраненная (возможно, еще открытая) свеча + все новые
+                missing = int((self.clock.time() * 1000 - last_ts) // interval_ms) + 1
+                request_limit = min(max(missing + 1, 2), self.max_kline_limit)
+                klines = self._request_klines(symbol, interval, request_limit, start=last_ts)
+                full_window = False
                 
-                # Создаем DataFrame из полученных данных
-                df = pd.DataFrame(klines, columns=[
-                    'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                    'turnover'
-                ])
+            frame = CandleFrame.from_klines(klines)
+            if self.store is not None:
+                self.store.write(symbol, interval, frame)
                 
-                # Конвертируем строки в числа
-                price_columns = ['open', 'high', 'low', 'close', 'volume']
-                for col in price_columns:
-                    df[col] = pd.to_numeric(df[col])
+            with buffer.lock:
+                if full_window:
+                    buffer.clear()
+                gap = buffer.merge(frame)
                 
-                # Конвертируем timestamp в datetime
-                df['timestamp'] = pd.to_datetime(df['timestamp'].astype(int), unit='ms')
+            if gap:
+                # Разрыв между буфером и новыми данными - начинаем окно заново
+                if len(frame) < limit:
+                    frame = CandleFrame.from_klines(self._request_klines(
+                        symbol, interval, min(limit, self.max_kline_limit)))
+                with buffer.lock:
+                    buffer.clear()
+                    buffer.merge(frame)
+                    
+            # Без WebSocket потока буфер меняет только этот поток - отдаем представления без копий
+            with buffer.lock:
+                return buffer.to_frame(limit, copy=self.stream is not None)
                 
-                return df
-            else:
-                return None
+        except Exception as e:
+            print(f"Ошибка синхронизации данных: {e}")
+            return None
+            
+    def start_stream(self, symbol, interval='1'):
+        """Подписка на WebSocket поток свечей (False, если поток недоступен)"""
+        if not KlineStream.is_available():
+            return False
+        if self.stream is None:
+            self.stream = KlineStream(
+                STREAM_SETTINGS['url'],
+                self.apply_stream_candle,
+                ping_interval=STREAM_SETTINGS['ping_interval'],
+                reconnect_delay=STREAM_SETTINGS['reconnect_delay'],
+                max_reconnect_delay=STREAM_SETTINGS['max_reconnect_delay']
+            )
+            self.stream.start()
+        self.stream.subscribe(symbol, interval)
+        return True
+        
+    def stop_stream(self):
+        """Остановка WebSocket потока"""
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
+            
+    def apply_stream_candle(self, symbol, interval, candle):
+        """Свеча из WebSocket потока -> тот же кольцевой буфер, что и при опросе REST
+        
+        Формирующаяся свеча обновляется только в буфере; в архив пишется
+        закрытая (confirm), а не каждый тик.
+        """
+        frame = CandleFrame.from_columns(
+            [int(candle['start'])],
+            [[float(candle[name])] for name in VALUE_COLUMNS]
+        )
+        
+        buffer = self.get_buffer(symbol, interval)
+        with buffer.lock:
+            if len(buffer) == 0:
+                return  # Окно еще не загружено через REST
+            if buffer.merge(frame):
+                # Пропущены свечи (например, при переподключении) - окно перезагрузит REST
+                buffer.clear()
+                
+        if self.store is not None and candle.get('confirm'):
+            self.store.write(symbol, interval, frame)
+        self.data_event.set()
+        
+    def stream_market_data(self, symbol, interval='1', limit=100, timeout=5):
+        """Окно свечей в режиме потока: ждем обновления из WebSocket, REST - только для первичной загрузки"""
+        buffer = self.get_buffer(symbol, interval)
+        if len(buffer) < limit or self.stream is None or not self.stream.is_connected:
+            return self.sync_market_data(symbol, interval, limit)
+            
+        self.data_event.wait(timeout)
+        self.data_event.clear()
+        with buffer.lock:
+            return buffer.to_frame(limit, copy=True)
+            
+    def backfill(self, symbol, interval='1', depth=10000):
+        """Догрузка истории в архив страницами назад по времени (параметр end) до глубины depth"""
+        if self.store is None:
+            return 0
+            
+        added = 0
+        end = None  # Первая страница - самые свежие свечи
+        try:
+            while self.store.count(symbol, interval) < depth:
+                klines = self._request_klines(symbol, interval, self.max_kline_limit, end=end)
+                frame = CandleFrame.from_klines(klines)
+                if len(frame) == 0:
+                    break  # Истории больше нет
+                    
+                before = self.store.count(symbol, interval)
+                self.store.write(symbol, interval, frame)
+                added += self.store.count(symbol, interval) - before
+                
+                # Следующая страница - до начала уже загруженной истории
+                first_stored, _ = self.store.time_range(symbol, interval)
+                end = min(int(frame.timestamp[0]), first_stored) - 1
                 
+                if len(frame) < self.max_kline_limit:
+                    break  # Достигнуто начало истории
+                    
         except Exception as e:
-            print(f"Ошибка получения данных: {e}")
-            return None
\ No newline at end of file
+            print(f"Ошибка загрузки истории: {e}")
+            
+        return added
+        
+    def fetch_klines(self, symbol, interval='1', start=None, end=None, limit=None):
+        """Свечи диапазона [start, end] (мс) одним запросом, без кэша; ошибки не перехватываются"""
+        limit = limit or self.max_kline_limit
+        return CandleFrame.from_klines(self._request_klines(symbol, interval, limit, start=start, end=end))
+        
+    def get_history(self, symbol, interval='1', length=1000, end=None):
+        """Окно из length свечей из локального архива (без запросов к бирже)"""
+        if self.store is None:
+            return None
+        frame = self.store.read(symbol, interval, end=end, limit=length)
+        return frame if len(frame) else None
\ No newline at end of file
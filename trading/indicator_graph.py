@@ -0,0 +1,136 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+class IndicatorNode:
+    """Узел графа: функция от входных серий и параметров"""
+    
+    __slots__ = ('name', 'func', 'inputs', 'params')
+    
+    def __init__(self, name, func, inputs, params):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.params = dict(params)
+    
+    def signature(self):
+        return (self.name, self.inputs, tuple(sorted(self.params.items())))
+
+class IndicatorRegistry:
+    """Реестр индикаторов и планировщик их расчета
+    
+    Каждый индикатор объявляет входы (колонки свечей или другие индикаторы)
+    и параметры. Новый индикатор подключается декоратором register без
+    изменений ядра:
+        
+        @registry.register('atr_14', inputs=('high', 'low', 'close'), period=14)
+        def atr(high, low, close, period): ...
+    
+    План расчета - топологический порядок графа зависимостей: общие
+    промежуточные серии (скользящее среднее, отклонение, разности цен)
+    считаются один раз за проход.
+    """
+    
+    def __init__(self):
+        self.nodes = {}
+        self.version = 0  # Меняется при регистрации, чтобы мемоизация не отдавала старые результаты
+    
+    def add(self, name, func, inputs, **params):
+        self.nodes[name] = IndicatorNode(name, func, inputs, params)
+        self.version += 1
+        return name
+    
+    def register(self, name, inputs, **params):
+        """Декоратор регистрации индикатора"""
+        def decorator(func):
+            self.add(name, func, inputs, **params)
+            return func
+        return decorator
+    
+    def plan(self, outputs):
+        """Узлы, нужные для outputs, в порядке расчета (входы раньше зависимых)"""
+        order = []
+        state = {}  # name -> 'visiting' | 'done'
+        
+        def visit(name):
+            if name not in self.nodes or state.get(name) == 'done':
+                return  # Колонка свечей или уже в плане
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Циклическая зависимость индикаторов: {name}")
+            state[name] = 'visiting'
+            for dependency in self.nodes[name].inputs:
+                visit(dependency)
+            state[name] = 'done'
+            order.append(name)
+        
+        for name in outputs:
+            if name not in self.nodes:
+                raise KeyError(f"Неизвестный индикатор: {name}")
+            visit(name)
+        return order
+    
+    def sources(self, plan):
+        """Колонки свечей, которые читает план"""
+        return sorted({dependency for name in plan for dependency in self.nodes[name].inputs
+                       if dependency not in self.nodes})
+    
+    def signature(self, plan):
+        """Описание плана (имена, входы, параметры) - часть ключа мемоизации"""
+        return tuple(self.nodes[name].signature() for name in plan)
+    
+    def compute(self, df, outputs):
+        """Расчет outputs по свечам df за один проход; возвращает {имя: массив}"""
+        plan = self.plan(outputs)
+        values = {name: np.asarray(df[name], dtype=np.float64) for name in self.sources(plan)}
+        for name in plan:
+            node = self.nodes[name]
+            values[name] = node.func(*[values[dependency] for dependency in node.inputs], **node.params)
+        return {name: values[name] for name in outputs}
+
+class IndicatorEngine:
+    """Расчет по реестру с мемоизацией результата
+    
+    Ключ - (symbol, interval, время последней свечи, параметры плана);
+    формирующаяся свеча меняется при том же времени, поэтому в ключ входят
+    также ее цена закрытия и объем. Результат общий для всех получателей,
+    изменять массивы нельзя.
+    """
+    
+    def __init__(self, registry, max_entries=64):
+        self.registry = registry
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+    
+    def compute(self, df, outputs, key=None):
+        """key = (symbol, interval) включает мемоизацию; без key - обычный расчет"""
+        if key is None or len(df) == 0:
+            return self.registry.compute(df, outputs)
+        
+        outputs = tuple(outputs)
+        plan = self.registry.plan(outputs)
+        last = len(df) - 1
+        cache_key = (tuple(key), int(np.asarray(df['timestamp'])[last]), len(df),
+                     float(np.asarray(df['close'])[last]), float(np.asarray(df['volume'])[last]),
+                     outputs, self.registry.version, self.registry.signature(plan))
+        
+        with self.lock:
+            result = self.cache.get(cache_key)
+            if result is not None:
+                self.cache.move_to_end(cache_key)
+                self.stats['hits'] += 1
+                return result
+            self.stats['misses'] += 1
+        
+        result = self.registry.compute(df, outputs)
+        with self.lock:
+            self.cache[cache_key] = result
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return result
+    
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
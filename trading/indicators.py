@@ -1,64 +1,235 @@
 import numpy as np
-import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from trading import kernels
+from trading.indicator_graph import IndicatorRegistry, IndicatorEngine
+from trading.streaming_indicators import StreamingIndicators
+
+# Все функции считают индикатор по всей серии вдоль последней оси (axis=-1),
+# поэтому принимают как одну серию (n,), так и пачку серий (k, n).
+# Первые значения, для которых окна еще не хватает, равны NaN.
+
+def _pad(values, n):
+    """Дополнение NaN слева до длины n по последней оси"""
+    pad = np.full(values.shape[:-1] + (n - values.shape[-1],), np.nan)
+    return np.concatenate([pad, values], axis=-1)
+
+def sma(values, period):
+    """Простая скользящая средняя"""
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[-1]
+    if n < period:
+        return np.full(values.shape, np.nan)
+    csum = np.cumsum(values, axis=-1)
+    window_sum = csum[..., period - 1:].copy()
+    window_sum[..., 1:] -= csum[..., :-period]
+    return _pad(window_sum / period, n)
+
+def rolling_std(values, period):
+    """Скользящее стандартное отклонение (как np.std окна)"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[-1] < period:
+        return np.full(values.shape, np.nan)
+    return _pad(sliding_window_view(values, period, axis=-1).std(axis=-1), values.shape[-1])
+
+def ema(values, period, alpha=None):
+    """Экспоненциальная скользящая средняя, начальное значение - SMA первых period точек
+    
+    alpha по умолчанию 2 / (period + 1); для сглаживания Уайлдера - 1 / period.
+    Рекурсия считается ядром trading.kernels (numba, если установлен, иначе lfilter).
+    """
+    return kernels.ema(values, period, alpha)
+
+def atr(high, low, close, period=14):
+    """Average True Range (сглаживание Уайлдера)"""
+    return kernels.atr(high, low, close, period)
+
+def parabolic_sar(high, low, af_start=0.02, af_step=0.02, af_max=0.2):
+    """Parabolic SAR"""
+    return kernels.psar(high, low, af_start, af_step, af_max)
+
+def rsi(closes, period=14):
+    """RSI Уайлдера"""
+    closes = np.asarray(closes, dtype=np.float64)
+    n = closes.shape[-1]
+    if n <= period:
+        return np.full(closes.shape, np.nan)
+    
+    return _pad(_rsi_from_delta(np.diff(closes, axis=-1), period), n)
+
+def _rsi_from_delta(delta, period):
+    """RSI Уайлдера по разностям цен (длина на 1 меньше серии цен)"""
+    avg_gain = ema(np.maximum(delta, 0), period, alpha=1 / period)
+    avg_loss = ema(np.maximum(-delta, 0), period, alpha=1 / period)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = 100 - 100 / (1 + avg_gain / avg_loss)
+    # Без потерь RSI = 100, без движения цены - 50
+    result = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), result)
+    return np.where(np.isnan(avg_gain), np.nan, result)
+
+def macd(closes, fast=12, slow=26, signal=9):
+    """(линия MACD, сигнальная линия, гистограмма)"""
+    closes = np.asarray(closes, dtype=np.float64)
+    line = ema(closes, fast) - ema(closes, slow)
+    signal_line = macd_signal(line, slow, signal)
+    return line, signal_line, line - signal_line
+
+def macd_signal(line, slow=26, signal=9):
+    """Сигнальная линия MACD: EMA с первой точки, где линия MACD определена"""
+    if line.shape[-1] < slow:
+        return np.full(line.shape, np.nan)
+    return _pad(ema(line[..., slow - 1:], signal), line.shape[-1])
+
+def bollinger(closes, period=20, width=2):
+    """(верхняя полоса, средняя, нижняя, позиция цены между полосами 0-1)"""
+    closes = np.asarray(closes, dtype=np.float64)
+    middle = sma(closes, period)
+    deviation = width * rolling_std(closes, period)
+    upper = middle + deviation
+    lower = middle - deviation
+    return upper, middle, lower, band_position(closes, upper, lower)
+
+def band_position(closes, upper, lower):
+    """Позиция цены между полосами (0 - нижняя, 1 - верхняя)"""
+    band = upper - lower
+    with np.errstate(divide='ignore', invalid='ignore'):
+        position = np.where(band != 0, (closes - lower) / band, 0.5)
+    return np.where(np.isnan(band), np.nan, position)
+
+def volume_ratio(volumes, period=20):
+    """Отношение объема к его скользящей средней"""
+    volumes = np.asarray(volumes, dtype=np.float64)
+    return _ratio_to_average(volumes, sma(volumes, period))
+
+def _ratio_to_average(volumes, average):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(average != 0, volumes / average, 1.0)
+    return np.where(np.isnan(average), np.nan, ratio)
+
+def default_registry():
+    """Граф стандартных индикаторов терминала
+    
+    sma_20 и std_20 общие для SMA и полос Боллинджера, delta - для RSI,
+    ema_12 / ema_26 - для MACD.
+    """
+    registry = IndicatorRegistry()
+    registry.add('sma_20', sma, ('close',), period=20)
+    registry.add('sma_50', sma, ('close',), period=50)
+    registry.add('std_20', rolling_std, ('close',), period=20)
+    registry.add('ema_12', ema, ('close',), period=12)
+    registry.add('ema_26', ema, ('close',), period=26)
+    registry.add('delta', np.diff, ('close',), axis=-1)
+    registry.add('rsi', lambda delta, period: _pad(_rsi_from_delta(delta, period), delta.shape[-1] + 1),
+                 ('delta',), period=14)
+    registry.add('macd', np.subtract, ('ema_12', 'ema_26'))
+    registry.add('macd_signal', macd_signal, ('macd',), slow=26, signal=9)
+    registry.add('macd_hist', np.subtract, ('macd', 'macd_signal'))
+    registry.add('bb_middle', lambda middle: middle, ('sma_20',))
+    registry.add('bb_upper', lambda middle, std, width: middle + width * std, ('sma_20', 'std_20'), width=2)
+    registry.add('bb_lower', lambda middle, std, width: middle - width * std, ('sma_20', 'std_20'), width=2)
+    registry.add('bb_position', band_position, ('close', 'bb_upper', 'bb_lower'))
+    registry.add('volume_sma_20', sma, ('volume',), period=20)
+    registry.add('volume_ratio', _ratio_to_average, ('volume', 'volume_sma_20'))
+    # Рекурсивные индикаторы (ядра trading.kernels), по запросу через outputs
+    registry.add('atr_14', atr, ('high', 'low', 'close'), period=14)
+    registry.add('psar', parabolic_sar, ('high', 'low'), af_start=0.02, af_step=0.02, af_max=0.2)
+    return registry
 
 class TechnicalIndicators:
-    def __init__(self):
-        pass
+    # Индикаторы, попадающие в сводку по последней свече
+    SUMMARY_KEYS = ('sma_20', 'sma_50', 'rsi', 'macd', 'bb_position', 'volume_ratio')
+    # Серии calculate_series
+    SERIES_KEYS = ('sma_20', 'sma_50', 'ema_12', 'ema_26', 'rsi', 'macd', 'macd_signal', 'macd_hist',
+                   'bb_upper', 'bb_middle', 'bb_lower', 'bb_position', 'volume_ratio')
+    
+    def __init__(self, registry=None):
+        self.registry = registry or default_registry()
+        self.engine = IndicatorEngine(self.registry)
+        self.streams = {}  # ключ (symbol, interval) -> StreamingIndicators
+    
+    def calculate_series(self, df, key=None, outputs=None):
+        """Индикаторы по всей серии: словарь массивов той же длины, что и df
         
-    def calculate_advanced_indicators(self, df):
-        """Расчет продвинутых технических индикаторов"""
+        key = (symbol, interval) включает мемоизацию по последней свече;
+        outputs - имена индикаторов реестра (по умолчанию SERIES_KEYS).
+        """
+        series = dict(self.engine.compute(df, outputs or self.SERIES_KEYS, key))
+        series['close'] = np.asarray(df['close'], dtype=np.float64)
+        series['timestamp'] = np.asarray(df['timestamp'])
+        return series
+    
+    def calculate_advanced_indicators(self, df, key=None):
+        """Расчет продвинутых технических индикаторов (значения на последней свече)"""
         if df is None or len(df) < 50:  # Нужно достаточно данных для индикаторов
             return None
-            
-        closes = df['close'].values  # Цены закрытия как numpy массив
         
-        # SMA (Simple Moving Average) - простая скользящая средняя
-        sma_20 = np.mean(closes[-20:])  # 20-периодная SMA
-        sma_50 = np.mean(closes[-50:])  # 50-периодная SMA
+        series = self.calculate_series(df, key)
+        indicators = {key: series[key][-1] for key in self.SUMMARY_KEYS}
+        indicators['current_price'] = series['close'][-1]
+        indicators['timestamp'] = series['timestamp'][-1]
+        return indicators
+    
+    def calculate_matrix(self, symbols, closes, volumes, timestamps=None):
+        """Сводка индикаторов для пачки пар одним векторным проходом
         
-        # RSI (Relative Strength Index) - индекс относительной силы
-        if len(closes) >= 16:
-            delta = np.diff(closes[-15:])  # Разницы между ценами
-            gain = np.where(delta > 0, delta, 0)  # Положительные изменения
-            loss = np.where(delta < 0, -delta, 0)  # Отрицательные изменения
-            
-            avg_gain = np.mean(gain) if np.sum(gain) > 0 else 0.001  # Средний прирост
-            avg_loss = np.mean(loss) if np.sum(loss) > 0 else 0.001  # Средняя потеря
-            
-            rs = avg_gain / avg_loss  # Относительная сила
-            rsi = 100 - (100 / (1 + rs))  # RSI формула
-        else:
-            rsi = 50  # Значение по умолчанию
+        closes и volumes - матрицы (пары × время), индикаторы считаются вдоль
+        оси 1. Возвращает таблицу pandas: строка на пару, колонки как в
+        calculate_advanced_indicators.
+        """
+        import pandas as pd
         
-        # MACD (Moving Average Convergence Divergence)
-        ema_12 = np.mean(closes[-12:]) if len(closes) >= 12 else closes[-1]  # 12-периодная EMA
-        ema_26 = np.mean(closes[-26:]) if len(closes) >= 26 else closes[-1]  # 26-периодная EMA
-        macd = ema_12 - ema_26  # Линия MACD
+        closes = np.asarray(closes, dtype=np.float64)
+        series = self.registry.compute({'close': closes, 'volume': np.asarray(volumes, dtype=np.float64)},
+                                       self.SUMMARY_KEYS)
+        table = pd.DataFrame({key: series[key][:, -1] for key in self.SUMMARY_KEYS}, index=list(symbols))
+        table['current_price'] = closes[:, -1]
+        if timestamps is not None:
+            table['timestamp'] = np.asarray(timestamps)[..., -1]
+        table.index.name = 'symbol'
+        return table
+    
+    def calculate_batch(self, frames, length=None):
+        """Сводка индикаторов по словарю {symbol: свечи} (пары короче 50 свечей пропускаются)
         
-        # Bollinger Bands - полосы Боллинджера
-        if len(closes) >= 20:
-            bb_upper = np.mean(closes[-20:]) + 2 * np.std(closes[-20:])  # Верхняя полоса
-            bb_lower = np.mean(closes[-20:]) - 2 * np.std(closes[-20:])  # Нижняя полоса
-            # Позиция текущей цены относительно полос (0-1)
-            bb_position = (closes[-1] - bb_lower) / (bb_upper - bb_lower) if (bb_upper - bb_lower) != 0 else 0.5
-        else:
-            bb_position = 0.5
+        Серии выравниваются по последним length свечам (по умолчанию - по самой
+        короткой серии) и складываются в матрицу для calculate_matrix.
+        """
+        frames = {symbol: df for symbol, df in frames.items() if df is not None and len(df) >= 50}
+        if not frames:
+            return None
+        length = min([len(df) for df in frames.values()] + ([length] if length else []))
+        
+        closes = np.vstack([np.asarray(df['close'], dtype=np.float64)[-length:] for df in frames.values()])
+        volumes = np.vstack([np.asarray(df['volume'], dtype=np.float64)[-length:] for df in frames.values()])
+        timestamps = [np.asarray(df['timestamp'])[-1] for df in frames.values()]
+        return self.calculate_matrix(list(frames), closes, volumes, np.array(timestamps)[:, None])
+    
+    def calculate_streaming(self, df, key):
+        """То же, что calculate_advanced_indicators, но с потоковым состоянием key
+        
+        Последняя свеча df считается формирующейся (peek), новые закрытые свечи
+        добавляются в состояние за O(1). При разрыве истории состояние
+        пересобирается по df.
+        """
+        if df is None or len(df) < 50:
+            return None
+        
+        timestamps = np.asarray(df['timestamp'])
+        closes = np.asarray(df['close'])
+        volumes = np.asarray(df['volume'])
         
-        # Volume analysis - анализ объема
-        if len(df) >= 20:
-            volume_sma = np.mean(df['volume'].values[-20:])  # SMA объема
-            current_volume = df['volume'].values[-1]  # Текущий объем
-            volume_ratio = current_volume / volume_sma if volume_sma != 0 else 1  # Отношение объема к среднему
+        stream = self.streams.get(key)
+        start = 0
+        if stream is not None:
+            # Первая закрытая свеча, которой еще нет в состоянии
+            start = int(np.searchsorted(timestamps[:-1], stream.last_timestamp, side='right'))
+            if start == 0 or timestamps[start - 1] != stream.last_timestamp:
+                stream = None
+        if stream is None:
+            stream = self.streams[key] = StreamingIndicators.from_frame(df)
         else:
-            volume_ratio = 1
+            for i in range(start, len(timestamps) - 1):
+                stream.update({'timestamp': timestamps[i], 'close': closes[i], 'volume': volumes[i]})
         
-        return {
-            'sma_20': sma_20,
-            'sma_50': sma_50,
-            'rsi': rsi,
-            'macd': macd,
-            'bb_position': bb_position,
-            'volume_ratio': volume_ratio,
-            'current_price': closes[-1],
-            'timestamp': df['timestamp'].iloc[-1]
-        }
\ No newline at end of file
+        return stream.peek({'timestamp': timestamps[-1], 'close': closes[-1], 'volume': volumes[-1]})
@@ -0,0 +1,129 @@
+import numpy as np
+from scipy.signal import lfilter
+
+# Рекурсивные индикаторы (EMA, сглаживание Уайлдера, ATR, Parabolic SAR).
+# С установленным numba циклы компилируются JIT, без него EMA и ATR считаются
+# фильтром lfilter, а Parabolic SAR - тем же циклом на Python.
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+BACKENDS = ('numba', 'numpy', 'python')
+DEFAULT_BACKEND = 'numba' if NUMBA_AVAILABLE else 'numpy'
+
+def _ema_rows(values, alpha, period, out):
+    """EMA по строкам матрицы: начальное значение - SMA первых period точек"""
+    rows, n = values.shape
+    for row in range(rows):
+        for i in range(min(period - 1, n)):
+            out[row, i] = np.nan
+        if n < period:
+            continue
+        seed = 0.0
+        for i in range(period):
+            seed += values[row, i]
+        value = seed / period
+        out[row, period - 1] = value
+        for i in range(period, n):
+            value = alpha * values[row, i] + (1 - alpha) * value
+            out[row, i] = value
+
+def _psar_rows(high, low, af_start, af_step, af_max, out):
+    """Parabolic SAR Уайлдера по строкам матриц high/low"""
+    rows, n = high.shape
+    for row in range(rows):
+        out[row, 0] = np.nan
+        if n < 2:
+            continue
+        rising = high[row, 1] >= high[row, 0]
+        sar = low[row, 0] if rising else high[row, 0]
+        extreme = high[row, 0] if rising else low[row, 0]
+        af = af_start
+        for i in range(1, n):
+            sar = sar + af * (extreme - sar)
+            prev = max(i - 2, 0)
+            if rising:
+                # SAR не выше минимумов двух предыдущих свечей
+                sar = min(sar, low[row, i - 1], low[row, prev])
+                if low[row, i] < sar:
+                    rising = False
+                    sar = extreme
+                    extreme = low[row, i]
+                    af = af_start
+                elif high[row, i] > extreme:
+                    extreme = high[row, i]
+                    af = min(af + af_step, af_max)
+            else:
+                sar = max(sar, high[row, i - 1], high[row, prev])
+                if high[row, i] > sar:
+                    rising = True
+                    sar = extreme
+                    extreme = high[row, i]
+                    af = af_start
+                elif low[row, i] < extreme:
+                    extreme = low[row, i]
+                    af = min(af + af_step, af_max)
+            out[row, i] = sar
+
+if NUMBA_AVAILABLE:
+    _ema_rows_jit = njit(cache=True)(_ema_rows)
+    _psar_rows_jit = njit(cache=True)(_psar_rows)
+
+def _resolve(backend):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный backend: {backend}")
+    if backend == 'numba' and not NUMBA_AVAILABLE:
+        raise ImportError("numba не установлен (pip install numba)")
+    return backend
+
+def _as_rows(values):
+    """Непрерывная матрица (строки × время) из массива любой размерности"""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    return values.reshape(-1, values.shape[-1])
+
+def _ema_numpy(values, period, alpha):
+    n = values.shape[-1]
+    if n < period:
+        return np.full(values.shape, np.nan)
+    seed = values[..., :period].mean(axis=-1, keepdims=True)
+    smoothed, _ = lfilter([alpha], [1, alpha - 1], values[..., period:], axis=-1, zi=(1 - alpha) * seed)
+    pad = np.full(values.shape[:-1] + (period - 1,), np.nan)
+    return np.concatenate([pad, seed, smoothed], axis=-1)
+
+def ema(values, period, alpha=None, backend=None):
+    """EMA вдоль последней оси, начальное значение - SMA первых period точек
+    
+    alpha по умолчанию 2 / (period + 1); для сглаживания Уайлдера - 1 / period.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    alpha = 2 / (period + 1) if alpha is None else alpha
+    backend = _resolve(backend)
+    if backend == 'numpy':
+        return _ema_numpy(values, period, alpha)
+    
+    rows = _as_rows(values)
+    out = np.empty_like(rows)
+    (_ema_rows_jit if backend == 'numba' else _ema_rows)(rows, alpha, period, out)
+    return out.reshape(values.shape)
+
+def true_range(high, low, close):
+    """Истинный диапазон: max(high - low, |high - prev close|, |low - prev close|)"""
+    high, low, close = (np.asarray(column, dtype=np.float64) for column in (high, low, close))
+    prev_close = np.concatenate([close[..., :1], close[..., :-1]], axis=-1)
+    return np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+def atr(high, low, close, period=14, backend=None):
+    """Average True Range (сглаживание Уайлдера)"""
+    return ema(true_range(high, low, close), period, alpha=1 / period, backend=backend)
+
+def psar(high, low, af_start=0.02, af_step=0.02, af_max=0.2, backend=None):
+    """Parabolic SAR вдоль последней оси (без numba - цикл на Python)"""
+    high = np.asarray(high, dtype=np.float64)
+    rows_high, rows_low = _as_rows(high), _as_rows(low)
+    out = np.empty_like(rows_high)
+    kernel = _psar_rows_jit if _resolve(backend) == 'numba' else _psar_rows
+    kernel(rows_high, rows_low, af_start, af_step, af_max, out)
+    return out.reshape(high.shape)
@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+
+try:
+    import websocket  # Пакет websocket-client
+except ImportError:
+    websocket = None
+
+class KlineStream:
+    """Поток свечей BYBIT через WebSocket (публичные топики kline.{interval}.{symbol})
+    
+    Работает в отдельном потоке: держит соединение, раз в ping_interval
+    отправляет heartbeat, при обрыве переподключается с экспоненциальной
+    задержкой и заново подписывается на все топики. Каждая свеча
+    передается в on_candle(symbol, interval, candle).
+    """
+    
+    def __init__(self, url, on_candle, ping_interval=20, reconnect_delay=1, max_reconnect_delay=30,
+                 record_path=None):
+        self.url = url
+        self.on_candle = on_candle
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.record_path = record_path  # Запись сырых кадров в JSONL для повторного воспроизведения
+        
+        self.topics = set()
+        self.topics_lock = threading.Lock()
+        self.ws = None
+        self.is_running = False
+        self.is_connected = False
+        self.reconnects = 0
+        self.last_message_time = 0
+        self.thread = None
+    
+    @staticmethod
+    def is_available():
+        """Установлен ли пакет websocket-client"""
+        return websocket is not None
+    
+    @staticmethod
+    def topic(symbol, interval):
+        return f"kline.{interval}.{symbol}"
+    
+    def subscribe(self, symbol, interval='1'):
+        """Подписка на свечи пары (повторная подписка игнорируется)"""
+        topic = self.topic(symbol, interval)
+        with self.topics_lock:
+            if topic in self.topics:
+                return
+            self.topics.add(topic)
+        self._send({'op': 'subscribe', 'args': [topic]})
+    
+    def unsubscribe(self, symbol, interval='1'):
+        """Отписка от свечей пары"""
+        topic = self.topic(symbol, interval)
+        with self.topics_lock:
+            if topic not in self.topics:
+                return
+            self.topics.discard(topic)
+        self._send({'op': 'unsubscribe', 'args': [topic]})
+    
+    def start(self):
+        """Запуск потока получения данных"""
+        if not self.is_available():
+            raise RuntimeError("Для WebSocket потока установите пакет websocket-client")
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Остановка потока и закрытие соединения"""
+        self.is_running = False
+        ws = self.ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=self.ping_interval)
+    
+    def _send(self, message):
+        """Отправка сообщения, если соединение установлено"""
+        ws = self.ws
+        if ws is None or not self.is_connected:
+            return False
+        try:
+            ws.send(json.dumps(message))
+            return True
+        except Exception:
+            return False
+    
+    def _run(self):
+        """Цикл соединения с переподключением"""
+        delay = self.reconnect_delay
+        while self.is_running:
+            try:
+                self._connect()
+                delay = self.reconnect_delay  # Успешное соединение сбрасывает задержку
+                self._receive_loop()
+            except Exception as e:
+                if self.is_running:
+                    print(f"Ошибка WebSocket потока: {e}")
+            finally:
+                self._disconnect()
+            
+            if self.is_running:
+                self.reconnects += 1
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+    
+    def _connect(self):
+        """Соединение и подписка на все топики"""
+        self.ws = websocket.create_connection(self.url, timeout=self.ping_interval)
+        self.is_connected = True
+        self.last_message_time = time.monotonic()
+        
+        with self.topics_lock:
+            topics = sorted(self.topics)
+        if topics:
+            self._send({'op': 'subscribe', 'args': topics})
+    
+    def _disconnect(self):
+        self.is_connected = False
+        ws, self.ws = self.ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+    
+    def _receive_loop(self):
+        """Прием сообщений; heartbeat по таймауту чтения"""
+        last_ping = time.monotonic()
+        while self.is_running:
+            now = time.monotonic()
+            if now - last_ping >= self.ping_interval:
+                self._send({'op': 'ping'})
+                last_ping = now
+            
+            # Нет ни данных, ни ответа на ping два интервала подряд - соединение мертво
+            if now - self.last_message_time > 2 * self.ping_interval:
+                raise ConnectionError("нет ответа на heartbeat")
+            
+            self.ws.settimeout(max(0.1, self.ping_interval - (now - last_ping)))
+            try:
+                raw = self.ws.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+            
+            if not raw:
+                raise ConnectionError("соединение закрыто сервером")
+            self.last_message_time = time.monotonic()
+            self._handle_message(raw)
+    
+    def _handle_message(self, raw):
+        """Разбор сообщения и передача свечей в on_candle"""
+        if self.record_path:
+            with open(self.record_path, 'a', encoding='utf-8') as f:
+                f.write(raw.strip() + '\n')
+        
+        message = json.loads(raw)
+        topic = message.get('topic', '')
+        if not topic.startswith('kline.'):
+            return  # Ответы на ping/subscribe
+        
+        _, interval, symbol = topic.split('.', 2)
+        for candle in message.get('data', []):
+            self.on_candle(symbol, interval, candle)
@@ -0,0 +1,199 @@
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+import requests
+
+from config import LATENCY_SETTINGS
+
+# Фазы холодного запроса (новое соединение)
+PHASES = ('dns', 'connect', 'tls', 'ttfb')
+
+def probe_phases(url, path='/v5/market/time', timeout=3):
+    """Один холодный запрос по новому соединению с разбивкой по фазам (мс)
+    
+    dns - разрешение имени, connect - TCP, tls - рукопожатие TLS,
+    ttfb - от отправки запроса до первого байта ответа.
+    """
+    parsed = urlparse(url)
+    host = parsed.hostname
+    is_https = parsed.scheme == 'https'
+    port = parsed.port or (443 if is_https else 80)
+    
+    t0 = time.perf_counter()
+    address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4]
+    t1 = time.perf_counter()
+    
+    sock = socket.create_connection(address[:2], timeout=timeout)
+    try:
+        t2 = time.perf_counter()
+        if is_https:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        t3 = time.perf_counter()
+        
+        request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n"
+        sock.sendall(request.encode())
+        first = sock.recv(1)
+        t4 = time.perf_counter()
+        if not first:
+            raise ConnectionError("пустой ответ")
+        status_line = first + sock.recv(64)
+    finally:
+        sock.close()
+    
+    if b' 200 ' not in status_line.split(b'\r\n', 1)[0] + b' ':
+        raise ConnectionError(status_line.split(b'\r\n', 1)[0].decode(errors='replace'))
+    
+    return {
+        'dns': (t1 - t0) * 1000,
+        'connect': (t2 - t1) * 1000,
+        'tls': (t3 - t2) * 1000,
+        'ttfb': (t4 - t3) * 1000
+    }
+
+class LatencyStats:
+    """Скользящее окно замеров задержки одного эндпоинта"""
+    
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)   # Задержка запроса по keep-alive соединению (мс)
+        self.outcomes = deque(maxlen=window)  # True - успех, False - ошибка
+        self.phases = {phase: deque(maxlen=window) for phase in PHASES}
+        self.lock = threading.Lock()
+    
+    def add_sample(self, latency_ms):
+        with self.lock:
+            self.samples.append(latency_ms)
+            self.outcomes.append(True)
+    
+    def add_failure(self):
+        with self.lock:
+            self.outcomes.append(False)
+    
+    def add_phases(self, phases):
+        with self.lock:
+            for phase in PHASES:
+                self.phases[phase].append(phases[phase])
+    
+    def percentiles(self, q=(50, 95, 99)):
+        """Перцентили задержки (мс) или None без замеров"""
+        with self.lock:
+            if not self.samples:
+                return None
+            values = np.percentile(np.fromiter(self.samples, dtype=np.float64), q)
+        return dict(zip(q, values.tolist()))
+    
+    def success_rate(self):
+        with self.lock:
+            if not self.outcomes:
+                return 0.0
+            return sum(self.outcomes) / len(self.outcomes)
+    
+    def summary(self):
+        """p50/p95/p99, доля успехов и медианы фаз холодного запроса"""
+        result = {'success_rate': self.success_rate(), 'samples': len(self.samples)}
+        percentiles = self.percentiles()
+        if percentiles:
+            result.update({f'p{q}': value for q, value in percentiles.items()})
+        with self.lock:
+            for phase in PHASES:
+                if self.phases[phase]:
+                    result[phase] = float(np.median(self.phases[phase]))
+        return result
+
+class LatencyProber:
+    """Замеры задержки до эндпоинтов BYBIT и выбор самого быстрого здорового
+    
+    Для каждого эндпоинта держится своя keep-alive сессия: повторные замеры
+    (perf_counter) показывают задержку самого запроса без установки
+    соединения. Отдельный холодный запрос раскладывается на DNS/TCP/TLS/TTFB.
+    
+    Задержки рабочих запросов (свечи разного объема, дубли хеджирования) идут
+    в отдельное окно requests - только для задержки перед дублем; выбор
+    сервера опирается лишь на замеры /v5/market/time.
+    """
+    
+    def __init__(self, servers, settings=None):
+        self.settings = dict(LATENCY_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+        self.servers = list(servers)
+        self.stats = {server['url']: LatencyStats(self.settings['window']) for server in self.servers}
+        self.requests = {server['url']: LatencyStats(self.settings['window']) for server in self.servers}
+        self.sessions = {server['url']: requests.Session() for server in self.servers}
+    
+    def probe(self, server, samples=None):
+        """Серия замеров одного эндпоинта; возвращает его сводку"""
+        url = server['url']
+        stats = self.stats[url]
+        session = self.sessions[url]
+        timeout = self.settings['timeout']
+        
+        for _ in range(samples or self.settings['samples']):
+            start = time.perf_counter()
+            try:
+                response = session.get(f'{url}/v5/market/time', timeout=timeout)
+                response.raise_for_status()
+                stats.add_sample((time.perf_counter() - start) * 1000)
+            except Exception:
+                stats.add_failure()
+        
+        if self.settings['measure_phases']:
+            try:
+                stats.add_phases(probe_phases(url, timeout=timeout))
+            except Exception:
+                stats.add_failure()
+        
+        return stats.summary()
+    
+    def probe_all(self, samples=None):
+        """Параллельный замер всех эндпоинтов: {url: сводка}"""
+        with ThreadPoolExecutor(max_workers=max(1, len(self.servers))) as executor:
+            summaries = executor.map(lambda server: self.probe(server, samples), self.servers)
+            return {server['url']: summary for server, summary in zip(self.servers, summaries)}
+    
+    def is_healthy(self, server):
+        stats = self.stats[server['url']]
+        return bool(stats.samples) and stats.success_rate() >= self.settings['min_success_rate']
+    
+    def best_server(self, servers=None):
+        """Здоровый эндпоинт с минимальной медианой (при равенстве - p95), либо None"""
+        candidates = []
+        for server in self.servers if servers is None else servers:
+            if server['url'] not in self.stats or not self.is_healthy(server):
+                continue
+            percentiles = self.stats[server['url']].percentiles((50, 95))
+            candidates.append((percentiles[50], percentiles[95], server['name'], server))
+        if not candidates:
+            return None
+        return min(candidates, key=lambda item: item[:3])[3]
+    
+    def percentiles(self, server):
+        return self.stats[server['url']].percentiles() if server['url'] in self.stats else None
+    
+    def request_percentiles(self, url, q=(50, 95)):
+        """Перцентили рабочих запросов к эндпоинту в мс и их число 'samples' (None без замеров)"""
+        stats = self.requests.get(url)
+        percentiles = stats.percentiles(q) if stats is not None else None
+        if percentiles is None:
+            return None
+        percentiles['samples'] = len(stats.samples)
+        return percentiles
+    
+    def record(self, url, latency_ms=None, probe=False):
+        """Учет задержки рабочего запроса или, с probe, замера /v5/market/time (None - ошибка)"""
+        stats = (self.stats if probe else self.requests).get(url)
+        if stats is None:
+            return
+        if latency_ms is None:
+            stats.add_failure()
+        else:
+            stats.add_sample(latency_ms)
+    
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
@@ -0,0 +1,137 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import MODEL_REGISTRY_SETTINGS, PREDICTOR_SETTINGS
+from trading.ai_predictor import AIPredictor, stack_models, predict_batch
+
+class ModelRegistry:
+    """Обученные AIPredictor по ключу (symbol, interval, lookback, horizon)
+    
+    Модель обучается при первом обращении к паре и дальше берется из реестра,
+    поэтому переключение пар не приводит к переобучению. Реестр ограничен числом
+    моделей и суммарной памятью; при переполнении вытесняются давно не
+    использованные (LRU).
+    
+    С хранилищем store (ModelStore) модель при промахе сначала загружается
+    с диска, а обученная сохраняется.
+    """
+    
+    def __init__(self, max_models=None, max_bytes=None, lookback=None, horizon=None, store=None):
+        self.max_models = max_models or MODEL_REGISTRY_SETTINGS['max_models']
+        self.max_bytes = max_bytes or MODEL_REGISTRY_SETTINGS['max_bytes']
+        self.lookback = lookback or PREDICTOR_SETTINGS['lookback']
+        self.horizon = horizon or PREDICTOR_SETTINGS['forecast']
+        self.store = store
+        self.models = OrderedDict()  # ключ -> AIPredictor
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'loaded': 0, 'evictions': 0}
+    
+    def key(self, symbol, interval):
+        return (symbol, str(interval), self.lookback, self.horizon)
+    
+    def peek(self, symbol, interval):
+        """Модель из реестра без обучения и без изменения порядка LRU"""
+        with self.lock:
+            return self.models.get(self.key(symbol, interval))
+    
+    def get(self, symbol, interval, load_history):
+        """Обученная модель пары; при первом обращении - с диска или обучение на load_history()
+        
+        load_history вызывается только при промахе. Если данных для обучения
+        недостаточно, возвращается необученная модель, в реестр она не попадает.
+        Откуда взята модель, показывает predictor.source ('store' | 'trained').
+        """
+        key = self.key(symbol, interval)
+        with self.lock:
+            predictor = self.models.get(key)
+            if predictor is not None:
+                self.models.move_to_end(key)
+                self.stats['hits'] += 1
+                return predictor
+            self.stats['misses'] += 1
+        
+        if self.store is not None:
+            predictor = self.store.load(key)
+            if predictor is not None:
+                predictor.source = 'store'
+                self.stats['loaded'] += 1
+                self.put(symbol, interval, predictor)
+                return predictor
+        
+        predictor = AIPredictor(self.lookback, self.horizon)
+        predictor.train_prediction_model(load_history())
+        if predictor.is_model_trained:
+            predictor.source = 'trained'
+            self.put(symbol, interval, predictor)
+            if self.store is not None:
+                self.store.save(key, predictor)
+        return predictor
+    
+    def put(self, symbol, interval, predictor):
+        """Добавление обученной модели (например, загруженной с диска)"""
+        with self.lock:
+            key = self.key(symbol, interval)
+            self.models[key] = predictor
+            self.models.move_to_end(key)
+            self._evict()
+    
+    def _evict(self):
+        total = sum(predictor.nbytes() for predictor in self.models.values())
+        while len(self.models) > 1 and (len(self.models) > self.max_models or total > self.max_bytes):
+            _, predictor = self.models.popitem(last=False)
+            total -= predictor.nbytes()
+            self.stats['evictions'] += 1
+    
+    def predict_many(self, closes, interval):
+        """Предсказания по словарю {symbol: цены закрытия} одним матричным расчетом
+        
+        Используются только модели, уже находящиеся в реестре (без обучения);
+        для пар без модели или с короткой историей - None.
+        """
+        with self.lock:
+            models = {symbol: self.models.get(self.key(symbol, interval)) for symbol in closes}
+        symbols = [symbol for symbol, predictor in models.items()
+                   if predictor is not None and predictor.snapshot is not None and len(closes[symbol]) >= self.lookback]
+        result = dict.fromkeys(closes)
+        if not symbols:
+            return result
+        
+        windows = np.vstack([np.asarray(closes[symbol][-self.lookback:], dtype=np.float64) for symbol in symbols])
+        coef, intercept = stack_models([models[symbol] for symbol in symbols])
+        for symbol, forecast in zip(symbols, predict_batch(windows, coef, intercept)):
+            result[symbol] = forecast
+        return result
+    
+    def load(self):
+        """Загрузка сохраненных моделей при старте (самые свежие, в пределах max_models)"""
+        if self.store is None:
+            return 0
+        keys = [key for key in self.store.keys() if key[2:] == (self.lookback, self.horizon)][:self.max_models]
+        loaded = 0
+        for symbol, interval, _, _ in reversed(keys):  # Самая свежая - последней, в конец LRU
+            predictor = self.store.load(self.key(symbol, interval))
+            if predictor is not None:
+                predictor.source = 'store'
+                self.put(symbol, interval, predictor)
+                loaded += 1
+        self.stats['loaded'] += loaded
+        return loaded
+    
+    def save(self, predictor=None):
+        """Сохранение моделей реестра (или только predictor) на диск"""
+        if self.store is None:
+            return 0
+        with self.lock:
+            items = [(key, model) for key, model in self.models.items() if predictor is None or model is predictor]
+        return sum(self.store.save(key, model) for key, model in items)
+    
+    def memory(self):
+        """{ключ: байт} по моделям реестра"""
+        with self.lock:
+            return {key: predictor.nbytes() for key, predictor in self.models.items()}
+    
+    def clear(self):
+        with self.lock:
+            self.models.clear()
@@ -0,0 +1,146 @@
+import glob
+import json
+import os
+import time
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+from config import MODEL_STORE_SETTINGS
+from trading.ai_predictor import AIPredictor, training_info
+from trading.online_model import OnlineLinearModel
+
+FORMAT_VERSION = 1
+
+class ModelStore:
+    """Обученные модели на диске: один файл .npz на ключ (symbol, interval, lookback, horizon)
+    
+    В файле - параметры модели (коэффициенты, для RLS - матрица P), состояние
+    scaler, если он обучен, и метаданные JSON: настройки модели, обучающее окно
+    и отпечаток его цен. Модель старше max_age или обученная не на тех свечах,
+    что сейчас в истории (другой отпечаток окна), загружается, но помечается
+    stale - ее переобучает ModelRetrainer в фоне, не задерживая первый сигнал.
+    """
+    
+    def __init__(self, directory=None, max_age=None, candles=None):
+        self.directory = directory or MODEL_STORE_SETTINGS['directory']
+        self.max_age = max_age if max_age is not None else MODEL_STORE_SETTINGS['max_age']
+        self.candles = candles  # CandleStore: свечи обучающего окна для сверки отпечатка
+    
+    def path(self, key):
+        symbol, interval, lookback, horizon = key
+        return os.path.join(self.directory, f"{symbol}_{interval}_{lookback}_{horizon}.npz")
+    
+    def save(self, key, predictor):
+        """Атомарная запись модели; False, если модель не обучена"""
+        with predictor.lock:
+            if not predictor.is_model_trained:
+                return False
+            model = predictor.prediction_model
+            if isinstance(model, OnlineLinearModel):
+                arrays = {'weights': model.weights, 'P': model.P}
+                state = {'shift': model.shift, 'samples': model.samples}
+            else:
+                arrays = {'coef': model.coef_, 'intercept': model.intercept_}
+                state = {}
+            if hasattr(predictor.scaler, 'mean_'):
+                arrays.update(scaler_mean=predictor.scaler.mean_, scaler_scale=predictor.scaler.scale_)
+            meta = {
+                'version': FORMAT_VERSION,
+                'key': list(key),
+                'lookback': predictor.lookback,
+                'forecast': predictor.forecast,
+                'online': predictor.online,
+                'forgetting': predictor.forgetting,
+                'float32': predictor.dtype == np.float32,
+                'model_state': state,
+                'last_timestamp': predictor.last_timestamp,
+                'train_error': predictor.train_error,
+                'train_info': predictor.train_info,
+                'saved_at': time.time()
+            }
+        
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path(key)
+            with open(path + '.tmp', 'wb') as f:
+                np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+            os.replace(path + '.tmp', path)
+            return True
+        except Exception as e:
+            print(f"Ошибка сохранения модели {key}: {e}")
+            return False
+    
+    def load(self, key, now_ms=None, price_data=None):
+        """AIPredictor из файла или None (нет файла, другой формат или настройки модели)
+        
+        Отпечаток обучающего окна сверяется (verify) со свечами price_data,
+        а без них - со свечами того же окна из архива candles.
+        """
+        try:
+            with np.load(self.path(key)) as data:
+                meta = json.loads(str(data['meta']))
+                arrays = {name: data[name] for name in data.files if name != 'meta'}
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ошибка загрузки модели {key}: {e}")
+            return None
+        
+        _, _, lookback, horizon = key
+        if meta.get('version') != FORMAT_VERSION or (meta['lookback'], meta['forecast']) != (lookback, horizon):
+            return None
+        
+        predictor = AIPredictor(lookback, horizon, meta['float32'], meta['online'])
+        if predictor.forgetting != meta['forgetting']:
+            return None  # Коэффициент забывания изменен в настройках - обучаем заново
+        if meta['online']:
+            model = OnlineLinearModel(meta['forgetting'])
+            model.weights, model.P = arrays['weights'], arrays['P']
+            model.shift = meta['model_state']['shift']
+            model.samples = meta['model_state']['samples']
+        else:
+            model = LinearRegression()
+            model.coef_, model.intercept_ = arrays['coef'], arrays['intercept']
+            model.n_features_in_ = lookback
+        if 'scaler_mean' in arrays:
+            predictor.scaler.mean_, predictor.scaler.scale_ = arrays['scaler_mean'], arrays['scaler_scale']
+        
+        predictor.swap_model(model, meta['train_error'], meta['last_timestamp'], meta['train_info'])
+        now_ms = now_ms if now_ms is not None else time.time() * 1000
+        predictor.stale = now_ms - meta['last_timestamp'] > self.max_age * 1000
+        info = meta['train_info']
+        if price_data is None and self.candles is not None and info:
+            symbol, interval = key[:2]
+            price_data = self.candles.read(symbol, interval, info['first_timestamp'], info['last_timestamp'] + 1)
+        self.verify(predictor, price_data)
+        return predictor
+    
+    @staticmethod
+    def verify(predictor, price_data):
+        """Сверка отпечатка обучающего окна модели со свечами price_data
+        
+        При расхождении модель помечается stale и возвращается False; None -
+        price_data не покрывает обучающее окно (сверить нечего).
+        """
+        info = predictor.train_info
+        if price_data is None or not info or 'fingerprint' not in info:
+            return None
+        timestamps = np.asarray(price_data['timestamp'])
+        lo = int(np.searchsorted(timestamps, info['first_timestamp']))
+        hi = int(np.searchsorted(timestamps, info['last_timestamp'], side='right'))
+        if hi - lo != info['candles']:
+            return None
+        if training_info(price_data[lo:hi])['fingerprint'] != info['fingerprint']:
+            predictor.stale = True
+            return False
+        return True
+    
+    def keys(self):
+        """Ключи сохраненных моделей, от новых к старым"""
+        paths = sorted(glob.glob(os.path.join(self.directory, '*.npz')), key=os.path.getmtime, reverse=True)
+        keys = []
+        for path in paths:
+            symbol, interval, lookback, horizon = os.path.basename(path)[:-4].rsplit('_', 3)
+            keys.append((symbol, interval, int(lookback), int(horizon)))
+        return keys
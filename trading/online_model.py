@@ -0,0 +1,70 @@
+import numpy as np
+
+class OnlineLinearModel:
+    """Линейная регрессия с несколькими выходами и дообучением по одному примеру
+    
+    Рекурсивный метод наименьших квадратов (RLS): fit() решает задачу целиком,
+    partial_fit() добавляет пример за O(k²) без повторного обучения. forgetting < 1
+    экспоненциально уменьшает вес старых примеров (1.0 - без забывания, результат
+    совпадает с LinearRegression на всей истории).
+    
+    Признаки и цели сдвигаются на первую цену обучения: с уровнем цен в десятки
+    тысяч без сдвига матрица XᵀX плохо обусловлена. Интерфейс (fit, predict,
+    coef_, intercept_) как у sklearn.linear_model.LinearRegression.
+    """
+    
+    CHUNK = 8192  # Строк выборки на блок при накоплении XᵀX в fit
+    
+    def __init__(self, forgetting=1.0):
+        self.forgetting = forgetting
+        self.weights = None     # (k + 1) × m, последняя строка - свободный член
+        self.P = None           # Обратная матрица ковариации признаков
+        self.shift = 0.0
+        self.samples = 0
+    
+    def _augment(self, X):
+        X = np.asarray(X, dtype=np.float64) - self.shift
+        return np.hstack([X, np.ones((len(X), 1))])
+    
+    def fit(self, X, y):
+        """Обучение на всей выборке (X: n × k, y: n × m)
+        
+        Выборка не копируется целиком в float64: XᵀX и Xᵀy (размером (k + 1)²)
+        накапливаются в float64 по блокам из CHUNK строк, поэтому выборка
+        float32 остается float32.
+        """
+        self.shift = float(X[0, 0])
+        gram = np.zeros((X.shape[1] + 1,) * 2)
+        moment = np.zeros((X.shape[1] + 1, y.shape[1]))
+        for start in range(0, len(X), self.CHUNK):
+            A = self._augment(X[start:start + self.CHUNK])
+            gram += A.T @ A
+            moment += A.T @ (np.asarray(y[start:start + self.CHUNK], dtype=np.float64) - self.shift)
+        self.P = np.linalg.pinv(gram)  # pinv - на случай вырожденной выборки (цена без движения)
+        self.weights = self.P @ moment
+        self.samples = len(X)
+        return self
+    
+    def partial_fit(self, x, y):
+        """Дообучение на одном примере (x: k признаков, y: m целей)"""
+        a = np.append(np.asarray(x, dtype=np.float64) - self.shift, 1.0)
+        Pa = self.P @ a
+        gain = Pa / (self.forgetting + a @ Pa)
+        error = (np.asarray(y, dtype=np.float64) - self.shift) - a @ self.weights
+        self.weights += np.outer(gain, error)
+        self.P = (self.P - np.outer(gain, Pa)) / self.forgetting
+        self.P = (self.P + self.P.T) / 2  # Симметрия против накопления ошибки округления
+        self.samples += 1
+        return self
+    
+    def predict(self, X):
+        return self._augment(np.atleast_2d(X)) @ self.weights + self.shift
+    
+    @property
+    def coef_(self):
+        """Коэффициенты в исходной шкале цен (m × k)"""
+        return self.weights[:-1].T
+    
+    @property
+    def intercept_(self):
+        return self.weights[-1] + self.shift * (1 - self.weights[:-1].sum(axis=0))
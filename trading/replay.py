@@ -0,0 +1,288 @@
+import argparse
+import bisect
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Эндпоинты BYBIT, которые записываются и воспроизводятся
+RECORDED_PATHS = ('/v5/market/kline', '/v5/market/time')
+
+class SimulatedClock:
+    """Модельное время: стартует с start_ms и идет в speed раз быстрее реального
+    
+    Совместимо по интерфейсу с модулем time (time() и sleep()), поэтому
+    подставляется вместо него в DataProvider и торговый цикл.
+    """
+    
+    def __init__(self, start_ms, speed=1.0):
+        self.start_ms = start_ms
+        self.speed = speed
+        self._origin = time.monotonic()
+    
+    def time(self):
+        """Модельное время в секундах"""
+        return self.start_ms / 1000 + (time.monotonic() - self._origin) * self.speed
+    
+    def time_ms(self):
+        return int(self.time() * 1000)
+    
+    def sleep(self, seconds):
+        """Пауза в модельных секундах"""
+        time.sleep(max(seconds, 0) / self.speed)
+    
+    @classmethod
+    def from_server(cls, url, speed=1.0, session=None):
+        """Часы, синхронизированные с сервером воспроизведения через /v5/market/time"""
+        import requests
+        
+        response = (session or requests).get(f"{url}/v5/market/time", timeout=3)
+        return cls(int(response.json()['time']), speed)
+
+class ResponseRecorder:
+    """Запись ответов /v5/market/kline и /v5/market/time в JSONL
+    
+    Подключается как response-hook сессии requests (DataProvider.add_response_hook),
+    поэтому записывается ровно то, что получает терминал.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    def __call__(self, response, *args, **kwargs):
+        url = urlparse(response.url)
+        if url.path not in RECORDED_PATHS or response.status_code != 200:
+            return response
+        
+        record = {
+            'path': url.path,
+            'params': {key: values[-1] for key, values in parse_qs(url.query).items()},
+            'recorded_at': int(time.time() * 1000),
+            'body': response.json()
+        }
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+            self.records += 1
+        return response
+
+class Recording:
+    """Записанные свечи: для каждой (symbol, interval) - версии свечей по времени записи"""
+    
+    def __init__(self, path):
+        self.candles = {}   # (symbol, interval) -> {start_ms: [(recorded_at, row), ...]}
+        self.first_time = None
+        self.last_time = None
+        
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    self._add(json.loads(line))
+        
+        for versions in self.candles.values():
+            for items in versions.values():
+                items.sort(key=lambda item: item[0])
+        self.series = {key: sorted(versions) for key, versions in self.candles.items()}
+    
+    def _add(self, record):
+        recorded_at = record['recorded_at']
+        self.first_time = recorded_at if self.first_time is None else min(self.first_time, recorded_at)
+        self.last_time = recorded_at if self.last_time is None else max(self.last_time, recorded_at)
+        if record['path'] != '/v5/market/kline' or record['body'].get('retCode') != 0:
+            return
+        
+        key = (record['params']['symbol'], record['params'].get('interval', '1'))
+        versions = self.candles.setdefault(key, {})
+        for row in record['body']['result']['list']:
+            versions.setdefault(int(row[0]), []).append((recorded_at, row))
+    
+    def klines(self, symbol, interval, now_ms, limit=200, start=None, end=None):
+        """Свечи в формате BYBIT (от новых к старым), какими они были в момент now_ms"""
+        series = self.series.get((symbol, str(interval)))
+        if not series:
+            return []
+        
+        hi = end if end is not None else now_ms
+        hi = bisect.bisect_right(series, min(hi, now_ms))
+        lo = 0 if start is None else bisect.bisect_left(series, start)
+        lo = max(lo, hi - limit)
+        
+        versions = self.candles[(symbol, str(interval))]
+        rows = []
+        for ts in series[lo:hi]:
+            items = versions[ts]
+            # Последняя версия свечи, записанная не позже now_ms (иначе самая ранняя)
+            idx = bisect.bisect_right([item[0] for item in items], now_ms) - 1
+            rows.append(items[max(idx, 0)][1])
+        rows.reverse()
+        return rows
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, как у настоящего API
+    disable_nagle_algorithm = True  # Заголовки и тело уходят без задержки подтверждения TCP
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        now_ms = server.clock.time_ms()
+        server.requests += 1
+        
+        delay = server.response_delay()
+        if delay:
+            time.sleep(delay)
+        
+        if url.path == '/v5/market/time':
+            body = {
+                'retCode': 0, 'retMsg': 'OK',
+                'result': {'timeSecond': str(now_ms // 1000), 'timeNano': str(now_ms * 1_000_000)},
+                'time': now_ms
+            }
+        elif url.path == '/v5/market/kline':
+            rows = server.recording.klines(
+                params.get('symbol', ''), params.get('interval', '1'), now_ms,
+                limit=int(params.get('limit', 200)),
+                start=int(params['start']) if 'start' in params else None,
+                end=int(params['end']) if 'end' in params else None
+            )
+            body = {
+                'retCode': 0, 'retMsg': 'OK',
+                'result': {'category': 'spot', 'symbol': params.get('symbol', ''), 'list': rows},
+                'time': now_ms
+            }
+        else:
+            self.send_error(404)
+            return
+        
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+class ReplayServer(ThreadingHTTPServer):
+    """Локальный сервер BYBIT, отдающий записанные свечи по модельным часам (1x-1000x)
+    
+    Клиент видит только свечи, открытые не позже текущего модельного времени,
+    и подключается через запись в BYBIT_SERVERS (переменная BYBIT_REPLAY_URL).
+    Для проверки хеджирования сервер может задерживать ответы: delay - к каждому
+    ответу, slow_delay - к доле slow_ratio ответов (медленный хвост).
+    """
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, recording, host='127.0.0.1', port=0, speed=1.0, start_ms=None,
+                 delay=0.0, slow_ratio=0.0, slow_delay=0.0, seed=None):
+        super().__init__((host, port), _ReplayHandler)
+        self.recording = recording
+        self.clock = SimulatedClock(start_ms or recording.first_time or int(time.time() * 1000), speed)
+        self.requests = 0
+        self.delay = delay
+        self.slow_ratio = slow_ratio
+        self.slow_delay = slow_delay
+        self.random = random.Random(seed)
+    
+    def response_delay(self):
+        """Искусственная задержка ответа (сек)"""
+        delay = self.delay
+        if self.slow_ratio and self.random.random() < self.slow_ratio:
+            delay += self.slow_delay
+        return delay
+    
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def handle_error(self, request, client_address):
+        """Обрыв соединения клиентом (холодные замеры задержки) - не ошибка"""
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+    
+    @property
+    def finished(self):
+        """Модельное время дошло до конца записи"""
+        return self.recording.last_time is not None and self.clock.time_ms() > self.recording.last_time
+    
+    def start(self):
+        """Запуск сервера в фоновом потоке"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def record(path, symbols, interval='1', duration=600, period=5, limit=100):
+    """Запись сессии: опрос BYBIT через DataProvider с записью всех ответов"""
+    from config import BYBIT_SERVERS
+    from trading.data_provider import DataProvider
+    
+    recorder = ResponseRecorder(path)
+    provider = DataProvider(BYBIT_SERVERS[0])
+    provider.add_response_hook(recorder)
+    
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        provider.measure_ping()
+        provider.get_market_data_many(symbols, interval, limit)
+        time.sleep(period)
+    provider.close()
+    return recorder.records
+
+def main():
+    """Командная строка:
+    python -m trading.replay record data/recordings/session.jsonl BTCUSDT ETHUSDT --duration 600
+    python -m trading.replay serve data/recordings/session.jsonl --speed 100 --port 8765
+    """
+    parser = argparse.ArgumentParser(description="Запись и воспроизведение REST API BYBIT")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    record_parser = subparsers.add_parser('record', help="Запись ответов BYBIT")
+    record_parser.add_argument('path')
+    record_parser.add_argument('symbols', nargs='+')
+    record_parser.add_argument('--interval', default='1')
+    record_parser.add_argument('--duration', type=float, default=600)
+    record_parser.add_argument('--period', type=float, default=5)
+    record_parser.add_argument('--limit', type=int, default=100)
+    
+    serve_parser = subparsers.add_parser('serve', help="Локальный сервер воспроизведения")
+    serve_parser.add_argument('path')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--speed', type=float, default=1.0)
+    serve_parser.add_argument('--delay', type=float, default=0.0, help="Задержка каждого ответа (сек)")
+    serve_parser.add_argument('--slow-ratio', type=float, default=0.0, help="Доля медленных ответов")
+    serve_parser.add_argument('--slow-delay', type=float, default=0.0, help="Доп. задержка медленных ответов (сек)")
+    
+    args = parser.parse_args()
+    
+    if args.command == 'record':
+        records = record(args.path, args.symbols, args.interval, args.duration, args.period, args.limit)
+        print(f"Записано ответов: {records}")
+    else:
+        server = ReplayServer(Recording(args.path), args.host, args.port, args.speed,
+                              delay=args.delay, slow_ratio=args.slow_ratio, slow_delay=args.slow_delay)
+        print(f"Воспроизведение {args.path} на {server.url} (скорость {args.speed}x)")
+        print(f"Для терминала: BYBIT_REPLAY_URL={server.url} BYBIT_REPLAY_SPEED={args.speed}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import numpy as np
+
+from config import MULTI_TIMEFRAME_SETTINGS
+from trading.candle_buffer import CandleRingBuffer, interval_to_ms
+from trading.candle_frame import CandleFrame, VALUE_COLUMNS
+
+def _aggregate(timestamps, values, interval_ms):
+    """Группировка свечей по корзинам interval_ms: (начала корзин, матрица OHLCV)
+    
+    values - матрица (VALUE_COLUMNS × n) отсортированных по времени свечей;
+    корзины считаются групповыми редукциями reduceat без цикла по свечам.
+    """
+    if len(timestamps) == 0:
+        return timestamps[:0], values[:, :0]
+    buckets = timestamps // interval_ms * interval_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(timestamps)] - 1
+    
+    open_, high, low, close, volume, turnover = values
+    aggregated = np.vstack([
+        open_[starts],
+        np.maximum.reduceat(high, starts),
+        np.minimum.reduceat(low, starts),
+        close[ends],
+        np.add.reduceat(volume, starts),
+        np.add.reduceat(turnover, starts)
+    ])
+    return buckets[starts], aggregated
+
+def _combine(earlier, later):
+    """Свертка двух свечей одной корзины (столбцы OHLCV)"""
+    return np.array([
+        earlier[0],
+        max(earlier[1], later[1]),
+        min(earlier[2], later[2]),
+        later[3],
+        earlier[4] + later[4],
+        earlier[5] + later[5]
+    ])
+
+def resample(frame, interval):
+    """Свечи старшего таймфрейма из младших (CandleFrame -> CandleFrame)"""
+    interval_ms = interval_to_ms(interval)
+    if interval_ms is None:
+        raise ValueError(f"Неподдерживаемый интервал: {interval}")
+    timestamps, values = _aggregate(frame.timestamp, frame.values, interval_ms)
+    return CandleFrame.from_columns(timestamps, values)
+
+class _TimeframeState:
+    """Буфер старшего таймфрейма и свертка закрытых минутных свечей текущей корзины"""
+    
+    def __init__(self, interval, capacity):
+        self.interval_ms = interval_to_ms(interval)
+        if self.interval_ms is None:
+            raise ValueError(f"Неподдерживаемый интервал: {interval}")
+        self.buffer = CandleRingBuffer(capacity, interval)
+        self.partial_ts = None   # Начало текущей корзины
+        self.partial = None      # OHLCV закрытых минутных свечей текущей корзины
+    
+    def _write(self, timestamps, values):
+        frame = CandleFrame.from_columns(np.asarray(timestamps, dtype=np.int64), np.asarray(values).reshape(len(VALUE_COLUMNS), -1))
+        if self.buffer.merge(frame):
+            # Пропущенные корзины (например, после паузы) - начинаем буфер заново
+            self.buffer.clear()
+            self.buffer.merge(frame)
+    
+    def add_closed(self, timestamps, values, initial):
+        """Добавление закрытых минутных свечей"""
+        if initial:
+            # Первая корзина истории неполная (не с начала интервала) - пропускаем ее
+            first_full = -(-int(timestamps[0]) // self.interval_ms) * self.interval_ms if len(timestamps) else 0
+            skip = np.searchsorted(timestamps, first_full)
+            timestamps, values = timestamps[skip:], values[:, skip:]
+        
+        buckets, aggregated = _aggregate(timestamps, values, self.interval_ms)
+        if len(buckets) == 0:
+            return
+        
+        if self.partial is not None:
+            if buckets[0] == self.partial_ts:
+                aggregated[:, 0] = _combine(self.partial, aggregated[:, 0])
+            else:
+                self._write([self.partial_ts], self.partial)  # Корзина завершилась без новых свечей
+        
+        if len(buckets) > 1:
+            self._write(buckets[:-1], aggregated[:, :-1])
+        self.partial_ts, self.partial = int(buckets[-1]), aggregated[:, -1].copy()
+    
+    def set_forming(self, timestamp, values):
+        """Текущая (формирующаяся) свеча старшего таймфрейма с учетом открытой минутной"""
+        bucket = timestamp // self.interval_ms * self.interval_ms
+        if self.partial is not None and self.partial_ts == bucket:
+            self._write([bucket], _combine(self.partial, values))
+        else:
+            if self.partial is not None:
+                self._write([self.partial_ts], self.partial)
+            self._write([bucket], values)
+
+class Resampler:
+    """Свечи старших таймфреймов из минутных с инкрементальным обновлением
+    
+    update() принимает минутные свечи (последняя - формирующаяся) и сворачивает
+    только свечи, закрытые после прошлого вызова; свечи старших таймфреймов
+    хранятся в кольцевых буферах.
+    """
+    
+    def __init__(self, intervals=None, source_interval='1', capacity=None):
+        self.source_ms = interval_to_ms(source_interval)
+        capacity = capacity or MULTI_TIMEFRAME_SETTINGS['capacity']
+        self.intervals = tuple(str(interval) for interval in (intervals or MULTI_TIMEFRAME_SETTINGS['intervals']))
+        self.states = {interval: _TimeframeState(interval, capacity) for interval in self.intervals}
+        self.last_closed_ts = None
+    
+    def reset(self):
+        capacity = next(iter(self.states.values())).buffer.capacity if self.states else 0
+        self.states = {interval: _TimeframeState(interval, capacity) for interval in self.intervals}
+        self.last_closed_ts = None
+    
+    def update(self, frame):
+        """Учет новых минутных свечей (CandleFrame, от старых к новым)"""
+        timestamps = frame.timestamp
+        if len(timestamps) == 0:
+            return
+        if self.last_closed_ts is not None and timestamps[0] > self.last_closed_ts + self.source_ms:
+            self.reset()  # Разрыв с прошлыми данными
+        
+        initial = self.last_closed_ts is None
+        values = frame.values
+        closed = timestamps < timestamps[-1]
+        if not initial:
+            closed &= timestamps > self.last_closed_ts
+        new_timestamps, new_values = timestamps[closed], values[:, closed]
+        
+        for state in self.states.values():
+            if len(new_timestamps):
+                state.add_closed(new_timestamps, new_values, initial)
+            state.set_forming(int(timestamps[-1]), values[:, -1])
+        if len(new_timestamps):
+            self.last_closed_ts = int(new_timestamps[-1])
+        elif initial:
+            self.last_closed_ts = int(timestamps[-1]) - self.source_ms
+    
+    def frames(self, limit=None):
+        """{интервал: CandleFrame} старших таймфреймов (копии)"""
+        return {interval: state.buffer.to_frame(limit, copy=True) for interval, state in self.states.items()}
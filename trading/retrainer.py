@@ -0,0 +1,93 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import RETRAIN_SETTINGS
+from trading.ai_predictor import fit_price_model, training_info
+
+class ModelRetrainer:
+    """Переобучение моделей AIPredictor в отдельном процессе
+    
+    Обучение (fit) не занимает поток торгового цикла: в процесс уходят только
+    цены закрытия, обратно - обученная модель (коэффициенты, для RLS еще матрица
+    P размером (k + 1)²), которая подменяет текущую через AIPredictor.swap_model.
+    Переобучение запускается по расписанию (interval) или при дрейфе - когда
+    ошибка на новых свечах в drift_ratio раз выше ошибки на обучении.
+    Обучение одно за раз, модель передается в due() и submit().
+    """
+    
+    def __init__(self, settings=None, on_swap=None):
+        self.settings = dict(RETRAIN_SETTINGS, **(settings or {}))
+        self.on_swap = on_swap  # Вызывается с моделью после подмены (например, сохранение на диск)
+        self.executor = None
+        self.future = None
+        self.done = threading.Event()
+        self.stats = {'submitted': 0, 'swapped': 0, 'failed': 0, 'last_duration': None, 'last_reason': None}
+    
+    def due(self, predictor):
+        """Причина переобучения модели ('stale' | 'interval' | 'drift') или None"""
+        if not self.settings['enabled'] or not predictor.is_model_trained:
+            return None
+        if self.future is not None and not self.future.done():
+            return None
+        if predictor.stale:
+            return 'stale'
+        elapsed = time.monotonic() - predictor.trained_at
+        if elapsed >= self.settings['interval']:
+            return 'interval'
+        drift = predictor.drift()
+        if drift is not None and drift >= self.settings['drift_ratio'] and elapsed >= self.settings['min_interval']:
+            return 'drift'
+        return None
+    
+    def submit(self, predictor, price_data, reason=None):
+        """Запуск обучения на закрытых свечах price_data; результат подменит модель по готовности"""
+        if self.future is not None and not self.future.done():
+            return False
+        if price_data is None or len(price_data) == 0:
+            return False
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.settings['workers'])
+        
+        closes = np.ascontiguousarray(price_data['close'], dtype=np.float64)
+        info = training_info(price_data)
+        started = time.monotonic()
+        predictor.trained_at = started  # Повторно - не раньше, чем через interval
+        predictor.stale = False
+        self.stats['submitted'] += 1
+        self.stats['last_reason'] = reason
+        self.done.clear()
+        self.future = self.executor.submit(fit_price_model, closes, predictor.lookback, predictor.forecast,
+                                           predictor.dtype, predictor.online, predictor.forgetting)
+        
+        def on_done(future):
+            self.stats['last_duration'] = time.monotonic() - started
+            try:
+                fitted = future.result()
+                if fitted is not None:
+                    # Свечи, закрытые после last_timestamp, модель доберет через update_model
+                    predictor.swap_model(*fitted, info['last_timestamp'], info)
+                    self.stats['swapped'] += 1
+                    if self.on_swap:
+                        self.on_swap(predictor)
+            except Exception as e:
+                self.stats['failed'] += 1
+                print(f"Ошибка фонового обучения модели: {e}")
+            finally:
+                self.done.set()
+        
+        self.future.add_done_callback(on_done)
+        return True
+    
+    def wait(self, timeout=None):
+        """Ожидание текущего обучения вместе с подменой модели (для замеров)"""
+        return self.future is None or self.done.wait(timeout)
+    
+    def shutdown(self):
+        """Остановка процесса обучения (незавершенное обучение отменяется)"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.future = None
@@ -0,0 +1,102 @@
+from config import SCHEDULER_SETTINGS
+from trading.candle_buffer import interval_to_ms
+
+class CandleScheduler:
+    """Планировщик опроса по закрытию свечей с учетом часов сервера BYBIT
+    
+    Смещение локальных часов относительно сервера оценивается по
+    /v5/market/time (замер с минимальным RTT, как в NTP). Цикл просыпается
+    сразу после ожидаемого закрытия свечи плюс settle_delay и, если задан
+    refresh_interval, для промежуточных обновлений внутри свечи.
+    """
+    
+    def __init__(self, provider, interval='1', settings=None):
+        self.settings = dict(SCHEDULER_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+        self.provider = provider
+        self.interval = str(interval)
+        self.interval_ms = interval_to_ms(interval)
+        self.offset_ms = 0          # Время сервера минус локальное время
+        self.rtt_ms = None          # RTT лучшего замера
+        self.synced_at = None       # Локальное время последней синхронизации (сек)
+        self.last_signature = None
+        self.stats = {'wakeups': 0, 'closes': 0, 'refreshes': 0, 'skipped': 0}
+    
+    @property
+    def clock(self):
+        # Часы берутся у DataProvider: при воспроизведении записи это SimulatedClock
+        return self.provider.clock
+    
+    def sync_clock(self, samples=None):
+        """Оценка смещения часов сервера; возвращает смещение в мс или None"""
+        best = None
+        for _ in range(samples or self.settings['clock_samples']):
+            local_start = self.clock.time() * 1000
+            server_ms = self.provider.get_server_time()
+            local_end = self.clock.time() * 1000
+            if server_ms is None:
+                continue
+            rtt = local_end - local_start
+            # Ответ сформирован примерно в середине запроса
+            offset = server_ms - (local_start + local_end) / 2
+            if best is None or rtt < best[0]:
+                best = (rtt, offset)
+        
+        self.synced_at = self.clock.time()
+        if best is None:
+            return None
+        self.rtt_ms, self.offset_ms = best
+        return self.offset_ms
+    
+    def server_now_ms(self):
+        """Текущее время сервера по локальным часам и смещению"""
+        return self.clock.time() * 1000 + self.offset_ms
+    
+    def next_wake(self):
+        """(время сервера следующего пробуждения в мс, True - закрытие свечи)"""
+        now = self.server_now_ms()
+        refresh = self.settings['refresh_interval']
+        if not self.interval_ms:
+            return now + refresh * 1000, False
+        
+        next_close = (now // self.interval_ms + 1) * self.interval_ms + self.settings['settle_delay'] * 1000
+        # Свеча могла закрыться только что: settle_delay еще не истек
+        previous_close = next_close - self.interval_ms
+        if previous_close > now:
+            next_close = previous_close
+        
+        if refresh and now + refresh * 1000 < next_close - refresh * 500:
+            return now + refresh * 1000, False
+        return next_close, True
+    
+    def wait(self, is_running=None):
+        """Сон до следующего пробуждения; возвращает False, если цикл остановлен"""
+        if self.synced_at is None or self.clock.time() - self.synced_at > self.settings['resync_period']:
+            self.sync_clock()
+        
+        wake_ms, is_close = self.next_wake()
+        # Сон короткими шагами, чтобы остановка цикла срабатывала быстро
+        while True:
+            if is_running is not None and not is_running():
+                return False
+            remaining = (wake_ms - self.server_now_ms()) / 1000
+            if remaining <= 0:
+                break
+            self.clock.sleep(min(remaining, 1))
+        
+        self.stats['wakeups'] += 1
+        self.stats['closes' if is_close else 'refreshes'] += 1
+        return True
+    
+    def has_changed(self, symbol, frame):
+        """Изменились ли данные с прошлого раза (новая свеча, цена или объем последней свечи)"""
+        if frame is None or len(frame) == 0:
+            return False
+        signature = (symbol, len(frame), int(frame['timestamp'][-1]),
+                     float(frame['close'][-1]), float(frame['volume'][-1]))
+        if signature == self.last_signature:
+            self.stats['skipped'] += 1
+            return False
+        self.last_signature = signature
+        return True
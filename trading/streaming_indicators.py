@@ -0,0 +1,256 @@
+import math
+from collections import deque
+
+# Потоковые версии индикаторов из trading.indicators: O(1) на свечу.
+# update(x) - закрытая свеча (состояние меняется), peek(x) - формирующаяся
+# свеча (значение как при update, но без изменения состояния).
+# До накопления достаточной истории значения равны NaN, как в пакетном расчете.
+
+NAN = float('nan')
+
+class RollingWindow:
+    """Скользящее окно с текущими суммами для среднего и дисперсии
+    
+    Суммы ведутся относительно первого значения (сдвиг), чтобы дисперсия
+    не теряла точность на больших ценах, и периодически пересчитываются
+    заново, чтобы не накапливалась ошибка округления.
+    """
+    
+    RESYNC_EVERY = 1000
+    
+    def __init__(self, period):
+        self.period = period
+        self.values = deque(maxlen=period)
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.updates = 0
+    
+    def _sums(self, x):
+        """Суммы окна после добавления x"""
+        d = x - self.shift
+        total = self.total + d
+        total_sq = self.total_sq + d * d
+        if len(self.values) == self.period:
+            old = self.values[0] - self.shift
+            total -= old
+            total_sq -= old * old
+        return total, total_sq
+    
+    def _stats(self, total, total_sq, count):
+        if count < self.period:
+            return NAN, NAN
+        mean = total / count
+        variance = max(total_sq / count - mean * mean, 0.0)
+        return mean + self.shift, math.sqrt(variance)
+    
+    def update(self, x):
+        """(среднее, стандартное отклонение) после добавления закрытого значения"""
+        if self.shift is None:
+            self.shift = x
+        self.total, self.total_sq = self._sums(x)
+        self.values.append(x)
+        self.updates += 1
+        if self.updates % self.RESYNC_EVERY == 0:
+            self.total = sum(value - self.shift for value in self.values)
+            self.total_sq = sum((value - self.shift) ** 2 for value in self.values)
+        return self._stats(self.total, self.total_sq, len(self.values))
+    
+    def peek(self, x):
+        if self.shift is None:
+            return NAN, NAN
+        total, total_sq = self._sums(x)
+        return self._stats(total, total_sq, min(len(self.values) + 1, self.period))
+
+class StreamingSMA:
+    """Простая скользящая средняя"""
+    
+    def __init__(self, period):
+        self.window = RollingWindow(period)
+    
+    def update(self, x):
+        return self.window.update(x)[0]
+    
+    def peek(self, x):
+        return self.window.peek(x)[0]
+
+class StreamingEMA:
+    """EMA с начальным значением SMA первых period точек (как indicators.ema)"""
+    
+    def __init__(self, period, alpha=None):
+        self.period = period
+        self.alpha = 2 / (period + 1) if alpha is None else alpha
+        self.seed = []
+        self.value = NAN
+    
+    def _next(self, x):
+        if self.seed is None:
+            return self.alpha * x + (1 - self.alpha) * self.value
+        if len(self.seed) + 1 == self.period:
+            return (sum(self.seed) + x) / self.period
+        return NAN
+    
+    def update(self, x):
+        value = self._next(x)
+        if self.seed is not None:
+            self.seed.append(x)
+            if len(self.seed) == self.period:
+                self.seed = None  # Начальное значение набрано, дальше - рекурсия
+        self.value = value
+        return value
+    
+    def peek(self, x):
+        return self._next(x)
+    
+    @property
+    def ready(self):
+        return self.seed is None
+
+class StreamingRSI:
+    """RSI Уайлдера"""
+    
+    def __init__(self, period=14):
+        self.prev_close = None
+        self.gain = StreamingEMA(period, alpha=1 / period)
+        self.loss = StreamingEMA(period, alpha=1 / period)
+    
+    @staticmethod
+    def _rsi(gain, loss):
+        if math.isnan(gain):
+            return NAN
+        if loss == 0:
+            return 50.0 if gain == 0 else 100.0
+        return 100 - 100 / (1 + gain / loss)
+    
+    def update(self, close):
+        if self.prev_close is None:
+            self.prev_close = close
+            return NAN
+        delta = close - self.prev_close
+        self.prev_close = close
+        return self._rsi(self.gain.update(max(delta, 0.0)), self.loss.update(max(-delta, 0.0)))
+    
+    def peek(self, close):
+        if self.prev_close is None:
+            return NAN
+        delta = close - self.prev_close
+        return self._rsi(self.gain.peek(max(delta, 0.0)), self.loss.peek(max(-delta, 0.0)))
+
+class StreamingMACD:
+    """(линия MACD, сигнальная линия, гистограмма)"""
+    
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal)
+    
+    def update(self, close):
+        line = self.fast.update(close) - self.slow.update(close)
+        # Сигнальная EMA начинается с первой определенной точки линии MACD
+        signal = self.signal.update(line) if not math.isnan(line) else NAN
+        return line, signal, line - signal
+    
+    def peek(self, close):
+        line = self.fast.peek(close) - self.slow.peek(close)
+        signal = self.signal.peek(line) if not math.isnan(line) else NAN
+        return line, signal, line - signal
+
+class StreamingBollinger:
+    """(верхняя полоса, средняя, нижняя, позиция цены между полосами 0-1)"""
+    
+    def __init__(self, period=20, width=2):
+        self.window = RollingWindow(period)
+        self.width = width
+    
+    def _bands(self, close, mean, std):
+        if math.isnan(mean):
+            return NAN, NAN, NAN, NAN
+        upper = mean + self.width * std
+        lower = mean - self.width * std
+        position = (close - lower) / (upper - lower) if upper != lower else 0.5
+        return upper, mean, lower, position
+    
+    def update(self, close):
+        return self._bands(close, *self.window.update(close))
+    
+    def peek(self, close):
+        return self._bands(close, *self.window.peek(close))
+
+class StreamingVolumeRatio:
+    """Отношение объема к его скользящей средней"""
+    
+    def __init__(self, period=20):
+        self.window = RollingWindow(period)
+    
+    @staticmethod
+    def _ratio(volume, mean):
+        if math.isnan(mean):
+            return NAN
+        return volume / mean if mean != 0 else 1.0
+    
+    def update(self, volume):
+        return self._ratio(volume, self.window.update(volume)[0])
+    
+    def peek(self, volume):
+        return self._ratio(volume, self.window.peek(volume)[0])
+
+class StreamingIndicators:
+    """Набор потоковых индикаторов TechnicalIndicators для одной пары
+    
+    Значения совпадают с последним элементом TechnicalIndicators.calculate_series
+    по той же истории (с точностью до округления).
+    """
+    
+    def __init__(self):
+        self.sma_20 = StreamingSMA(20)
+        self.sma_50 = StreamingSMA(50)
+        self.rsi = StreamingRSI(14)
+        self.macd = StreamingMACD(12, 26, 9)
+        self.bollinger = StreamingBollinger(20, 2)
+        self.volume_ratio = StreamingVolumeRatio(20)
+        self.count = 0                 # Закрытых свечей в состоянии
+        self.last_timestamp = None     # Время последней закрытой свечи
+    
+    @classmethod
+    def from_frame(cls, frame):
+        """Состояние по закрытым свечам frame (все, кроме последней - формирующейся)"""
+        stream = cls()
+        for timestamp, close, volume in zip(frame['timestamp'][:-1], frame['close'][:-1], frame['volume'][:-1]):
+            stream.update({'timestamp': timestamp, 'close': close, 'volume': volume})
+        return stream
+    
+    @staticmethod
+    def _result(candle, sma_20, sma_50, rsi, macd, bands, volume_ratio):
+        line, signal, histogram = macd
+        upper, middle, lower, position = bands
+        return {
+            'sma_20': sma_20,
+            'sma_50': sma_50,
+            'rsi': rsi,
+            'macd': line,
+            'macd_signal': signal,
+            'macd_hist': histogram,
+            'bb_upper': upper,
+            'bb_middle': middle,
+            'bb_lower': lower,
+            'bb_position': position,
+            'volume_ratio': volume_ratio,
+            'current_price': float(candle['close']),
+            'timestamp': candle['timestamp']
+        }
+    
+    def update(self, candle):
+        """Закрытая свеча (словарь с timestamp, close, volume)"""
+        close, volume = float(candle['close']), float(candle['volume'])
+        self.count += 1
+        self.last_timestamp = int(candle['timestamp'])
+        return self._result(candle, self.sma_20.update(close), self.sma_50.update(close), self.rsi.update(close),
+                            self.macd.update(close), self.bollinger.update(close),
+                            self.volume_ratio.update(volume))
+    
+    def peek(self, open_candle):
+        """Формирующаяся свеча: значения без изменения состояния"""
+        close, volume = float(open_candle['close']), float(open_candle['volume'])
+        return self._result(open_candle, self.sma_20.peek(close), self.sma_50.peek(close), self.rsi.peek(close),
+                            self.macd.peek(close), self.bollinger.peek(close),
+                            self.volume_ratio.peek(volume))
@@ -0,0 +1,210 @@
+import argparse
+import base64
+import hashlib
+import json
+import socketserver
+import struct
+import threading
+import time
+
+# GUID из RFC 6455 для вычисления Sec-WebSocket-Accept
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+def load_frames(path):
+    """Чтение записанных кадров (JSONL, одна строка - одно сообщение BYBIT)"""
+    frames = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                frames.append(json.loads(line))
+    return frames
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("клиент закрыл соединение")
+        data += chunk
+    return data
+
+def recv_frame(sock):
+    """Чтение одного кадра WebSocket: (opcode, payload)"""
+    b1, b2 = _recv_exact(sock, 2)
+    opcode = b1 & 0x0F
+    length = b2 & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', _recv_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if b2 & 0x80 else None
+    payload = _recv_exact(sock, length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+def send_frame(sock, payload, opcode=0x1):
+    """Отправка кадра WebSocket от сервера (без маски)"""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack('!H', length)
+    else:
+        header += bytes([127]) + struct.pack('!Q', length)
+    sock.sendall(header + payload)
+
+class _ReplayHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        sock = self.request
+        if not self._handshake(sock):
+            return
+        
+        server.connections += 1
+        topics = set()
+        subscribed = threading.Event()
+        closed = threading.Event()
+        send_lock = threading.Lock()
+        
+        def send(message):
+            with send_lock:
+                send_frame(sock, json.dumps(message))
+        
+        def sender():
+            # Ждем первую подписку, затем воспроизводим кадры подписанных топиков
+            subscribed.wait()
+            sent = 0
+            for frame in server.frames:
+                if closed.is_set():
+                    return
+                if frame.get('topic') not in topics:
+                    continue
+                time.sleep(server.frame_delay)
+                try:
+                    send(frame)
+                except OSError:
+                    return
+                sent += 1
+                if server.disconnect_after and sent >= server.disconnect_after:
+                    closed.set()
+                    sock.close()  # Имитация обрыва соединения
+                    return
+        
+        threading.Thread(target=sender, daemon=True).start()
+        
+        try:
+            while not closed.is_set():
+                opcode, payload = recv_frame(sock)
+                if opcode == 0x8:  # close
+                    break
+                if opcode == 0x9:  # ping на уровне протокола
+                    with send_lock:
+                        send_frame(sock, payload, opcode=0xA)
+                    continue
+                if opcode != 0x1:
+                    continue
+                
+                message = json.loads(payload)
+                op = message.get('op')
+                if op == 'ping':
+                    server.pings += 1
+                    if server.respond_to_ping:
+                        send({'success': True, 'ret_msg': 'pong', 'op': 'ping'})
+                elif op == 'subscribe':
+                    topics.update(message.get('args', []))
+                    send({'success': True, 'ret_msg': 'subscribe', 'op': 'subscribe'})
+                    subscribed.set()
+                elif op == 'unsubscribe':
+                    topics.difference_update(message.get('args', []))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            closed.set()
+            subscribed.set()
+    
+    def _handshake(self, sock):
+        """HTTP Upgrade -> WebSocket"""
+        request = b''
+        while b'\r\n\r\n' not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+        
+        key = None
+        for line in request.decode('latin-1').split('\r\n'):
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'sec-websocket-key':
+                key = value.strip()
+        if key is None:
+            return False
+        
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        sock.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        return True
+
+class ReplayWebSocketServer(socketserver.ThreadingTCPServer):
+    """Локальная замена WebSocket BYBIT: воспроизводит записанные кадры kline
+    
+    frame_delay - пауза между кадрами (сек), disconnect_after - обрыв
+    соединения после N кадров, respond_to_ping=False - имитация зависшего
+    соединения для проверки heartbeat.
+    """
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, frames, host='127.0.0.1', port=0, frame_delay=0.0, disconnect_after=None,
+                 respond_to_ping=True):
+        super().__init__((host, port), _ReplayHandler)
+        self.frames = frames
+        self.frame_delay = frame_delay
+        self.disconnect_after = disconnect_after
+        self.respond_to_ping = respond_to_ping
+        self.connections = 0
+        self.pings = 0
+    
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"ws://{host}:{port}"
+    
+    def start(self):
+        """Запуск сервера в фоновом потоке"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    """Командная строка: python -m trading.ws_replay frames.jsonl --port 8766 --delay 0.1"""
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных WebSocket кадров BYBIT")
+    parser.add_argument('frames')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--delay', type=float, default=0.1)
+    parser.add_argument('--disconnect-after', type=int, default=None)
+    args = parser.parse_args()
+    
+    server = ReplayWebSocketServer(load_frames(args.frames), args.host, args.port,
+                                   args.delay, args.disconnect_after)
+    print(f"Воспроизведение {len(server.frames)} кадров на {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -37,37 +37,42 @@ class ChartManager(tk.Frame):
         self.ax.grid(True, alpha=0.2)
         self.chart_canvas.draw()
         
-    def update_chart(self, df, symbol, chart_type, show_predictions, future_prices=None, signal=None, signal_price=None):
+    def update_chart(self, df, symbol, chart_type, show_predictions, future_prices=None, signal=None, signal_price=None,
+                     display_length=50):
         """Обновление графика с AI предсказаниями"""
         if df is None or len(df) < 20:
             return
             
         self.ax.clear()
         
-        # Основной график (последние 50 свечей)
-        display_data = df.tail(50).copy()
-        current_price = display_data['close'].iloc[-1]
+        # Основной график (последние display_length свечей)
+        display_data = df.tail(display_length)
+        opens = np.asarray(display_data['open'])
+        highs = np.asarray(display_data['high'])
+        lows = np.asarray(display_data['low'])
+        closes = np.asarray(display_data['close'])
+        current_price = closes[-1]
         
         # ОСНОВНОЙ ГРАФИК
         if chart_type == "candles":
             # Свечной график
-            for i, (idx, row) in enumerate(display_data.iterrows()):
-                color = '#22c55e' if row['close'] >= row['open'] else '#ef4444'
+            for i, (open_price, high, low, close) in enumerate(zip(opens, highs, lows, closes)):
+                color = '#22c55e' if close >= open_price else '#ef4444'
                 
                 # Линия high-low
-                self.ax.plot([i, i], [row['low'], row['high']], 
+                self.ax.plot([i, i], [low, high], 
                             color=color, linewidth=1.5, alpha=0.8)
                 
                 # Тело свечи
-                body_top = max(row['open'], row['close'])
-                body_bottom = min(row['open'], row['close'])
+                body_top = max(open_price, close)
+                body_bottom = min(open_price, close)
                 body_height = max(body_top - body_bottom, 0.001)
                 
                 self.ax.bar(i, body_height, bottom=body_bottom, 
                            color=color, width=0.8, alpha=0.8)
         else:
             # Линейный график
-            self.ax.plot(display_data['close'].values, 
+            self.ax.plot(closes, 
                         color=self.colors['accent'], linewidth=2.5, alpha=0.9,
                         label='Историческая цена')
         
@@ -135,8 +140,8 @@ class ChartManager(tk.Frame):
         
         # ИНФОРМАЦИЯ О ЦЕНЕ
         if len(display_data) > 1:
-            price_change = current_price - display_data['close'].iloc[-2]
-            change_percent = (price_change / display_data['close'].iloc[-2] * 100)
+            price_change = current_price - closes[-2]
+            change_percent = (price_change / closes[-2] * 100)
         else:
             price_change = 0
             change_percent = 0
@@ -156,8 +161,8 @@ class ChartManager(tk.Frame):
                             alpha=0.9))
         
         # АВТОМАСШТАБИРОВАНИЕ
-        y_min = display_data['low'].min()
-        y_max = display_data['high'].max()
+        y_min = lows.min()
+        y_max = highs.max()
         
         if future_prices is not None and show_predictions and len(future_prices) > 0:
             y_min = min(y_min, min(future_prices) * 0.998)
@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import ttk
 
-from config import COLORS, BYBIT_SERVERS, POPULAR_SYMBOLS, DEFAULT_SETTINGS
+from config import COLORS, BYBIT_SERVERS, POPULAR_SYMBOLS, DEFAULT_SETTINGS, STREAM_SETTINGS, LATENCY_SETTINGS
 
 class ControlPanel(tk.Frame):  # Наследуем от tk.Frame
     def __init__(self, parent, app):
@@ -17,12 +17,17 @@ class ControlPanel(tk.Frame):  # Наследуем от tk.Frame
         tk.Label(self, text="Сервер BYBIT:", 
                 bg=self.colors['card_bg'], fg=self.colors['text']).pack(anchor=tk.W, pady=(0, 5))
         
-        self.server_var = tk.StringVar(value="Европа (Лондон)")
-        server_names = [server['name'] for server in BYBIT_SERVERS]
+        self.server_var = tk.StringVar(value=LATENCY_SETTINGS['auto_server_name'])
+        server_names = [LATENCY_SETTINGS['auto_server_name']] + [server['name'] for server in BYBIT_SERVERS]
         server_combo = ttk.Combobox(self, textvariable=self.server_var, 
                                    values=server_names, width=20)
         server_combo.pack(fill=tk.X, pady=(0, 10))
         server_combo.bind('<<ComboboxSelected>>', lambda e: self.app.change_server(self.server_var.get()))
+        
+        # Транспорт данных: WebSocket поток вместо опроса REST
+        self.stream_var = tk.BooleanVar(value=STREAM_SETTINGS['enabled'])
+        ttk.Checkbutton(self, text="WebSocket поток (без опроса)", 
+                       variable=self.stream_var).pack(anchor=tk.W, pady=(0, 10))
 
         # Настройки AI предсказаний
         ai_frame = tk.LabelFrame(self, text="AI Предсказания", 
@@ -123,7 +128,7 @@ class ControlPanel(tk.Frame):  # Наследуем от tk.Frame
         
         # Кнопка тестирования пинга
         ttk.Button(button_frame, text="📊 Тест пинга", 
-                  command=self.app.measure_ping).pack(fill=tk.X, pady=2)
+                  command=self.app.measure_ping_async).pack(fill=tk.X, pady=2)
         
         # Статистика
         stats_frame = tk.LabelFrame(self, text="Статистика", 
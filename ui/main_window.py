@@ -4,12 +4,21 @@ import threading
 import time
 from datetime import datetime
 
-from config import COLORS, BYBIT_SERVERS, DEFAULT_SETTINGS
+from config import (COLORS, BYBIT_SERVERS, DEFAULT_SETTINGS, MARKET_DATA_SETTINGS, CANDLE_STORE_SETTINGS,
+                    STREAM_SETTINGS, REPLAY_SETTINGS, LATENCY_SETTINGS, MULTI_TIMEFRAME_SETTINGS, MODEL_STORE_SETTINGS)
 from ui.control_panel import ControlPanel
 from ui.chart_manager import ChartManager
 from trading.data_provider import DataProvider
+from trading.candle_store import CandleStore
+from trading.replay import SimulatedClock
+from trading.latency import LatencyProber
+from trading.scheduler import CandleScheduler
+from trading.resampler import Resampler
 from trading.indicators import TechnicalIndicators
 from trading.ai_predictor import AIPredictor
+from trading.model_registry import ModelRegistry
+from trading.model_store import ModelStore
+from trading.retrainer import ModelRetrainer
 from utils.logger import TradingLogger
 
 class ProfessionalCryptoTrader:
@@ -23,9 +32,17 @@ class ProfessionalCryptoTrader:
         self.root.configure(bg=self.colors['bg'])
         
         # Инициализация компонентов
-        self.data_provider = DataProvider(BYBIT_SERVERS[0])
+        self.candle_store = CandleStore() if CANDLE_STORE_SETTINGS['enabled'] else None
+        self.latency = LatencyProber([server for server in BYBIT_SERVERS if not server.get('replay')])
+        self.data_provider = DataProvider(BYBIT_SERVERS[0], store=self.candle_store, latency=self.latency,
+                                          hedge_servers=self.latency.servers)
         self.indicators = TechnicalIndicators()
-        self.ai_predictor = AIPredictor()
+        # Модели по парам: при смене пары своя модель без переобучения;
+        # сохраненные с прошлого запуска загружаются сразу (устаревшие переобучаются в фоне)
+        self.models = ModelRegistry(store=ModelStore(candles=self.candle_store) if MODEL_STORE_SETTINGS['enabled'] else None)
+        self.models.load()
+        self.ai_predictor = AIPredictor()  # Модель текущей пары
+        self.retrainer = ModelRetrainer(on_swap=self.models.save)
         self.logger = TradingLogger()
         
         # Переменные состояния
@@ -33,6 +50,12 @@ class ProfessionalCryptoTrader:
         self.current_server = BYBIT_SERVERS[0]
         self.signals_history = []
         self.ping_time = 0
+        self.auto_server = True  # Режим «Авто»: сервер выбирается по замерам задержки
+        self.streamed_symbol = None  # Пара, на которую оформлена подписка WebSocket
+        self.clock = time  # Модельные часы при воспроизведении записанной сессии
+        self.resamplers = {}  # symbol -> Resampler старших таймфреймов
+        self.scheduler = None  # CandleScheduler торгового цикла
+        self.last_ping_time = time.monotonic()  # Первичный замер - при запуске
         
         # Инициализируем атрибуты для виджетов
         self.ping_label = None
@@ -42,6 +65,7 @@ class ProfessionalCryptoTrader:
         self.chart_manager = None
         
         self.setup_ui()
+        self.measure_ping_async()  # Первичный замер и выбор сервера в режиме «Авто»
         
     def setup_ui(self):
         """Настройка пользовательского интерфейса"""
@@ -84,7 +108,7 @@ class ProfessionalCryptoTrader:
         
         # Пинг
         self.ping_label = tk.Label(header_frame, 
-                                  text="Пинг: -- мс", 
+                                  text="Пинг p50/p95/p99: -- мс", 
                                   font=("Arial", 10),
                                   bg=self.colors['bg'], fg=self.colors['text'])
         self.ping_label.pack(side=tk.RIGHT, padx=10)
@@ -118,28 +142,75 @@ class ProfessionalCryptoTrader:
         
     def change_server(self, server_name):
         """Смена сервера BYBIT"""
+        if server_name == LATENCY_SETTINGS['auto_server_name']:
+            self.auto_server = True
+            self.log_message("Сервер выбирается автоматически по задержке", "info")
+            threading.Thread(target=self.measure_ping, daemon=True).start()
+            return
+        
         for server in BYBIT_SERVERS:
             if server['name'] == server_name:
-                self.current_server = server
-                self.data_provider.set_server(server)
-                self.log_message(f"Сервер изменен на: {server_name}", "info")
+                self.auto_server = False
+                self._apply_server(server)
                 # Запускаем измерение пинга в отдельном потоке
                 threading.Thread(target=self.measure_ping, daemon=True).start()
                 break
     
+    def _apply_server(self, server):
+        """Переключение DataProvider и часов на выбранный сервер"""
+        self.current_server = server
+        self.data_provider.set_server(server)
+        self.log_message(f"Сервер изменен на: {server['name']}", "info")
+        
+        # Воспроизведение записи идет по модельным часам сервера (с ускорением)
+        self.clock = time
+        if server.get('replay'):
+            try:
+                self.clock = SimulatedClock.from_server(server['url'], REPLAY_SETTINGS['speed'])
+                self.log_message(f"⏩ Воспроизведение записи, скорость {REPLAY_SETTINGS['speed']}x", "info")
+            except Exception as e:
+                self.log_message(f"Сервер воспроизведения недоступен: {e}", "error")
+        self.data_provider.clock = self.clock
+        
+        # Смещение часов относится к прежнему серверу - синхронизируем заново в фоне
+        if self.scheduler is not None:
+            threading.Thread(target=self.scheduler.sync_clock, daemon=True).start()
+    
     def measure_ping(self):
-        """Измерение пинга до сервера"""
-        ping_time = self.data_provider.measure_ping()
+        """Замер задержки до сервера (p50/p95/p99), в режиме «Авто» - выбор самого быстрого"""
+        server = self.current_server
+        if server['url'] not in self.latency.stats:
+            # Сервер воспроизведения не участвует в автовыборе - одиночный замер
+            ping_time = self.data_provider.measure_ping()
+            percentiles = None if ping_time is None else {50: ping_time, 95: ping_time, 99: ping_time}
+        elif self.auto_server:
+            self.latency.probe_all()
+            best = self.latency.best_server()
+            if best is not None and best['url'] != server['url']:
+                server = best
+                self.root.after(0, self._apply_server, best)
+            percentiles = self.latency.percentiles(server)
+        else:
+            self.latency.probe(server)
+            percentiles = self.latency.percentiles(server)
+        
+        if server['url'] in self.latency.stats and not self.latency.is_healthy(server):
+            percentiles = None
         
         # Обновляем UI в главном потоке
-        self.root.after(0, self._update_ping_display, ping_time)
+        self.root.after(0, self._update_ping_display, percentiles)
+    
+    def measure_ping_async(self):
+        """Замер задержки в фоновом потоке"""
+        threading.Thread(target=self.measure_ping, daemon=True).start()
     
-    def _update_ping_display(self, ping_time):
+    def _update_ping_display(self, percentiles):
         """Обновление отображения пинга (вызывается в главном потоке)"""
-        if ping_time is not None:
-            self.ping_time = ping_time
+        if percentiles is not None:
+            self.ping_time = int(percentiles[50])
             if self.ping_label:  # Проверяем что ping_label инициализирован
-                self.ping_label.config(text=f"Пинг: {self.ping_time} мс")
+                self.ping_label.config(text=f"Пинг p50/p95/p99: {percentiles[50]:.0f}/"
+                                            f"{percentiles[95]:.0f}/{percentiles[99]:.0f} мс")
                 
                 # Цветовая индикация качества соединения
                 if self.ping_time < 40:
@@ -155,7 +226,7 @@ class ProfessionalCryptoTrader:
                     self.connection_info.config(text=f"{status} | {self.current_server['name']}", fg=color)
         else:
             if self.ping_label:
-                self.ping_label.config(text="Пинг: -- мс")
+                self.ping_label.config(text="Пинг p50/p95/p99: -- мс")
             if self.connection_info:
                 self.connection_info.config(text="● Ошибка подключения", fg="#ef4444")
     
@@ -181,48 +252,116 @@ class ProfessionalCryptoTrader:
         if self.control_panel:
             self.control_panel.start_btn.config(state=tk.NORMAL)
             self.control_panel.stop_btn.config(state=tk.DISABLED)
+        self.data_provider.stop_stream()
+        self.streamed_symbol = None
+        self.retrainer.shutdown()
+        self.models.save()  # Состояние дообученных моделей - для следующего запуска
         self.log_message("⏹️ Анализ остановлен пользователем", "info")
     
+    def higher_timeframe_indicators(self, symbol, market_data):
+        """Индикаторы старших таймфреймов, собранных из минутных свечей без отдельных запросов"""
+        if not MULTI_TIMEFRAME_SETTINGS['enabled']:
+            return None
+        
+        resampler = self.resamplers.get(symbol)
+        if resampler is None:
+            resampler = self.resamplers[symbol] = Resampler()
+            # Начальное построение по более длинной истории из локального архива
+            history = self.data_provider.get_history(symbol, '1', MULTI_TIMEFRAME_SETTINGS['history'])
+            if history is not None and len(history) > len(market_data):
+                resampler.update(history)
+        resampler.update(market_data)
+        
+        result = {}
+        for interval, frame in resampler.frames().items():
+            htf_indicators = self.indicators.calculate_advanced_indicators(frame, (symbol, interval))
+            if htf_indicators:  # Для индикаторов нужно не меньше 50 свечей таймфрейма
+                result[interval] = htf_indicators
+        return result
+    
     def trading_loop(self):
         """Основной торговый цикл"""
+        # Опрос REST привязан к закрытию минутных свечей по часам сервера
+        self.scheduler = scheduler = CandleScheduler(self.data_provider, '1')
         while self.is_running:
             try:
-                # Периодически измеряем пинг
-                if not hasattr(self, 'ping_counter'):
-                    self.ping_counter = 0
-                
-                self.ping_counter += 1
-                if self.ping_counter >= 10:
+                # Периодически измеряем пинг (по времени: итерация цикла - это пробуждение
+                # планировщика или обновление из потока, их частота разная)
+                now = time.monotonic()
+                if now - self.last_ping_time >= LATENCY_SETTINGS['ping_interval']:
                     threading.Thread(target=self.measure_ping, daemon=True).start()
-                    self.ping_counter = 0
+                    self.last_ping_time = now
                 
                 symbol = self.control_panel.symbol_var.get() if self.control_panel else "BTCUSDT"
                 
-                # Получаем данные
-                market_data = self.data_provider.get_market_data(symbol)
+                # Получаем данные: из WebSocket потока или опросом REST
+                # (в инкрементальном режиме догружаются только новые свечи)
+                use_stream = self.control_panel.stream_var.get() if self.control_panel else STREAM_SETTINGS['enabled']
+                if use_stream and self.streamed_symbol != symbol:
+                    if self.data_provider.start_stream(symbol):
+                        if self.streamed_symbol and self.data_provider.stream:
+                            self.data_provider.stream.unsubscribe(self.streamed_symbol)
+                        self.streamed_symbol = symbol
+                        self.log_message(f"📡 WebSocket поток: {symbol}", "info")
+                    else:
+                        self.log_message("WebSocket недоступен (pip install websocket-client), используется REST", "warning")
+                        if self.control_panel:
+                            self.control_panel.stream_var.set(False)
+                        use_stream = False
+                elif not use_stream and self.streamed_symbol:
+                    self.data_provider.stop_stream()
+                    self.streamed_symbol = None
+                    
+                if use_stream:
+                    market_data = self.data_provider.stream_market_data(symbol, timeout=STREAM_SETTINGS['max_wait'])
+                elif MARKET_DATA_SETTINGS['incremental_sync']:
+                    market_data = self.data_provider.sync_market_data(symbol)
+                else:
+                    market_data = self.data_provider.get_market_data(symbol)
                 
-                if market_data is not None and len(market_data) > 50:
-                    # Обучаем модель
-                    if not self.ai_predictor.is_model_trained:
-                        self.ai_predictor.train_prediction_model(market_data)
-                        if self.ai_predictor.is_model_trained:
-                            self.log_message("🤖 AI модель успешно обучена!", "prediction")
+                # Данные не изменились с прошлого цикла - анализ не повторяем
+                if market_data is not None and len(market_data) > 50 and scheduler.has_changed(symbol, market_data):
+                    # Для обучения берем более длинную историю из локального архива, только закрытые
+                    # свечи: последняя свеча market_data формируется, ее доберет update_model после закрытия
+                    def training_data():
+                        forming = int(market_data['timestamp'][-1])
+                        history = self.data_provider.get_history(symbol, '1', CANDLE_STORE_SETTINGS['training_window'],
+                                                                 end=forming)
+                        return history if history is not None and len(history) >= len(market_data) - 1 else market_data[:-1]
+                    
+                    # Модель пары: из реестра или обучаем при первом обращении
+                    is_new = self.models.peek(symbol, '1') is None
+                    self.ai_predictor = self.models.get(symbol, '1', training_data)
+                    if is_new:
+                        if self.ai_predictor.source == 'store':
+                            self.log_message(f"🤖 AI модель для {symbol} загружена с диска", "prediction")
+                        elif self.ai_predictor.is_model_trained:
+                            self.log_message(f"🤖 AI модель для {symbol} успешно обучена!", "prediction")
+                    else:
+                        # Дообучение на свечах, закрывшихся с прошлого цикла
+                        self.ai_predictor.update_model(market_data)
+                        # Переобучение на длинной истории - в отдельном процессе, модель подменится по готовности
+                        reason = self.retrainer.due(self.ai_predictor)
+                        if reason and self.retrainer.submit(self.ai_predictor, training_data(), reason):
+                            note = {'drift': " (дрейф ошибки)", 'stale': " (сохраненная модель устарела)"}.get(reason, "")
+                            self.log_message("🤖 Фоновое переобучение AI модели" + note, "prediction")
                     
                     # Получаем предсказания
                     future_prices = None
                     if self.ai_predictor.is_model_trained and self.control_panel and self.control_panel.show_predictions_var.get():
                         future_prices = self.ai_predictor.predict_future_prices(
-                            market_data['close'].values,
+                            market_data['close'],
                             self.control_panel.prediction_length_var.get() if self.control_panel else 5
                         )
                         
                         if future_prices is not None:
-                            predicted_change = ((future_prices[-1] - market_data['close'].iloc[-1]) / market_data['close'].iloc[-1]) * 100
+                            predicted_change = ((future_prices[-1] - market_data['close'][-1]) / market_data['close'][-1]) * 100
                             direction = "рост" if predicted_change > 0 else "падение"
                             self.log_message(f"📊 AI предсказывает {direction} на {abs(predicted_change):.1f}%", "prediction")
                     
                     # Расчет индикаторов
-                    indicators = self.indicators.calculate_advanced_indicators(market_data)
+                    # (новые закрытые свечи добавляются в потоковое состояние за O(1))
+                    indicators = self.indicators.calculate_streaming(market_data, (symbol, '1'))
                     
                     if indicators:  # Проверяем что индикаторы рассчитаны
                         # AI решение
@@ -235,7 +374,8 @@ class ProfessionalCryptoTrader:
                             future_prices,
                             aggressiveness,
                             commission,
-                            min_profit
+                            min_profit,
+                            self.higher_timeframe_indicators(symbol, market_data)
                         )
                         
                         # Обновляем график
@@ -243,14 +383,23 @@ class ProfessionalCryptoTrader:
                             chart_type = self.control_panel.chart_type_var.get() if self.control_panel else "candles"
                             show_predictions = self.control_panel.show_predictions_var.get() if self.control_panel else True
                             
+                            # Окно длиннее загруженного берется из локального архива
+                            chart_window = CANDLE_STORE_SETTINGS['chart_window']
+                            chart_data = market_data
+                            if chart_window > len(market_data):
+                                history = self.data_provider.get_history(symbol, '1', chart_window)
+                                if history is not None and len(history) > len(market_data):
+                                    chart_data = history
+                            
                             self.chart_manager.update_chart(
-                                market_data, 
+                                chart_data, 
                                 symbol,
                                 chart_type,
                                 show_predictions,
                                 future_prices,
                                 signal,
-                                indicators['current_price']
+                                indicators['current_price'],
+                                chart_window
                             )
                         
                         # Логируем сильные сигналы
@@ -286,11 +435,9 @@ class ProfessionalCryptoTrader:
                                 self.current_server['name']
                             )
                 
-                # Пауза между анализами
-                for i in range(5):
-                    if not self.is_running:
-                        break
-                    time.sleep(1)
+                # Ожидание закрытия свечи (в режиме потока цикл ждет новые данные сам)
+                if not use_stream:
+                    scheduler.wait(lambda: self.is_running)
                     
             except Exception as e:
                 self.log_message(f"Ошибка в торговом цикле: {e}", "error")
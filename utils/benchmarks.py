@@ -0,0 +1,315 @@
+import argparse
+import time
+
+import numpy as np
+
+from config import BYBIT_SERVERS, POPULAR_SYMBOLS
+
+def _server(url=None):
+    """Сервер из BYBIT_SERVERS или произвольный URL (например, локальный сервер воспроизведения)"""
+    return {'name': url, 'url': url} if url else BYBIT_SERVERS[0]
+
+def bench_market_data_many(url=None, symbols=None, interval='1', limit=100, max_workers=None):
+    """Пакетная загрузка пар: последовательно против параллельно"""
+    from trading.data_provider import DataProvider
+    
+    symbols = symbols or POPULAR_SYMBOLS
+    provider = DataProvider(_server(url))
+    provider.measure_ping()  # Прогрев пула соединений
+    
+    # Перед каждым проходом кэш сбрасывается, иначе второй проход читает ответы первого
+    provider.clear_cache()
+    start = time.perf_counter()
+    sequential_ok = sum(provider.get_market_data(symbol, interval, limit) is not None for symbol in symbols)
+    sequential = time.perf_counter() - start
+    
+    provider.clear_cache()
+    start = time.perf_counter()
+    results, errors = provider.get_market_data_many(symbols, interval, limit, max_workers)
+    concurrent = time.perf_counter() - start
+    provider.close()
+    
+    print(f"Пар: {len(symbols)}, limit={limit}")
+    print(f"Последовательно: {sequential * 1000:8.1f} мс ({sequential_ok} успешно)")
+    print(f"Параллельно:     {concurrent * 1000:8.1f} мс ({len(results)} успешно, {len(errors)} ошибок)")
+    print(f"Ускорение:       {sequential / concurrent if concurrent else 0:8.2f}x")
+    for symbol, error in errors.items():
+        print(f"  {symbol}: {error}")
+    
+    return {'sequential': sequential, 'concurrent': concurrent}
+
+def bench_hedged_requests(url=None, alt_url=None, symbol='BTCUSDT', interval='1', limit=100, count=50):
+    """Хвост задержки загрузки свечей без хеджирования и с ним
+    
+    Для локальной проверки - два сервера воспроизведения с медленным хвостом.
+    Доля медленных ответов - меньше 5%, иначе в хвост попадает сам p95:
+    python -m trading.replay serve session.jsonl --port 8765 --slow-ratio 0.02 --slow-delay 1
+    python -m trading.replay serve session.jsonl --port 8766 --slow-ratio 0.02 --slow-delay 1
+    python -m utils.benchmarks hedged_requests --url http://127.0.0.1:8765 --alt-url http://127.0.0.1:8766 --count 300
+    """
+    from trading.data_provider import DataProvider
+    from trading.latency import LatencyProber
+    
+    primary = _server(url)
+    alternates = [_server(alt_url)] if alt_url else [server for server in BYBIT_SERVERS if server != primary]
+    latency = LatencyProber([primary] + alternates)
+    latency.probe_all()  # Замеры для выбора запасного сервера
+    
+    results = {}
+    for hedging in (False, True):
+        provider = DataProvider(primary, latency=latency, hedge_servers=alternates)
+        provider.set_hedging(hedging)
+        samples = []
+        for _ in range(count):
+            provider.clear_cache()
+            start = time.perf_counter()
+            provider.get_market_data(symbol, interval, limit)
+            samples.append((time.perf_counter() - start) * 1000)
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        label = "С хеджированием:" if hedging else "Без хеджирования:"
+        print(f"{label:18} p50 {p50:7.1f}  p95 {p95:7.1f}  p99 {p99:7.1f}  max {max(samples):7.1f} мс")
+        if hedging:
+            print(f"  {provider.hedge_info()}")
+        results['hedged' if hedging else 'plain'] = samples
+        provider.close()
+    latency.close()
+    
+    return results
+
+def bench_indicator_batch(sizes=(1, 10, 50, 100, 300, 1000), length=200, repeat=5):
+    """Индикаторы для списка пар: по одной паре против матрицы (пары × время)"""
+    from trading.candle_frame import CandleFrame
+    from trading.indicators import TechnicalIndicators
+    
+    indicators = TechnicalIndicators()
+    rng = np.random.default_rng(0)
+    results = {}
+    indicators.calculate_matrix(['WARMUP'], np.ones((1, length)), np.ones((1, length)))  # Импорт pandas
+    
+    print(f"Свечей на пару: {length}")
+    print(f"{'пар':>6} {'по одной, мкс/пара':>20} {'матрица, мкс/пара':>20} {'ускорение':>10}")
+    for size in sizes:
+        closes = 100 + np.cumsum(rng.normal(size=(size, length)), axis=1)
+        volumes = rng.random((size, length))
+        timestamps = np.arange(length) * 60_000
+        symbols = [f"SYM{i}USDT" for i in range(size)]
+        frames = {symbol: CandleFrame.from_columns(timestamps, np.vstack([closes[i]] * 4 + [volumes[i]] * 2))
+                  for i, symbol in enumerate(symbols)}
+        
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for frame in frames.values():
+                indicators.calculate_advanced_indicators(frame)
+        single = (time.perf_counter() - start) / repeat / size
+        
+        start = time.perf_counter()
+        for _ in range(repeat):
+            indicators.calculate_matrix(symbols, closes, volumes)
+        batch = (time.perf_counter() - start) / repeat / size
+        
+        print(f"{size:6d} {single * 1e6:20.1f} {batch * 1e6:20.1f} {single / batch:9.1f}x")
+        results[size] = {'single': single, 'batch': batch}
+    
+    return results
+
+def bench_kernels(sizes=(10_000, 100_000, 1_000_000, 10_000_000), python_limit=1_000_000):
+    """Рекурсивные индикаторы: numba / numpy / цикл на Python (совпадение результатов - tests/test_kernels.py)"""
+    from trading import kernels
+    
+    if kernels.NUMBA_AVAILABLE:
+        # Компиляция JIT до замеров
+        warmup = np.ones((1, 100))
+        kernels.ema(warmup, 26, backend='numba')
+        kernels.psar(warmup, warmup, backend='numba')
+    else:
+        print("numba не установлен - замер только numpy и Python")
+    
+    backends = [backend for backend in kernels.BACKENDS if backend != 'numba' or kernels.NUMBA_AVAILABLE]
+    rng = np.random.default_rng(0)
+    results = {}
+    print(f"{'свечей':>10} {'индикатор':>9} " + " ".join(f"{backend + ', мс':>12}" for backend in backends))
+    for size in sizes:
+        close = 100 + np.cumsum(rng.normal(size=size))
+        spread = rng.random(size)
+        high, low = close + spread, close - spread
+        cases = {
+            'ema': lambda backend: kernels.ema(close, 26, backend=backend),
+            'atr': lambda backend: kernels.atr(high, low, close, 14, backend=backend),
+            'psar': lambda backend: kernels.psar(high, low, backend=backend)
+        }
+        for name, compute in cases.items():
+            timings = []
+            for backend in backends:
+                if backend == 'python' and size > python_limit:
+                    timings.append(None)  # Цикл на Python слишком долгий
+                    continue
+                start = time.perf_counter()
+                compute(backend)
+                timings.append(time.perf_counter() - start)
+            results[(size, name)] = dict(zip(backends, timings))
+            print(f"{size:10d} {name:>9} " + " ".join(
+                f"{t * 1000:12.2f}" if t is not None else f"{'-':>12}" for t in timings))
+    
+    return results
+
+def bench_training_set(sizes=(1_000, 10_000, 100_000, 1_000_000), lookback=10, forecast=5):
+    """Построение обучающей выборки: цикл со срезами против sliding_window_view"""
+    from trading.ai_predictor import build_training_set
+    
+    rng = np.random.default_rng(0)
+    results = {}
+    print(f"lookback={lookback}, forecast={forecast}")
+    print(f"{'свечей':>10} {'цикл, мс':>12} {'окна, мс':>12} {'окна float32, мс':>18}")
+    for size in sizes:
+        prices = 100 + np.cumsum(rng.normal(size=size))
+        
+        start = time.perf_counter()
+        X, y = [], []
+        for i in range(lookback, len(prices) - forecast):
+            X.append(prices[i - lookback:i])
+            y.append(prices[i:i + forecast])
+        X, y = np.array(X), np.array(y)
+        loop = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        build_training_set(prices, lookback, forecast)
+        views = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        build_training_set(prices, lookback, forecast, np.float32)
+        views32 = time.perf_counter() - start
+        
+        print(f"{size:10d} {loop * 1000:12.2f} {views * 1000:12.3f} {views32 * 1000:18.3f}")
+        results[size] = {'loop': loop, 'views': views, 'views_float32': views32}
+    
+    return results
+
+def bench_online_update(history=(1_000, 10_000, 100_000), updates=200, lookback=10, forecast=5):
+    """Новая свеча: дообучение RLS против повторного обучения LinearRegression"""
+    from sklearn.linear_model import LinearRegression
+    from trading.ai_predictor import build_training_set
+    from trading.online_model import OnlineLinearModel
+    
+    rng = np.random.default_rng(0)
+    results = {}
+    print(f"{'свечей':>10} {'обучение заново, мс':>20} {'RLS, мкс':>10}")
+    for size in history:
+        prices = 30_000 + np.cumsum(rng.normal(scale=20, size=size + updates))
+        X, y = build_training_set(prices, lookback, forecast)
+        base = len(X) - updates
+        
+        start = time.perf_counter()
+        for i in range(base, base + min(updates, 20)):
+            LinearRegression().fit(X[:i + 1], y[:i + 1])
+        refit = (time.perf_counter() - start) / min(updates, 20)
+        
+        model = OnlineLinearModel().fit(X[:base], y[:base])
+        start = time.perf_counter()
+        for i in range(base, len(X)):
+            model.partial_fit(X[i], y[i])
+        online = (time.perf_counter() - start) / updates
+        
+        print(f"{size:10d} {refit * 1000:20.2f} {online * 1e6:10.1f}")
+        results[size] = {'refit': refit, 'online': online}
+    
+    return results
+
+def bench_batch_prediction(sizes=(1, 10, 100, 1000), history=300, repeat=20):
+    """Предсказания для N пар: sklearn predict по одной паре, снимок по одной паре, один einsum"""
+    from sklearn.linear_model import LinearRegression
+    from trading.ai_predictor import AIPredictor, stack_models, predict_batch
+    from trading.candle_frame import CandleFrame
+    
+    rng = np.random.default_rng(0)
+    timestamps = np.arange(history) * 60_000
+    results = {}
+    print(f"{'пар':>6} {'sklearn, мкс':>14} {'по одной, мкс':>14} {'einsum, мкс':>12} {'со сборкой, мкс':>16}")
+    for size in sizes:
+        closes = 100 + np.cumsum(rng.normal(size=(size, history)), axis=1)
+        predictors = []
+        for row in closes:
+            predictor = AIPredictor(online=False)
+            predictor.train_prediction_model(CandleFrame.from_columns(timestamps, np.vstack([row] * 6)))
+            predictors.append(predictor)
+        lookback = predictors[0].lookback
+        
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for predictor, row in zip(predictors, closes):
+                predictor.prediction_model.predict(row[-lookback:].reshape(1, -1))
+        sklearn = (time.perf_counter() - start) / repeat
+        
+        start = time.perf_counter()
+        for _ in range(repeat):
+            single = [predictor.predict_future_prices(row) for predictor, row in zip(predictors, closes)]
+        loop = (time.perf_counter() - start) / repeat
+        
+        coef, intercept = stack_models(predictors)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            batch = predict_batch(closes[:, -lookback:], coef, intercept)
+        einsum = (time.perf_counter() - start) / repeat
+        
+        start = time.perf_counter()
+        for _ in range(repeat):
+            coef, intercept = stack_models(predictors)
+            predict_batch(np.vstack([row[-lookback:] for row in closes]), coef, intercept)
+        stacked = (time.perf_counter() - start) / repeat
+        
+        assert np.allclose(batch, np.vstack(single))
+        print(f"{size:6d} {sklearn * 1e6:14.1f} {loop * 1e6:14.1f} {einsum * 1e6:12.1f} {stacked * 1e6:16.1f}")
+        results[size] = {'sklearn': sklearn, 'single': loop, 'einsum': einsum, 'stacked': stacked}
+    
+    return results
+
+def bench_backtest(days=(7, 30, 365)):
+    """Бэктест ai_trading_decision на синтетических минутных свечах (сверка сигналов - tests/test_backtester.py)"""
+    from trading.backtester import Backtester
+    from trading.candle_frame import CandleFrame
+    
+    rng = np.random.default_rng(0)
+    backtester = Backtester()
+    results = {}
+    for day_count in days:
+        n = day_count * 24 * 60
+        closes = 30_000 * np.exp(np.cumsum(rng.normal(scale=0.001, size=n)))
+        volumes = rng.lognormal(size=n)
+        frame = CandleFrame.from_columns(np.arange(n) * 60_000,
+                                         np.vstack([closes, closes * 1.0005, closes * 0.9995, closes, volumes, volumes * closes]))
+        
+        result = backtester.run(frame)
+        stats = result['stats']
+        print(f"{day_count:4d} дн. ({n} свечей): {stats['seconds']:.2f} с, "
+              f"{n / stats['seconds'] / 1000:.0f} тыс. свечей/с, сделок {stats['trades']}")
+        results[day_count] = stats
+    
+    return results
+
+BENCHMARKS = {
+    'market_data_many': bench_market_data_many,
+    'hedged_requests': bench_hedged_requests,
+    'indicator_batch': bench_indicator_batch,
+    'kernels': bench_kernels,
+    'training_set': bench_training_set,
+    'online_update': bench_online_update,
+    'batch_prediction': bench_batch_prediction,
+    'backtest': bench_backtest
+}
+
+def main():
+    """Командная строка: python -m utils.benchmarks market_data_many [--url http://127.0.0.1:8765]"""
+    parser = argparse.ArgumentParser(description="Замеры производительности терминала")
+    parser.add_argument('name', choices=sorted(BENCHMARKS))
+    parser.add_argument('--url', default=None, help="URL сервера вместо BYBIT_SERVERS[0]")
+    parser.add_argument('--alt-url', default=None, help="URL запасного сервера для хеджирования")
+    parser.add_argument('--count', type=int, default=None, help="Число запросов (hedged_requests)")
+    args = parser.parse_args()
+    
+    benchmark = BENCHMARKS[args.name]
+    options = {'url': args.url, 'alt_url': args.alt_url}
+    if args.count is not None:
+        options['count'] = args.count
+    benchmark(**{name: value for name, value in options.items() if name in benchmark.__code__.co_varnames})
+
+if __name__ == "__main__":
+    main()